@@ -0,0 +1,239 @@
+"""
+Micro-benchmarks of the Pipeline execution overheads.
+
+Run from the repository root (only the standard library is needed)
+
+    python benchmarks/bench_core.py --output results.json
+
+and compare against the results of a previous release with
+
+    python benchmarks/bench_core.py --compare baseline.json
+
+which exits with status 1 if a benchmark is slower than the baseline
+by more than --threshold (relative).
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import enpipe
+from enpipe import Pipeline, Stage
+
+
+STAGE_COUNTS = (1, 10, 100, 1000)
+
+
+def _inc(x: int) -> int:
+    return x + 1
+
+
+def _inc_first(x: int, *_) -> int:
+    # disabled stages forward their kwargs as an extra positional argument
+    return x + 1
+
+
+def _chain(n: int) -> Callable[[int], int]:
+    def chain(x: int) -> int:
+        for _ in range(n):
+            x = _inc(x)
+        return x
+    return chain
+
+
+def _pipeline(n: int, func: Callable = _inc, **kwargs) -> Pipeline:
+    return Pipeline(*(Stage(func, name=f"s{i}") for i in range(n)), **kwargs)
+
+
+def _timeit(func: Callable[[], Any], min_time: float) -> dict[str, float]:
+    """Per-call time (ns) as the best of 5 repeats of a loop lasting ~min_time"""
+    timer = timeit.Timer(func)
+    number, elapsed = 1, timer.timeit(1)
+    while elapsed < min_time / 10:
+        number *= 10
+        elapsed = timer.timeit(number)
+    number = max(1, int(number * min_time / elapsed))
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return {"ns_per_call": best * 1e9, "number": number}
+
+
+def bench_call_overhead(min_time: float) -> dict[str, Any]:
+    res = dict()
+    for n in STAGE_COUNTS:
+        chain = _chain(n)
+        base = _timeit(lambda: chain(0), min_time)["ns_per_call"]
+        res[f"chain[{n}]"] = base
+        for retention in ("full", "timings", "none"):
+            p = _pipeline(n, retention=retention)
+            t = _timeit(lambda: p(0), min_time)["ns_per_call"]
+            res[f"pipeline[{n},{retention}]"] = t
+        c = _pipeline(n).compile()
+        res[f"compiled[{n}]"] = _timeit(lambda: c(0), min_time)["ns_per_call"]
+    return res
+
+
+def bench_disabled(min_time: float) -> dict[str, Any]:
+    res = dict()
+    n = 100
+    for ratio in (0.0, 0.5, 0.9):
+        p = _pipeline(n, _inc_first)
+        disabled = range(1, 1 + int(n * ratio))
+        if len(disabled) > 0:
+            # disable() without keys would disable all stages
+            p.disable(*disabled)
+        res[f"pipeline[{n},disabled={ratio}]"] = _timeit(lambda: p(0), min_time)["ns_per_call"]
+        c = p.compile()
+        res[f"compiled[{n},disabled={ratio}]"] = _timeit(lambda: c(0), min_time)["ns_per_call"]
+    return res
+
+
+def bench_partial_runs(min_time: float) -> dict[str, Any]:
+    res = dict()
+    n = 100
+    p = _pipeline(n)
+    p(0)
+    res["full"] = _timeit(lambda: p(0), min_time)["ns_per_call"]
+    res["start_from=50"] = _timeit(lambda: p(0, start_from=50), min_time)["ns_per_call"]
+    res["stop_at=50"] = _timeit(lambda: p(0, stop_at=50), min_time)["ns_per_call"]
+    last = p.run(0)
+    res["resume_from=50"] = _timeit(
+        lambda: p.resume(50, last), 
+        min_time,
+    )["ns_per_call"]
+    return res
+
+
+def bench_get_stages_run(min_time: float) -> dict[str, Any]:
+    res = dict()
+    for n in STAGE_COUNTS:
+        p = _pipeline(n)
+        p(0)
+        res[f"all[{n}]"] = _timeit(lambda: p.get_stages_run(), min_time)["ns_per_call"]
+        res[f"by_name[{n}]"] = _timeit(
+            lambda: p.get_stages_run(f"s{n-1}"), 
+            min_time,
+        )["ns_per_call"]
+        res[f"by_index[{n}]"] = _timeit(
+            lambda: p.get_stages_run(n-1), 
+            min_time,
+        )["ns_per_call"]
+        res[f"getitem[{n}]"] = _timeit(lambda: p[f"s{n-1}"], min_time)["ns_per_call"]
+    return res
+
+
+def _payload(x: Any) -> bytes:
+    return bytes(1 << 20)
+
+
+def bench_retained_memory(min_time: float) -> dict[str, Any]:
+    """Bytes still allocated after a call producing 10 x 1MiB payloads"""
+    res = dict()
+    for retention in ("full", "timings", "none"):
+        p = Pipeline(
+            *(Stage(_payload, name=f"s{i}") for i in range(10)), 
+            retention=retention,
+        )
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        p(0)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        res[f"retained_bytes[{retention}]"] = after - before
+        res[f"peak_bytes[{retention}]"] = peak - before
+    return res
+
+
+BENCHMARKS: dict[str, Callable[[float], dict[str, Any]]] = {
+    "call_overhead": bench_call_overhead,
+    "disabled": bench_disabled,
+    "partial_runs": bench_partial_runs,
+    "get_stages_run": bench_get_stages_run,
+    "retained_memory": bench_retained_memory,
+}
+
+
+def run(names: list[str], min_time: float) -> dict[str, Any]:
+    results = dict(
+        meta=dict(
+            enpipe=getattr(enpipe, "__version__", None),
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            platform=platform.platform(),
+            timestamp=time.time(),
+        ),
+        results=dict(),
+    )
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        results["results"][name] = BENCHMARKS[name](min_time)
+    return results
+
+
+def compare(
+    results: dict[str, Any], 
+    baseline: dict[str, Any], 
+    threshold: float,
+) -> list[str]:
+    """Returns the benchmarks slower than the baseline by more than threshold"""
+    regressions = []
+    for group, values in results["results"].items():
+        base_values = baseline.get("results", dict()).get(group, dict())
+        for key, value in values.items():
+            base = base_values.get(key)
+            if not base or value <= base * (1 + threshold):
+                continue
+            regressions.append(f"{group}/{key}: {base:.0f} -> {value:.0f} ({value/base:.2f}x)")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "benchmarks", 
+        nargs="*", 
+        choices=[[], *BENCHMARKS], 
+        help="benchmarks to run (default: all)",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a baseline run")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument(
+        "--min-time", 
+        type=float, 
+        default=0.05, 
+        help="seconds spent in each timing loop",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.benchmarks or list(BENCHMARKS), args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,11 @@
-from enpipe.core import Stage, Pipeline, make_pipeline
+from enpipe.core import Stage, StageRun, StageTimeoutError, StageSignatureError, Run, Pipeline, CompiledPipeline, make_pipeline
+from enpipe.cache import StageCache, CacheInfo
+from enpipe.checkpoint import CheckpointStore
+from enpipe.stats import StatsCollector, StageStats, StageSummary, RunRecord
+from enpipe.hooks import Hook
+from enpipe.memory import MemoryProfiler, MemorySummary, StageMemory
+from enpipe.retry import RetryPolicy
+from enpipe.sampling import SamplingPolicy
+from enpipe.tracing import TraceRecorder, Span
+from enpipe.transport import SharedMemoryTransport
+from enpipe.dag import Node, Graph, GraphRun
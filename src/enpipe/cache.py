@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from typing import Callable, Any, Hashable
+
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import threading
+import time
+
+
+@dataclass
+class CacheInfo:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class StageCache:
+    """
+    Bounded LRU memoization of the outputs of a Stage.
+
+    `maxsize` bounds the number of entries, `ttl` (seconds) the age of
+    an entry, and `key` maps the stage arguments to a hashable key
+    (needed when the arguments are unhashable, e.g., dicts or arrays).
+    Expired entries count as evictions.
+    """
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float | None = None,
+        key: Callable[..., Hashable] | None = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.key = key
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self) -> dict[str, Any]:
+        # entries and counters are local to a process
+        state = self.__dict__.copy()
+        state["_data"] = OrderedDict()
+        state["_lock"] = None
+        state["hits"] = state["misses"] = state["evictions"] = 0
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def make_key(self, args: tuple, kwargs: dict[str, Any]) -> Hashable:
+        if self.key is not None:
+            return self.key(*args, **kwargs)
+        if len(kwargs) == 0:
+            return args
+        return args, tuple(sorted(kwargs.items()))
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Returns (True, value) on a hit, (False, None) otherwise"""
+        try:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None:
+                    expire, value = entry
+                    if expire >= time.monotonic():
+                        self._data.move_to_end(key)
+                        self.hits += 1
+                        return True, value
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return False, None
+        except TypeError as e:
+            e.add_note("--> Use StageCache(key=...) for unhashable arguments")
+            raise e
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expire = (
+            time.monotonic() + self.ttl
+            if self.ttl is not None
+            else float("inf")
+        )
+        with self._lock:
+            self._data[key] = (expire, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._data),
+            maxsize=self.maxsize,
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
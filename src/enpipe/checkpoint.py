@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Any
+
+from pathlib import Path
+
+import mmap
+import os
+import pickle
+import re
+import shutil
+
+from enpipe.transport import _dumps_out_of_band
+
+
+class CheckpointStore:
+    """
+    Persist stage outputs on a local directory, one folder per run id,
+    so that a run can be resumed from another process.
+
+    Outputs are pickled with protocol 5: buffers larger than `threshold`
+    bytes (e.g., NumPy arrays) are written to separate files and
+    memory-mapped back (copy-on-write) on load, so resuming does not
+    copy them while they can still be modified in place.
+    """
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        threshold: int = 1 << 16,
+    ):
+        self.directory = Path(directory)
+        self.threshold = threshold
+
+    def _path(self, run_id: str, stage_idx: int, stage_name: str) -> Path:
+        # stage names can contain characters not valid for file names
+        # (e.g., "functools.partial(func)"); the index keeps them unique
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", stage_name)
+        return self.directory / run_id / f"{stage_idx:04d}_{safe_name}.pkl"
+
+    def has(self, run_id: str, stage_idx: int, stage_name: str) -> bool:
+        return self._path(run_id, stage_idx, stage_name).exists()
+
+    def save(
+        self, 
+        run_id: str, 
+        stage_idx: int, 
+        stage_name: str, 
+        value: Any,
+    ) -> None:
+        path = self._path(run_id, stage_idx, stage_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        data, buffers = _dumps_out_of_band(value, self.threshold)
+        for idx, buf in enumerate(buffers):
+            with open(_buffer_path(path, idx), "wb") as f:
+                f.write(buf.raw())
+
+        # the .pkl file is written last (and atomically) so that
+        # a checkpoint exists only once all its buffers are on disk
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((len(buffers), data), f, protocol=5)
+        os.replace(tmp_path, path)
+
+    def load(self, run_id: str, stage_idx: int, stage_name: str) -> Any:
+        path = self._path(run_id, stage_idx, stage_name)
+        if not path.exists():
+            raise KeyError(
+                f"No checkpoint for stage#{stage_idx}({stage_name}) "
+                f"of run {run_id!r}"
+            )
+        with open(path, "rb") as f:
+            num_buffers, data = pickle.load(f)
+
+        buffers: list[Any] = []
+        for idx in range(num_buffers):
+            with open(_buffer_path(path, idx), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    buffers.append(bytearray())
+                    continue
+                # copy-on-write: stages may modify their inputs in place
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                buffers.append(memoryview(mm))
+        return pickle.loads(data, buffers=buffers)
+
+    def clear(self, run_id: str | None = None) -> None:
+        """Remove the checkpoints of a run (or of all runs)"""
+        path = self.directory if run_id is None else self.directory / run_id
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _buffer_path(path: Path, idx: int) -> Path:
+    return path.with_suffix(f".{idx}.buf")
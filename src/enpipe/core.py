@@ -1,13 +1,46 @@
 from __future__ import annotations
 
-from typing import Callable, Any, Self, overload, cast
+from typing import (
+    Callable,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    Literal,
+    Sequence,
+    Sized,
+    overload, 
+    cast,
+)
 
-from collections import OrderedDict, Counter, defaultdict
-from dataclasses import dataclass
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
 
+import contextvars
 import functools
+import inspect
+import pickle
 import time
 
+from enpipe.cache import StageCache, CacheInfo
+from enpipe.checkpoint import CheckpointStore
+from enpipe.executors import (
+    thread_map, 
+    process_map, 
+    assembly_line, 
+    call_with_timeout, 
+    collect_batches,
+)
+from enpipe.hooks import Hook, BeforeHook, AfterHook, ErrorHook
+from enpipe.memory import MemoryProfiler, MemorySummary, StageMemory
+from enpipe.retry import RetryPolicy
+from enpipe.sampling import SamplingPolicy
+from enpipe.signatures import check_stages
+from enpipe.tracing import TraceRecorder, Span
+from enpipe.transport import SharedMemoryTransport, SharedPayload
+from enpipe.stats import StatsCollector, StageSummary
+
 
 def _validate_keys(p: Pipeline, *keys: int|str) -> None:
     for k in keys:
@@ -17,7 +50,7 @@ def _validate_keys(p: Pipeline, *keys: int|str) -> None:
                 or (k < 0 and k < -len(p)) 
             ):
                 raise KeyError(f"Stage {k} not available")
-        elif k not in p._dict:
+        elif k not in p._index:
             raise KeyError(f"Stage {k} not available")
 
 
@@ -29,11 +62,36 @@ def validate_key(func: Callable) -> Any:
     return wrapper
 
 
+class StageTimeoutError(TimeoutError):
+    """A stage did not complete within its timeout"""
+
+
+class StageSignatureError(TypeError):
+    """Consecutive stages with incompatible signatures (see Pipeline.validate)"""
+    def __init__(self, issues: list[str]):
+        super().__init__("\n".join([
+            f"{len(issues)} incompatible stage signature(s):",
+            *issues,
+        ]))
+        self.issues = issues
+
+
+# errors annotated with the stage they originate from
+_ANNOTATED_ERRORS = (TypeError, StageTimeoutError)
+
+
 @dataclass
 class Stage:
     func: Callable
     name: str = ""
     is_enabled: bool = True
+    cache: StageCache | None = None
+    # when set, func takes a list of items and returns a list of outputs
+    batch_size: int | None = None
+    batch_wait: float | None = None
+    # seconds after which the call is abandoned (StageTimeoutError)
+    timeout: float | None = None
+    retry: RetryPolicy | None = None
 
     def __post_init__(self) -> None:
         if self.name == "":
@@ -41,10 +99,24 @@ class Stage:
                 self.name = f"functools.partial({self.func.func.__name__})"
             else:
                 self.name = self.func.__name__
+        if self.batch_size is not None and self.batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        if self.timeout is not None and self.timeout <= 0:
+            raise ValueError("timeout must be > 0")
+        # stages that yield are fan-out points (see Pipeline._fan_out)
+        self._fanout = inspect.isgeneratorfunction(self.func)
         self._args: tuple = tuple()
         self._kwargs: dict[str, Any] = dict()
         self._out: Any = None
 
+    def __getstate__(self) -> dict[str, Any]:
+        # do not ship the data of the last call around
+        state = self.__dict__.copy()
+        state["_args"] = tuple()
+        state["_kwargs"] = dict()
+        state["_out"] = None
+        return state
+
     def __call__(self, *args, **kwargs) -> Any:
         self._args = args
         self._kwargs = kwargs
@@ -52,6 +124,177 @@ class Stage:
             self._out = self.func(*args, **kwargs)
             return self._out
         return *args, kwargs
+
+    def _invoke(self, *args, **kwargs) -> Any:
+        """Same as __call__ but without keeping references to args and output"""
+        return self._execute(args, kwargs)
+
+    def _execute(
+        self, 
+        args: tuple, 
+        kwargs: dict[str, Any], 
+        record: StageRun | None = None,
+    ) -> Any:
+        """Run the stage filling the details of `record` (if any)"""
+        if not self.is_enabled:
+            return *args, kwargs
+        cache = self.cache
+        if cache is None:
+            if self.retry is not None:
+                return self._call_with_retry(self._call_func, (args, kwargs), record)
+            return self._call_func(args, kwargs)
+
+        key = cache.make_key(args, kwargs)
+        hit, res = cache.get(key)
+        if record is not None:
+            record.cache_hit = hit
+        if not hit:
+            res = self._call_with_retry(self._call_func, (args, kwargs), record)
+            cache.put(key, res)
+        return res
+
+    def _call_func(self, args: tuple, kwargs: dict[str, Any]) -> Any:
+        if self.timeout is not None:
+            return self._call_with_timeout(self._call_untimed, (args, kwargs))
+        return self._call_untimed(args, kwargs)
+
+    def _call_untimed(self, args: tuple, kwargs: dict[str, Any]) -> Any:
+        if self.batch_size is None:
+            return self.func(*args, **kwargs)
+        # a batch stage called on a single item
+        return self.func([_batch_item(args)], **kwargs)[0]
+
+    def _call_batch(
+        self, 
+        batch: list[Any], 
+        record: StageRun | None = None,
+    ) -> Sequence[Any]:
+        if self.retry is not None:
+            return self._call_with_retry(self._call_batch_once, (batch, ), record)
+        return self._call_batch_once(batch)
+
+    def _call_batch_once(self, batch: list[Any]) -> Sequence[Any]:
+        if self.timeout is not None:
+            return self._call_with_timeout(self.func, (batch, ))
+        return self.func(batch)
+
+    def _call_with_retry(
+        self, 
+        func: Callable, 
+        args: tuple, 
+        record: StageRun | None,
+    ) -> Any:
+        """
+        Call func(*args) retrying failures according to the retry policy,
+        recording the attempts and the time they cost into `record`.
+        """
+        policy = self.retry
+        if policy is None:
+            return func(*args)
+        if inspect.iscoroutinefunction(self.func):
+            return self._acall_with_retry(func, args, record)
+
+        t0 = time.perf_counter_ns()
+        attempt = 1
+        while True:
+            try:
+                return func(*args)
+            except Exception as e:
+                if not policy.should_retry(e, attempt):
+                    if attempt > 1:
+                        e.add_note(f"--> Failed after {attempt} attempts")
+                    raise e
+                time.sleep(policy.delay(attempt))
+            attempt += 1
+            if record is not None:
+                record.attempts = attempt
+                record.retry_time = time.perf_counter_ns() - t0
+
+    async def _acall_with_retry(
+        self, 
+        func: Callable, 
+        args: tuple, 
+        record: StageRun | None,
+    ) -> Any:
+        """Asynchronous counterpart of _call_with_retry"""
+        import asyncio
+
+        policy = cast(RetryPolicy, self.retry)
+        t0 = time.perf_counter_ns()
+        attempt = 1
+        while True:
+            try:
+                return await func(*args)
+            except Exception as e:
+                if not policy.should_retry(e, attempt):
+                    if attempt > 1:
+                        e.add_note(f"--> Failed after {attempt} attempts")
+                    raise e
+                await asyncio.sleep(policy.delay(attempt))
+            attempt += 1
+            if record is not None:
+                record.attempts = attempt
+                record.retry_time = time.perf_counter_ns() - t0
+
+    def _call_with_timeout(self, func: Callable, args: tuple) -> Any:
+        """
+        Synchronous functions run on a thread abandoned on timeout,
+        coroutines are cancelled.
+        """
+        timeout = cast(float, self.timeout)
+        if inspect.iscoroutinefunction(self.func):
+            return self._await_with_timeout(func(*args))
+        finished, res = call_with_timeout(func, args, timeout)
+        if not finished:
+            raise self._timeout_error()
+        return res
+
+    async def _await_with_timeout(self, awaitable: Any) -> Any:
+        import asyncio
+
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timeout_error() from None
+
+    def _timeout_error(self) -> StageTimeoutError:
+        return StageTimeoutError(
+            f"Stage {self.name} did not complete within {self.timeout}s"
+        )
+
+    def _is_plain(self) -> bool:
+        """True if calling the stage is just calling func"""
+        return (
+            self.cache is None 
+            and self.batch_size is None 
+            and self.timeout is None
+            and self.retry is None
+        )
+
+    async def _aexecute(
+        self, 
+        args: tuple, 
+        kwargs: dict[str, Any], 
+        record: StageRun | None = None,
+    ) -> Any:
+        """Asynchronous counterpart of _execute"""
+        cache = self.cache
+        if cache is None or not self.is_enabled:
+            res = self._execute(args, kwargs, record)
+            if inspect.isawaitable(res):
+                res = await res
+            return res
+
+        key = cache.make_key(args, kwargs)
+        hit, res = cache.get(key)
+        if record is not None:
+            record.cache_hit = hit
+        if not hit:
+            res = self._call_with_retry(self._call_func, (args, kwargs), record)
+            if inspect.isawaitable(res):
+                res = await res
+            cache.put(key, res)
+        return res
     
     def __repr__(self):
         return (
@@ -69,6 +312,65 @@ class StageRun:
     inputs: Any
     outputs: Any
     runtime: float = -1.0
+    cache_hit: bool = False
+    # calls made (> 1 if retried) and time spent on the failed ones
+    attempts: int = 1
+    retry_time: float = 0.0
+    # set when the pipeline has a MemoryProfiler
+    memory: StageMemory | None = None
+
+
+Retention = Literal["none", "timings", "full"]
+RETENTION_LEVELS: tuple[Retention, ...] = ("none", "timings", "full")
+
+OnError = Literal["raise", "return"]
+ON_ERROR_MODES: tuple[OnError, ...] = ("raise", "return")
+
+
+@dataclass
+class Run:
+    """
+    Inputs, outputs and StageRun records of one pipeline invocation.
+    Each invocation fills its own Run, so a Pipeline can serve
+    concurrent callers without sharing any run state.
+    """
+    inputs: list[Any] = field(default_factory=list)
+    outputs: list[Any] = field(default_factory=list)
+    stages_run: list[StageRun | None] = field(default_factory=list)
+    result: Any = None
+    run_id: str | None = None
+    # hooks sampled for this run
+    hooks: tuple[Hook, ...] = field(default=(), repr=False, compare=False)
+    # False if the run records nothing (see SamplingPolicy)
+    sampled: bool = field(default=True, repr=False, compare=False)
+
+
+class _StageCall:
+    """Instrumentation state of a stage call (see Pipeline._start_stage)"""
+    __slots__ = (
+        "stage", 
+        "stage_idx", 
+        "hooks", 
+        "record", 
+        "tracer", 
+        "span", 
+        "token", 
+        "profiler", 
+        "measure", 
+        "t1",
+    )
+
+    def __init__(self, stage: Stage, stage_idx: int, hooks: tuple[Hook, ...]):
+        self.stage = stage
+        self.stage_idx = stage_idx
+        self.hooks = hooks
+        self.record: StageRun | None = None
+        self.tracer: TraceRecorder | None = None
+        self.span: Any = None
+        self.token: Any = None
+        self.profiler: MemoryProfiler | None = None
+        self.measure: Any = None
+        self.t1 = 0
 
 
 class Pipeline:
@@ -76,115 +378,417 @@ class Pipeline:
         self, 
         *stages: Stage,
         name: str | None = None,
+        retention: Retention = "full",
+        checkpoint: CheckpointStore | None = None,
+        stats_collector: StatsCollector | None = None,
+        sampling: SamplingPolicy | None = None,
+        tracer: TraceRecorder | None = None,
+        memory_profiler: MemoryProfiler | None = None,
+        validate_signatures: bool = False,
     ):
+        """
+        `retention` controls what each run keeps alive once it completes:
+        "full" keeps inputs, outputs and runtime of every stage,
+        "timings" keeps only the StageRun runtimes and "none" records
+        nothing at all.
+
+        `checkpoint` persists the output of every stage of the runs
+        invoked with run_checkpointed, so they can be resumed by another
+        process.
+
+        `stats_collector` aggregates the stage runtimes across runs
+        (see Pipeline.stats).
+
+        `sampling` limits the recording to a subset of the calls
+        (__call__, run and acall), recorded according to `retention`
+        and kept in `sampling.runs`; the other calls record nothing.
+
+        `tracer` records a Span for each run and stage call, with
+        timestamps, thread ids and nesting (see TraceRecorder).
+
+        `memory_profiler` measures the peak and net allocation and the
+        output size of each stage call (see Pipeline.memory_summary).
+
+        `validate_signatures` runs Pipeline.validate before the first call
+        and again whenever the stages or the enabled ones change.
+        """
+        if retention not in RETENTION_LEVELS:
+            raise ValueError(f"Unknown retention {retention!r}")
+
         # if a name is duplicated, then add a suffix _<num> to the name
         dupnames = Counter([stage.name for stage in stages])
         cntnames = defaultdict(int)
-        self._dict: dict[str, Stage] = OrderedDict()
         for stage in stages:
             if dupnames[stage.name] > 1:
                 cntnames[stage.name] += 1
                 stage.name += f"_{cntnames[stage.name]}"
-            self._dict[stage.name] = stage
+        self._set_stages(stages)
 
         self.name = name if name is not None else ""
-        self._run_inputs: list[Any] = []
-        self._run_outputs: list[Any] = []
-        self._stages_run: list[StageRun | None] = []
+        self.retention = retention
+        self.checkpoint = checkpoint
+        self.stats_collector = stats_collector
+        self.sampling = sampling
+        self.tracer = tracer
+        self.memory_profiler = memory_profiler
+        self.validate_signatures = validate_signatures
+        # bumped whenever the set of enabled stages changes,
+        # so that compiled plans know when to rebuild
+        self._version = 0
+        self._plan: tuple[int, int | None, tuple[Stage, ...]] = (-1, None, tuple())
+        self._hooks: tuple[Hook, ...] = tuple()
+        self._last_run = Run()
+        # _version of the last successful validation
+        self._validated = -1
+
+    def __getstate__(self) -> dict[str, Any]:
+        # do not ship the data of the last run around
+        state = self.__dict__.copy()
+        state["_last_run"] = Run()
+        # stats are aggregated and hooks invoked where the pipeline was created
+        state["stats_collector"] = None
+        state["_hooks"] = tuple()
+        state["sampling"] = None
+        state["tracer"] = None
+        state["memory_profiler"] = None
+        return state
 
     @property
     def stages(self) -> tuple[Stage, ...]:
-        return tuple(self._dict.values())
+        return self._stages
 
     @property
     def names(self) -> tuple[str, ...]:
-        return tuple(self._dict.keys())
+        return self._names
 
     def __len__(self) -> int:
-        return len(self.stages)
+        return len(self._stages)
 
     def __getitem__(self, key: int | str) -> Stage:
-        key = cast(str, self._convert_key_to_str(key))
-        return self._dict[key]
-
-    def __iter__(self) -> Self:
-        self._iter_stages = iter(self.stages)
-        return self
+        return self._stages[self._convert_key_to_int(key)]
 
-    def __next__(self) -> Stage:
-        return next(self._iter_stages)
+    def __iter__(self) -> Iterator[Stage]:
+        return iter(self._stages)
 
-    @validate_key
     def _convert_key_to_int(self, key: int | str) -> int:
         if isinstance(key, int):
-            if key >= 0:
-                return key
-            return len(self) + key
-        return self.names.index(key)
+            n = len(self._stages)
+            if -n <= key < n:
+                return key if key >= 0 else n + key
+        elif key in self._index:
+            return self._index[key]
+        raise KeyError(f"Stage {key} not available")
 
-    @validate_key
     def _convert_key_to_str(self, key: int | str) -> str:
-        if isinstance(key, str):
-            return key
-        return self.names[key]
+        return self._names[self._convert_key_to_int(key)]
+
+    def _set_stages(self, stages: Sequence[Stage], start: int = 0) -> None:
+        """
+        Replace the stages of the pipeline, updating the name -> index
+        map from position `start` on (the stages before it are unchanged).
+        """
+        self._stages = tuple(stages)
+        self._names = tuple(stage.name for stage in self._stages)
+        if start == 0:
+            self._index = dict()
+        for idx in range(start, len(self._stages)):
+            self._index[self._names[idx]] = idx
+
+    def _unique_name(self, name: str) -> str:
+        if name not in self._index:
+            return name
+        num = 1
+        while f"{name}_{num}" in self._index:
+            num += 1
+        return f"{name}_{num}"
+
+    def _structure_changed(self) -> None:
+        self._version += 1
+        # the records of the last run refer to the previous structure
+        self._last_run = Run()
+
+    def insert(self, key: int | str, stage: Stage) -> None:
+        """
+        Insert `stage` before the stage `key` (as list.insert does,
+        an int key beyond the last stage appends). If its name is
+        already used, a suffix _<num> is added to it.
+        """
+        if isinstance(key, int):
+            idx = min(max(key if key >= 0 else len(self) + key, 0), len(self))
+        else:
+            idx = self._convert_key_to_int(key)
+        stage.name = self._unique_name(stage.name)
+        self._set_stages(
+            self._stages[:idx] + (stage, ) + self._stages[idx:], 
+            start=idx,
+        )
+        self._structure_changed()
+
+    def append(self, stage: Stage) -> None:
+        """Add `stage` after the last stage"""
+        self.insert(len(self), stage)
+
+    def remove(self, key: int | str) -> Stage:
+        """Remove the stage `key` and return it"""
+        idx = self._convert_key_to_int(key)
+        stage = self._stages[idx]
+        del self._index[self._names[idx]]
+        self._set_stages(self._stages[:idx] + self._stages[idx+1:], start=idx)
+        self._structure_changed()
+        return stage
+
+    def replace(self, key: int | str, stage: Stage) -> Stage:
+        """
+        Replace the stage `key` with `stage` and return the old one.
+        If the name of `stage` is used by another stage, a suffix _<num>
+        is added to it.
+        """
+        idx = self._convert_key_to_int(key)
+        old = self._stages[idx]
+        del self._index[self._names[idx]]
+        stage.name = self._unique_name(stage.name)
+        self._set_stages(
+            self._stages[:idx] + (stage, ) + self._stages[idx+1:], 
+            start=idx,
+        )
+        self._structure_changed()
+        return old
+
+    def move(self, key: int | str, index: int) -> None:
+        """Move the stage `key` to position `index`"""
+        src = self._convert_key_to_int(key)
+        dst = self._convert_key_to_int(index)
+        stages = list(self._stages)
+        stages.insert(dst, stages.pop(src))
+        self._set_stages(stages, start=min(src, dst))
+        self._structure_changed()
+
+    def _start_record(
+        self,
+        run: Run,
+        stage: Stage,
+        stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> StageRun | None:
+        if self.retention == "none" or not run.sampled:
+            return None
+        _extend_list(run.stages_run, stage_idx)
+        if self.retention != "full":
+            return StageRun(stage, inputs=None, outputs=None)
+
+        _extend_list(run.inputs, stage_idx)
+        _extend_list(run.outputs, stage_idx)
+        if stage_idx == 0:
+            run.inputs[stage_idx] = (args, kwargs)
+        else:
+            run.inputs[stage_idx] =args
+        return StageRun(stage, inputs=run.inputs[stage_idx], outputs=None)
+
+    def _end_record(
+        self,
+        run: Run,
+        record: StageRun,
+        stage_idx: int,
+        res: Any,
+        runtime: float,
+    ) -> None:
+        record.runtime = runtime
+        if self.retention == "full":
+            run.outputs[stage_idx] = res
+            record.outputs = res
+        run.stages_run[stage_idx] = record
 
     def _run_stage(
         self, 
+        run: Run,
         stage: Stage, 
         stage_idx: int,
+        /,
         *args, 
         **kwargs
     ) -> tuple:
-        def _extend_list(data: list, index: int) -> list:
-            if index < len(data):
-                return data
-            while len(data) <= index:
-                data.append(None)
-            return data
+        hooks = run.hooks
+        if (
+            (self.retention == "none" or not run.sampled)
+            and self.stats_collector is None 
+            and self.tracer is None
+            and self.memory_profiler is None
+            and len(hooks) == 0
+        ):
+            try:
+                res = stage._execute(args, kwargs)
+            except _ANNOTATED_ERRORS as e:
+                e.add_note(f"--> Error at stage#{stage_idx}({stage.name})")
+                raise e
+        else:
+            call = self._start_stage(run, stage, stage_idx, args, kwargs)
+            try:
+                res = stage._execute(args, kwargs, call.record)
+                t2 = time.perf_counter_ns()
+            except Exception as e:
+                self._fail_stage(call, e)
+                raise e
+            self._end_stage(run, call, res, t2-call.t1)
 
-        _extend_list(self._run_inputs, stage_idx)
-        _extend_list(self._run_outputs, stage_idx)
-        _extend_list(self._stages_run, stage_idx)
+        if run.run_id is not None and self.checkpoint is not None:
+            self.checkpoint.save(run.run_id, stage_idx, stage.name, res)
+        return _as_args(res)
 
+    async def _arun_stage(
+        self, 
+        run: Run,
+        stage: Stage, 
+        stage_idx: int,
+        /,
+        *args, 
+        **kwargs
+    ) -> tuple:
+        call = self._start_stage(run, stage, stage_idx, args, kwargs)
         try:
-            if stage_idx == 0:
-                self._run_inputs[stage_idx] = (args, kwargs)
-            else:
-                self._run_inputs[stage_idx] =args
-
-            t1 = time.perf_counter_ns()
-            res = stage(*args, **kwargs)
+            res = await stage._aexecute(args, kwargs, call.record)
             t2 = time.perf_counter_ns()
+        except Exception as e:
+            self._fail_stage(call, e)
+            raise e
+        self._end_stage(run, call, res, t2-call.t1)
+
+        if run.run_id is not None and self.checkpoint is not None:
+            self.checkpoint.save(run.run_id, stage_idx, stage.name, res)
+        return _as_args(res)
 
-            self._run_outputs[stage_idx] = res
-            self._stages_run[stage_idx] = StageRun(
-                stage,
-                inputs=self._run_inputs[stage_idx],
-                outputs=self._run_outputs[stage_idx],
-                runtime=t2-t1,
+    def _start_stage(
+        self,
+        run: Run,
+        stage: Stage,
+        stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+        batch_size: int | None = None,
+    ) -> _StageCall:
+        """
+        Instrument a stage call (hooks, record, span, memory) before
+        it is executed; then _end_stage or _fail_stage close it.
+        """
+        call = _StageCall(stage, stage_idx, run.hooks)
+        for hook in call.hooks:
+            if hook.before is not None:
+                hook.before(stage, stage_idx, args, kwargs)
+        call.record = self._start_record(run, stage, stage_idx, args, kwargs)
+        tracer = call.tracer = self.tracer
+        if tracer is not None:
+            call.span, call.token = self._start_stage_span(
+                tracer, 
+                stage, 
+                stage_idx, 
+                batch_size,
             )
+        profiler = call.profiler = self.memory_profiler
+        if profiler is not None:
+            call.measure = profiler._start()
+        call.t1 = time.perf_counter_ns()
+        return call
 
-        except TypeError as e:
-            e.add_note(f"--> Error at stage#{stage_idx}({stage.name})")
-            raise e
-        if res is None:
-            res = tuple()
-        elif not isinstance(res, tuple):
-            res = (res, )
-        return res
+    def _end_stage(self, run: Run, call: _StageCall, res: Any, runtime: int) -> None:
+        stage, stage_idx, record = call.stage, call.stage_idx, call.record
+        if call.profiler is not None:
+            memory = call.profiler._end(call.measure, stage.name, res)
+            if record is not None:
+                record.memory = memory
+        if call.tracer is not None:
+            call.tracer._end(call.span, call.token)
+        for hook in call.hooks:
+            if hook.after is not None:
+                hook.after(stage, stage_idx, res, runtime)
+        if record is not None:
+            self._end_record(run, record, stage_idx, res, runtime)
+        if self.stats_collector is not None:
+            self.stats_collector.add_stage(stage.name, runtime)
 
-    def __call__(
-        self, 
-        *args, 
-        stop_at: int | str | None = None,
-        start_from: int | str | None = None,
-        resume_from: int | str | None = None,
-        **kwargs
-    ) -> Any:
+    def _fail_stage(
+        self,
+        call: _StageCall,
+        error: Exception,
+        annotated: tuple[type[Exception], ...] = _ANNOTATED_ERRORS,
+    ) -> None:
+        """Close the instrumentation of a stage call which raised `error`"""
+        runtime = time.perf_counter_ns() - call.t1
+        stage, stage_idx = call.stage, call.stage_idx
+        if call.profiler is not None:
+            call.profiler._end(call.measure)
+        if call.tracer is not None:
+            call.tracer._end(call.span, call.token, error)
+        for hook in call.hooks:
+            if hook.on_error is not None:
+                hook.on_error(stage, stage_idx, error, runtime)
+        if isinstance(error, annotated):
+            error.add_note(f"--> Error at stage#{stage_idx}({stage.name})")
+
+    def _start_stage_span(
+        self,
+        tracer: TraceRecorder,
+        stage: Stage,
+        stage_idx: int,
+        batch_size: int | None = None,
+    ) -> tuple[Any, Any]:
+        attributes: dict[str, Any] = {
+            "enpipe.pipeline": self.name,
+            "enpipe.stage_idx": stage_idx,
+        }
+        if batch_size is not None:
+            attributes["enpipe.batch_size"] = batch_size
+        return tracer._start(stage.name, "stage", attributes)
+
+    def _instrumented(self) -> bool:
+        """True if stage calls have to go through _run_stage (hooks, tracing, profiling)"""
+        return (
+            len(self._hooks) > 0 
+            or self.tracer is not None 
+            or self.memory_profiler is not None
+        )
+
+    def _compiled_matches(self) -> bool:
+        """
+        True if the compiled plan gives the same results as _run_stages,
+        i.e., no disabled stage follows the first enabled one (a compiled
+        plan skips it, _run_stages passes its inputs on with its kwargs)
+        """
+        _, stages = self._get_plan()
+        return all(stage.is_enabled for stage in stages)
+
+    def _sample_hooks(self) -> tuple[Hook, ...]:
+        return tuple(hook for hook in self._hooks if hook._sample())
+
+    def _prepare_run(
+        self,
+        args: tuple,
+        kwargs: dict[str, Any],
+        stop_at: int | str | None,
+        start_from: int | str | None,
+        resume_from: int | str | None,
+        run: Run | None,
+        run_id: str | None = None,
+    ) -> tuple[Run, tuple[Stage, ...], int, tuple, dict[str, Any]] | Run:
+        """
+        Returns the run to fill, the stages to execute, the index
+        of the first of them and its inputs (or just the run if
+        nothing has to be executed).
+        """
+        if self.validate_signatures and self._validated != self._version:
+            self.validate()
+        if run_id is not None and self.checkpoint is None:
+            raise ValueError("run_id requires a checkpoint store")
+
+        prev_run = run if run is not None else self._last_run
+        run = self._last_run = Run(run_id=run_id)
+        if self.sampling is not None:
+            run.sampled = self.sampling.sample()
+            if run.sampled:
+                self.sampling.add(run)
 
         # no stage registrered
         if len(self) == 0:
-            return None
+            return run
 
         if start_from is None:
             start_from = 0
@@ -194,79 +798,1025 @@ class Pipeline:
         first_stage_idx = start_from
         if resume_from is not None:
             resume_from = cast(int, self._convert_key_to_int(resume_from))
-            if resume_from > 0:
-                prev_stage_run = self.get_stages_run(resume_from-1)[0]
-                args = prev_stage_run.outputs
-                if args is None:
-                    args = tuple()
-                elif not isinstance(args, tuple):
-                    args = (args, )
+            if resume_from > 0 and run_id is not None:
+                prev_idx = resume_from - 1
+                args = _as_args(cast(CheckpointStore, self.checkpoint).load(
+                    run_id, 
+                    prev_idx, 
+                    self.names[prev_idx],
+                ))
                 kwargs = dict()
                 first_stage_idx = resume_from
-            else:
-                self._run_inputs = []
-                self._run_outputs = []
-                self._stages_run = []
+            elif resume_from > 0:
+                if self.retention != "full":
+                    raise ValueError(
+                        f"resume_from requires retention='full' "
+                        f"(found {self.retention!r})"
+                    )
+                prev_stages_run = self.get_stages_run(resume_from-1, run=prev_run)
+                if len(prev_stages_run) == 0:
+                    raise ValueError(
+                        f"No previous run of stage#{resume_from-1} to resume from"
+                    )
+                prev_stage_run = prev_stages_run[0]
+                args = _as_args(prev_stage_run.outputs)
+                kwargs = dict()
+                first_stage_idx = resume_from
+                # the stages before resume_from are shared with prev_run
+                run.inputs = prev_run.inputs[:resume_from]
+                run.outputs = prev_run.outputs[:resume_from]
+                run.stages_run = prev_run.stages_run[:resume_from]
         else:
-            self._run_inputs = []
-            self._run_outputs = [] 
-            self._stages_run = []
-
             # find first enabled stage
-            for idx in range(first_stage_idx, len(self)):
-                if self[idx].is_enabled:
-                    break
             # ...and return None if no stage is enabled
-            else:
-                return None
+            idx = self._first_enabled_stage(first_stage_idx)
+            if idx is None:
+                return run
             first_stage_idx = idx
 
         if stop_at is not None:
             stop_at = cast(int, self._convert_key_to_int(stop_at))
             if first_stage_idx >= stop_at:
-                return None
+                return run
         else:
             stop_at = len(self)
 
-        # run stages
         _stages = self.stages[first_stage_idx:stop_at]
+        return run, _stages, first_stage_idx, args, kwargs
+
+    def __call__(
+        self, 
+        *args, 
+        stop_at: int | str | None = None,
+        start_from: int | str | None = None,
+        resume_from: int | str | None = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run the pipeline and return the output of the last stage.
+        `resume_from` restarts from the outputs recorded by the last
+        run of the pipeline (see resume to pick the run or to restart
+        from a checkpoint store).
+        """
+        return self.run(
+            *args,
+            stop_at=stop_at,
+            start_from=start_from,
+            resume_from=resume_from,
+            **kwargs
+        ).result
+
+    def run(
+        self, 
+        *args, 
+        stop_at: int | str | None = None,
+        start_from: int | str | None = None,
+        resume_from: int | str | None = None,
+        **kwargs
+    ) -> Run:
+        """
+        Same as __call__ but returns the Run context of the invocation,
+        holding the result together with the StageRun records.
+        """
+        prepared = self._prepare_run(
+            args, 
+            kwargs, 
+            stop_at, 
+            start_from, 
+            resume_from,
+            None,
+        )
+        if isinstance(prepared, Run):
+            return prepared
+        new_run = prepared[0]
+        new_run.result = self._run_stages(*prepared)
+        return new_run
+
+    def run_checkpointed(self, run_id: str, /, *args, **kwargs) -> Run:
+        """
+        Same as run, saving the output of every stage in the checkpoint
+        store under `run_id`, so that the run can be resumed by another
+        process (see resume). The stage arguments follow `run_id`.
+        """
+        prepared = self._prepare_run(
+            args, 
+            kwargs, 
+            None, 
+            None, 
+            None,
+            None,
+            run_id,
+        )
+        if isinstance(prepared, Run):
+            return prepared
+        new_run = prepared[0]
+        new_run.result = self._run_stages(*prepared)
+        return new_run
+
+    def resume(
+        self,
+        resume_from: int | str,
+        run: Run | None = None,
+        *,
+        run_id: str | None = None,
+        stop_at: int | str | None = None,
+    ) -> Run:
+        """
+        Run the pipeline from stage `resume_from` on the outputs that
+        `run` (by default, the last run of the pipeline) recorded for
+        the previous stage, and return the new Run. The stages before
+        `resume_from` are shared with `run`, which is left untouched.
+        With a `run_id`, the outputs are loaded from the checkpoint
+        store instead (see run_checkpointed), e.g., in a new process,
+        and the new outputs are saved under the same `run_id`.
+        Unlike __call__, this takes no stage arguments, so the keywords
+        of the first stage never clash with its options.
+        """
+        if run is not None and not isinstance(run, Run):
+            raise TypeError(f"run must be a Run (found {type(run).__name__})")
+        if run is not None and run_id is not None:
+            raise ValueError("Provide either run or run_id, not both")
+        prepared = self._prepare_run(
+            tuple(), 
+            dict(), 
+            stop_at, 
+            None, 
+            resume_from,
+            run,
+            run_id,
+        )
+        if isinstance(prepared, Run):
+            return prepared
+        new_run = prepared[0]
+        new_run.result = self._run_stages(*prepared)
+        return new_run
 
-        next_args = self._run_stage(_stages[0], first_stage_idx, *args, **kwargs)
-        for idx, stage in enumerate(_stages[1:], start=first_stage_idx+1):
-            next_args = self._run_stage(stage, idx, *next_args)
+    async def acall(
+        self, 
+        *args, 
+        stop_at: int | str | None = None,
+        start_from: int | str | None = None,
+        resume_from: int | str | None = None,
+        sync_in_executor: bool = False,
+        **kwargs
+    ) -> Any:
+        """
+        Asynchronous counterpart of __call__.
 
-        if len(next_args) == 1:
-            return next_args[0]
-        elif len(next_args) == 0:
+        Stages returning an awaitable (e.g., coroutine functions) are
+        awaited. Synchronous stages run inline, or on the default
+        executor of the event loop when `sync_in_executor=True`.
+        """
+        prepared = self._prepare_run(
+            args, 
+            kwargs, 
+            stop_at, 
+            start_from, 
+            resume_from,
+            None,
+        )
+        if isinstance(prepared, Run):
             return None
-        return next_args
-    
+        self._check_no_fan_out(prepared[1], "acall")
+        new_run = prepared[0]
+        new_run.result = await self._arun_stages(
+            *prepared, 
+            sync_in_executor=sync_in_executor,
+        )
+        return new_run.result
+
+    def _first_enabled_stage(self, start: int = 0) -> int | None:
+        for idx in range(start, len(self)):
+            if self[idx].is_enabled:
+                return idx
+        return None
+
+    def _get_plan(self) -> tuple[int | None, tuple[Stage, ...]]:
+        """
+        Returns the index of the first enabled stage and the stages
+        to run from there, cached until the topology changes.
+        """
+        version, first_stage_idx, stages = self._plan
+        if version != self._version:
+            if self.validate_signatures and self._validated != self._version:
+                self.validate()
+            version = self._version
+            first_stage_idx = self._first_enabled_stage()
+            stages = (
+                self.stages[first_stage_idx:]
+                if first_stage_idx is not None
+                else tuple()
+            )
+            self._plan = (version, first_stage_idx, stages)
+        return first_stage_idx, stages
+
+    def _run_stages(
+        self,
+        run: Run,
+        stages: tuple[Stage, ...],
+        first_stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> Any:
+        """
+        Run `stages` as one run of the pipeline. When a fan-out stage
+        is reached, the run (span, stats) ends once the iterator over
+        the downstream results is exhausted.
+        """
+        tracer = self.tracer
+        if tracer is not None:
+            span, token = self._start_run_span(tracer, run, first_stage_idx, len(stages))
+        if len(self._hooks) > 0:
+            run.hooks = self._sample_hooks()
+        t1 = time.perf_counter_ns()
+        try:
+            result, fanned_out = self._run_chain(run, stages, first_stage_idx, args, kwargs)
+        except Exception as e:
+            if tracer is not None:
+                tracer._end(span, token, e)
+            raise e
+        runtime = time.perf_counter_ns() - t1
+        if fanned_out:
+            if tracer is not None:
+                tracer._suspend(token)
+            return self._consume_fan_out(
+                run, 
+                result, 
+                runtime, 
+                span if tracer is not None else None,
+            )
+        if tracer is not None:
+            tracer._end(span, token)
+        if self.stats_collector is not None:
+            self._add_run_stats(run, runtime)
+        return result
+
+    def _start_run_span(
+        self, 
+        tracer: TraceRecorder, 
+        run: Run, 
+        first_stage_idx: int, 
+        num_stages: int,
+    ) -> tuple[Span, Any]:
+        attributes: dict[str, Any] = {
+            "enpipe.first_stage_idx": first_stage_idx,
+            "enpipe.stages": num_stages,
+        }
+        if run.run_id is not None:
+            attributes["enpipe.run_id"] = run.run_id
+        return tracer._start(self.name or "Pipeline", "pipeline", attributes)
+
+    def _run_chain(
+        self,
+        run: Run,
+        stages: tuple[Stage, ...],
+        first_stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> tuple[Any, bool]:
+        """
+        Returns the result of `stages` and whether it is the iterator
+        over the downstream results of a fan-out stage
+        """
+        next_args, next_kwargs = args, kwargs
+        for idx, stage in enumerate(stages, start=first_stage_idx):
+            next_args = self._run_stage(run, stage, idx, *next_args, **next_kwargs)
+            next_kwargs = dict()
+            if stage._fanout and stage.is_enabled:
+                pos = idx - first_stage_idx + 1
+                return self._fan_out(run, next_args[0], stages[pos:], idx+1), True
+        return _unpack_result(next_args), False
+
+    def _fan_out(
+        self,
+        run: Run,
+        items: Iterator[Any],
+        stages: tuple[Stage, ...],
+        first_stage_idx: int,
+    ) -> Iterator[Any]:
+        """
+        Lazily pass each item yielded by a fan-out stage through the
+        downstream stages, flattening nested fan-outs.
+        """
+        for item in items:
+            if len(stages) == 0:
+                yield item
+                continue
+            res, fanned_out = self._run_chain(
+                run, stages, first_stage_idx, _as_args(item), dict(),
+            )
+            if fanned_out:
+                yield from res
+            else:
+                yield res
+
+    @staticmethod
+    def _check_no_fan_out(stages: Sequence[Stage], feature: str) -> None:
+        if any(stage._fanout and stage.is_enabled for stage in stages):
+            raise ValueError(f"Fan-out stages are not supported by {feature}")
+
+    def _consume_fan_out(
+        self,
+        run: Run,
+        results: Iterator[Any],
+        runtime: int,
+        span: Span | None,
+    ) -> Iterator[Any]:
+        """
+        Yield the results of a fan-out, then end the run: `runtime`
+        (the time spent before the fan-out) adds up the time spent
+        computing each result, and the downstream stages are traced
+        as children of the span of the run.
+        """
+        tracer = self.tracer
+        try:
+            while True:
+                if span is not None:
+                    token = cast(TraceRecorder, tracer)._resume(span)
+                t1 = time.perf_counter_ns()
+                try:
+                    res = next(results)
+                except StopIteration:
+                    break
+                finally:
+                    runtime += time.perf_counter_ns() - t1
+                    if span is not None:
+                        cast(TraceRecorder, tracer)._suspend(token)
+                yield res
+        except GeneratorExit:
+            # closed before the end
+            pass
+        except Exception as e:
+            if span is not None:
+                cast(TraceRecorder, tracer)._finish(span, e)
+            raise e
+        if span is not None:
+            cast(TraceRecorder, tracer)._finish(span)
+        if self.stats_collector is not None:
+            self._add_run_stats(run, runtime)
+
+    def _add_run_stats(self, run: Run, runtime: int) -> None:
+        cast(StatsCollector, self.stats_collector).add_run(
+            runtime,
+            [
+                stage_run.runtime if stage_run is not None else None
+                for stage_run in run.stages_run
+            ],
+        )
+
+    async def _arun_stages(
+        self,
+        run: Run,
+        stages: tuple[Stage, ...],
+        first_stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+        sync_in_executor: bool = False,
+    ) -> Any:
+        tracer = self.tracer
+        if tracer is None:
+            return await self._arun_stages_untraced(
+                run, stages, first_stage_idx, args, kwargs, sync_in_executor,
+            )
+        span, token = self._start_run_span(tracer, run, first_stage_idx, len(stages))
+        try:
+            res = await self._arun_stages_untraced(
+                run, stages, first_stage_idx, args, kwargs, sync_in_executor,
+            )
+        except Exception as e:
+            tracer._end(span, token, e)
+            raise e
+        tracer._end(span, token)
+        return res
+
+    async def _arun_stages_untraced(
+        self,
+        run: Run,
+        stages: tuple[Stage, ...],
+        first_stage_idx: int,
+        args: tuple,
+        kwargs: dict[str, Any],
+        sync_in_executor: bool,
+    ) -> Any:
+        if len(self._hooks) > 0:
+            run.hooks = self._sample_hooks()
+        # asyncio is imported only by the async API, to keep `import enpipe` light
+        import asyncio
+
+        t1 = time.perf_counter_ns()
+        loop = asyncio.get_running_loop()
+        next_args, next_kwargs = args, kwargs
+        for idx, stage in enumerate(stages, start=first_stage_idx):
+            if sync_in_executor and not inspect.iscoroutinefunction(stage.func):
+                next_args = await loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        # executors do not propagate context variables
+                        contextvars.copy_context().run,
+                        self._run_stage, 
+                        run, 
+                        stage, 
+                        idx, 
+                        *next_args, 
+                        **next_kwargs,
+                    ),
+                )
+            else:
+                next_args = await self._arun_stage(
+                    run, 
+                    stage, 
+                    idx, 
+                    *next_args, 
+                    **next_kwargs,
+                )
+            next_kwargs = dict()
+        if self.stats_collector is not None:
+            self._add_run_stats(run, time.perf_counter_ns() - t1)
+        return _unpack_result(next_args)
+
+    def _run_item(
+        self, 
+        item: Any, 
+        unpack: bool, 
+        on_error: OnError = "raise",
+        record: bool = True,
+    ) -> tuple[Any, Run]:
+        run = Run(sampled=record)
+        first_stage_idx, stages = self._get_plan()
+        if first_stage_idx is not None:
+            args = tuple(item) if unpack else (item, )
+            try:
+                run.result = self._run_stages(run, stages, first_stage_idx, args, dict())
+            except Exception as e:
+                if on_error == "raise":
+                    raise e
+                run.result = e
+        return run.result, run
+
+    def map(
+        self,
+        iterable: Iterable[Any],
+        *,
+        unpack: bool = False,
+        record: bool = True,
+        executor: Literal["thread", "process", "stages"] | None = None,
+        max_workers: int | None = None,
+        ordered: bool = True,
+        chunksize: int = 1,
+        queue_size: int = 16,
+        progress: bool = False,
+        on_error: OnError = "raise",
+        transport: SharedMemoryTransport | None = None,
+    ) -> Iterator[Any]:
+        """
+        Lazily run the pipeline on each item of `iterable`.
+
+        Each item is the single positional argument of the first stage,
+        or is unpacked as *args when `unpack=True`.
+        With `record=True` get_stages_run() reflects the last item
+        yielded (each item fills its own Run). With `record=False`
+        no StageRun is kept at all and items go through a compiled
+        plan (see Pipeline.compile) when it gives the same results,
+        i.e., unless a disabled stage follows an enabled one.
+
+        When running sequentially, consecutive items are grouped for the
+        batch stages (see Stage.batch_size/batch_wait): each of them is
+        called once per batch while the other stages run per item. The
+        items are processed in chunks of the largest batch size, each
+        chunk being one run for the hooks (see Hook.every) and the
+        recorded StageRun objects.
+
+        `executor="thread"` runs items concurrently on a pool of
+        `max_workers` threads, each item with its own Run so that
+        concurrent items do not share bookkeeping. Results are
+        yielded in input order, or as soon as they complete when
+        `ordered=False`.
+
+        `executor="process"` runs items on a pool of `max_workers`
+        processes. The pipeline is pickled once and shipped to each
+        worker at startup, items travel in lists of `chunksize`, and
+        with `record=True` the StageRun runtimes measured by the workers
+        are collected back (inputs and outputs are not). Items and results
+        carrying large buffers (e.g., NumPy arrays) can be moved through
+        shared memory rather than pipes with a SharedMemoryTransport.
+
+        `executor="stages"` runs the pipeline as an assembly line: each
+        stage has its own worker thread and hands its outputs
+        downstream through queues bounded to `queue_size` items, so
+        stage k works on item i while stage k-1 works on item i+1.
+        Results follow the input order.
+
+        `progress=True` displays a progress bar over the items with
+        their rate (and the per-stage throughput when the pipeline has
+        a stats collector). It requires the `rich` package.
+
+        `on_error="return"` yields the exception raised by an item
+        (e.g., a StageTimeoutError) in place of its result and moves
+        on to the next items, instead of stopping the map. With batch
+        stages, a failed batch call fails all the items of the batch.
+        """
+        if on_error not in ON_ERROR_MODES:
+            raise ValueError(f"Unknown on_error {on_error!r}")
+        if transport is not None and executor != "process":
+            raise ValueError("transport requires executor='process'")
+        _, stages = self._get_plan()
+        if executor in ("process", "stages"):
+            self._check_no_fan_out(stages, f"executor={executor!r}")
+        elif executor is None and any(
+            stage.batch_size is not None and stage.is_enabled 
+            for stage in stages
+        ):
+            self._check_no_fan_out(stages, "batch stages")
+        if progress:
+            # imported only on demand, to keep `import enpipe` light
+            from enpipe.richprogress import ItemsProgressBar
+            bar = ItemsProgressBar(
+                total=len(iterable) if isinstance(iterable, Sized) else None,
+                description=self.name,
+                stages_info=(
+                    self._progress_stages_info 
+                    if self.stats_collector is not None 
+                    else None
+                ),
+            )
+        if executor is None:
+            results = self._map_sequential(iterable, unpack, record, on_error)
+        elif executor == "process":
+            results = self._map_processes(
+                self._pickle(),
+                iterable, 
+                unpack, 
+                record, 
+                max_workers, 
+                ordered,
+                chunksize,
+                on_error,
+                transport,
+            )
+        elif executor == "stages":
+            results = self._map_stages(iterable, unpack, record, queue_size, on_error)
+        elif executor == "thread":
+            results = self._map_threads(
+                iterable, 
+                unpack, 
+                record, 
+                max_workers, 
+                ordered,
+                on_error,
+            )
+        else:
+            raise ValueError(f"Unknown executor {executor!r}")
+        if progress:
+            return bar.track_items(results)
+        return results
+
+    def _progress_stages_info(self) -> str:
+        return "  ".join(
+            f"{row.name}: {row.throughput:,.1f}/s"
+            for row in cast(StatsCollector, self.stats_collector).summary()
+        )
+
+    async def amap(
+        self,
+        iterable: Iterable[Any] | AsyncIterable[Any],
+        *,
+        concurrency: int = 8,
+        unpack: bool = False,
+        ordered: bool = True,
+        sync_in_executor: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Asynchronous counterpart of map, keeping up to `concurrency`
+        items in flight on the running event loop (see acall).
+        Each item has its own Run; get_stages_run() reflects the last
+        item yielded.
+        """
+        import asyncio
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self._check_no_fan_out(self._get_plan()[1], "amap")
+
+        async def _run_item(item: Any) -> tuple[Any, Run]:
+            run = Run()
+            first_stage_idx, stages = self._get_plan()
+            if first_stage_idx is None:
+                return None, run
+            args = tuple(item) if unpack else (item, )
+            res = await self._arun_stages(
+                run, 
+                stages, 
+                first_stage_idx, 
+                args, 
+                dict(), 
+                sync_in_executor=sync_in_executor,
+            )
+            return res, run
+
+        async def _items() -> AsyncIterator[Any]:
+            if isinstance(iterable, AsyncIterable):
+                async for item in iterable:
+                    yield item
+            else:
+                for item in iterable:
+                    yield item
+
+        pending: deque[asyncio.Task] = deque()
+        running: set[asyncio.Task] = set()
+        try:
+            async for item in _items():
+                task = asyncio.ensure_future(_run_item(item))
+                if ordered:
+                    pending.append(task)
+                    if len(pending) >= concurrency:
+                        res, self._last_run = await pending.popleft()
+                        yield res
+                else:
+                    running.add(task)
+                    if len(running) >= concurrency:
+                        done, running = await asyncio.wait(
+                            running, 
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                        for task in done:
+                            res, self._last_run = task.result()
+                            yield res
+            while pending:
+                res, self._last_run = await pending.popleft()
+                yield res
+            while running:
+                done, running = await asyncio.wait(
+                    running, 
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    res, self._last_run = task.result()
+                    yield res
+        finally:
+            for task in (*pending, *running):
+                task.cancel()
+
+    def _map_threads(
+        self,
+        iterable: Iterable[Any],
+        unpack: bool,
+        record: bool,
+        max_workers: int | None,
+        ordered: bool,
+        on_error: OnError = "raise",
+    ) -> Iterator[Any]:
+        if not record and not self._instrumented() and self._compiled_matches():
+            compiled = self.compile()
+            if unpack:
+                func = lambda item: compiled(*item)
+            else:
+                func = compiled
+            if on_error == "return":
+                func = _returning_errors(func)
+            yield from thread_map(
+                func, 
+                iterable, 
+                max_workers=max_workers, 
+                ordered=ordered,
+            )
+            return
+
+        func = functools.partial(
+            self._run_item, 
+            unpack=unpack, 
+            on_error=on_error, 
+            record=record,
+        )
+        if self.tracer is not None:
+            # nest the runs of the items under the span of the caller
+            func = _in_context(func)
+        for res, run in thread_map(
+            func, 
+            iterable, 
+            max_workers=max_workers, 
+            ordered=ordered,
+        ):
+            if record:
+                self._last_run = run
+            yield res
+
+    def _map_stages(
+        self,
+        iterable: Iterable[Any],
+        unpack: bool,
+        record: bool,
+        queue_size: int,
+        on_error: OnError = "raise",
+    ) -> Iterator[Any]:
+        first_stage_idx, stages = self._get_plan()
+        if first_stage_idx is None:
+            for _ in iterable:
+                yield None
+            return
+        # each item travels along the line together with its own Run
+        def _start(item: Any) -> tuple[Run, tuple]:
+            run = Run(sampled=record)
+            if len(self._hooks) > 0:
+                run.hooks = self._sample_hooks()
+            return run, tuple(item) if unpack else (item, )
+
+        def _call(stage: Stage, stage_idx: int, run: Run, args: tuple) -> tuple:
+            if (
+                record 
+                or len(run.hooks) > 0 
+                or self._instrumented() 
+                or self.stats_collector is not None
+            ):
+                return self._run_stage(run, stage, stage_idx, *args)
+            try:
+                return _as_args(stage._execute(args, dict()))
+            except _ANNOTATED_ERRORS as e:
+                e.add_note(f"--> Error at stage#{stage_idx}({stage.name})")
+                raise e
+
+        def _step(
+            stage: Stage, 
+            stage_idx: int, 
+            data: tuple[Run, tuple | Exception],
+        ) -> tuple[Run, tuple | Exception]:
+            run, args = data
+            if isinstance(args, Exception):
+                # the item failed upstream (on_error="return")
+                return data
+            if on_error == "raise":
+                return run, _call(stage, stage_idx, run, args)
+            try:
+                return run, _call(stage, stage_idx, run, args)
+            except Exception as e:
+                return run, e
+
+        steps = [_start] + [
+            functools.partial(_step, stage, idx)
+            for idx, stage in enumerate(stages, start=first_stage_idx)
+        ]
+        for run, args in assembly_line(steps, iterable, queue_size=queue_size):
+            res = args if isinstance(args, Exception) else _unpack_result(args)
+            if record:
+                run.result = res
+                self._last_run = run
+            yield res
+
+    def _map_processes(
+        self,
+        payload: bytes,
+        iterable: Iterable[Any],
+        unpack: bool,
+        record: bool,
+        max_workers: int | None,
+        ordered: bool,
+        chunksize: int,
+        on_error: OnError = "raise",
+        transport: SharedMemoryTransport | None = None,
+    ) -> Iterator[Any]:
+        stages = self.stages
+        # items packed into shared memory and not yet loaded by a worker
+        pending: dict[str, SharedPayload] = dict()
+
+        def _pack(iterable: Iterable[Any]) -> Iterator[SharedPayload]:
+            for item in iterable:
+                packed = cast(SharedMemoryTransport, transport).pack(item)
+                if packed.segment is not None:
+                    pending[packed.segment] = packed
+                yield packed
+
+        results = process_map(
+            functools.partial(
+                _process_worker_run, 
+                unpack=unpack, 
+                # the runtimes feed the stats collector even if not recorded
+                record=record or self.stats_collector is not None, 
+                on_error=on_error,
+                transport=transport,
+            ),
+            iterable if transport is None else _pack(iterable),
+            max_workers=max_workers,
+            ordered=ordered,
+            chunksize=chunksize,
+            initializer=_process_worker_init,
+            initargs=(payload, ),
+            discard=None if transport is None else _release_result,
+        )
+        try:
+            for res, runtimes, consumed in results:
+                if consumed is not None:
+                    del pending[consumed]
+                if transport is not None:
+                    res = transport.unpack(res)
+                if runtimes is not None and self.stats_collector is not None:
+                    for stage, runtime in zip(stages, runtimes):
+                        if runtime is not None:
+                            self.stats_collector.add_stage(stage.name, runtime)
+                    self.stats_collector.add_run(
+                        sum(runtime for runtime in runtimes if runtime is not None),
+                        runtimes,
+                    )
+                if record and runtimes is not None and self.retention != "none":
+                    self._last_run = Run(
+                        inputs=[None] * len(runtimes),
+                        outputs=[None] * len(runtimes),
+                        stages_run=[
+                            StageRun(stage, None, None, runtime)
+                            if runtime is not None
+                            else None
+                            for stage, runtime in zip(stages, runtimes)
+                        ],
+                    )
+                yield res
+        finally:
+            results.close()
+            for packed in pending.values():
+                SharedMemoryTransport.release(packed)
+
+    def _pickle(self) -> bytes:
+        for idx, stage in enumerate(self.stages):
+            try:
+                pickle.dumps(stage)
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                err = pickle.PicklingError(
+                    f"Stage#{idx}({stage.name}) cannot be pickled"
+                )
+                err.add_note(
+                    "--> Processes require stages defined at module level "
+                    "(no lambdas or local functions)"
+                )
+                raise err from e
+        return pickle.dumps(self)
+
+    def _map_sequential(
+        self,
+        iterable: Iterable[Any],
+        unpack: bool,
+        record: bool,
+        on_error: OnError = "raise",
+    ) -> Iterator[Any]:
+        _, stages = self._get_plan()
+        if any(
+            stage.batch_size is not None and stage.is_enabled 
+            for stage in stages
+        ):
+            yield from self._map_batched(iterable, unpack, record, on_error)
+            return
+
+        if not record and not self._instrumented() and self._compiled_matches():
+            compiled: Callable = self.compile()
+            if on_error == "return":
+                compiled = _returning_errors(compiled)
+            for item in iterable:
+                if unpack:
+                    yield compiled(*item)
+                else:
+                    yield compiled(item)
+            return
+
+        run_stages: Callable = self._run_stages
+        if on_error == "return":
+            run_stages = _returning_errors(run_stages)
+
+        for item in iterable:
+            # without record, only hooks, stats, ... to feed
+            run = Run(sampled=record)
+            if record:
+                self._last_run = run
+            first_stage_idx, stages = self._get_plan()
+            if first_stage_idx is None:
+                yield None
+                continue
+            args = tuple(item) if unpack else (item, )
+            run.result = run_stages(run, stages, first_stage_idx, args, dict())
+            yield run.result
+
+    def _map_batched(
+        self,
+        iterable: Iterable[Any],
+        unpack: bool,
+        record: bool,
+        on_error: OnError = "raise",
+    ) -> Iterator[Any]:
+        """
+        Process the items in chunks: batch stages are called once per
+        (sub)batch of the chunk, scalar stages once per item.
+        Items failed with on_error="return" skip the following stages.
+        """
+        first_stage_idx, stages = self._get_plan()
+        batch_stages = [
+            stage 
+            for stage in stages 
+            if stage.batch_size is not None and stage.is_enabled
+        ]
+        chunk_size = max(cast(int, stage.batch_size) for stage in batch_stages)
+        waits = [
+            stage.batch_wait 
+            for stage in batch_stages 
+            if stage.batch_wait is not None
+        ]
+        max_wait = min(waits) if len(waits) > 0 else None
+
+        run_stage: Callable = self._run_stage
+        run_batch_stage: Callable = self._run_batch_stage
+        if on_error == "return":
+            run_stage = _returning_errors(run_stage)
+            run_batch_stage = _returning_errors(run_batch_stage)
+
+        for chunk in collect_batches(iterable, chunk_size, max_wait):
+            # the hooks are sampled once per chunk, as a chunk is one run
+            # of the batch stages
+            run = Run(sampled=record)
+            if record:
+                self._last_run = run
+            if len(self._hooks) > 0:
+                run.hooks = self._sample_hooks()
+            items_args: list[tuple | Exception] = [
+                tuple(item) if unpack else (item, ) 
+                for item in chunk
+            ]
+            for idx, stage in enumerate(stages, start=cast(int, first_stage_idx)):
+                if stage.batch_size is None or not stage.is_enabled:
+                    items_args = [
+                        args 
+                        if isinstance(args, Exception) 
+                        else run_stage(run, stage, idx, *args)
+                        for args in items_args
+                    ]
+                    continue
+                pending = [
+                    pos 
+                    for pos, args in enumerate(items_args) 
+                    if not isinstance(args, Exception)
+                ]
+                for start in range(0, len(pending), stage.batch_size):
+                    positions = pending[start:start+stage.batch_size]
+                    batch = [
+                        _batch_item(cast(tuple, items_args[pos]))
+                        for pos in positions
+                    ]
+                    outputs = run_batch_stage(run, stage, idx, batch)
+                    for num, pos in enumerate(positions):
+                        if isinstance(outputs, Exception):
+                            items_args[pos] = outputs
+                        else:
+                            items_args[pos] = _as_args(outputs[num])
+            for args in items_args:
+                if isinstance(args, Exception):
+                    yield args
+                else:
+                    yield _unpack_result(args)
+
+    def _run_batch_stage(
+        self,
+        run: Run,
+        stage: Stage,
+        stage_idx: int,
+        batch: list[Any],
+    ) -> Sequence[Any]:
+        call = self._start_stage(run, stage, stage_idx, (batch, ), dict(), len(batch))
+        try:
+            res = stage._call_batch(batch, call.record)
+            t2 = time.perf_counter_ns()
+            if len(res) != len(batch):
+                raise ValueError(
+                    f"Batch stage returned {len(res)} outputs "
+                    f"for {len(batch)} inputs"
+                )
+        except Exception as e:
+            self._fail_stage(call, e, (*_ANNOTATED_ERRORS, ValueError))
+            raise e
+        self._end_stage(run, call, res, t2-call.t1)
+        return res
+
     @overload
-    def get_stages_run(self, *keys: int) -> list[StageRun]:
+    def get_stages_run(self, *keys: int, run: Run | None = None) -> list[StageRun]:
         ...
 
     @overload
-    def get_stages_run(self, *keys: str) -> list[StageRun]:
+    def get_stages_run(self, *keys: str, run: Run | None = None) -> list[StageRun]:
         ...
 
-    def get_stages_run(self, *keys):
+    def get_stages_run(self, *keys, run=None):
         """
         Returns StageRun objects excluding disabled stages.
         If not key is provided, returns all StageRun objects.
+        If no run is provided, uses the last run of the pipeline.
         """
+        if run is None:
+            run = self._last_run
+        stages_run = run.stages_run
         if len(keys) == 0:
-            return self._stages_run
+            return stages_run
 
-        keys = {
-            self._convert_key_to_str(k)
-            for k in keys
-        }
-
-        data = [
-            run
-            for run in self._stages_run
-            if run is not None and run.stage.name in keys
-        ]
+        # stages_run is indexed by stage position: no scan needed
+        indices = sorted({self._convert_key_to_int(k) for k in keys})
+        data = []
+        for idx in indices:
+            if idx < len(stages_run):
+                stage_run = stages_run[idx]
+                # the run may predate a change of the pipeline structure
+                if stage_run is not None and stage_run.stage.name == self._names[idx]:
+                    data.append(stage_run)
         return data
 
     @overload
@@ -284,6 +1834,7 @@ class Pipeline:
         """Enable specific stages"""
         for k in keys:
             self[k].is_enabled = True
+        self._version += 1
 
     @overload
     @validate_key
@@ -302,6 +1853,81 @@ class Pipeline:
             keys = range(0, len(self))
         for k in keys:
             self[k].is_enabled = False
+        self._version += 1
+
+    def add_hook(
+        self,
+        before: BeforeHook | None = None,
+        after: AfterHook | None = None,
+        on_error: ErrorHook | None = None,
+        *,
+        every: int = 1,
+    ) -> Hook:
+        """
+        Register callbacks invoked around each stage (see Hook), only on
+        every Nth run if `every` > 1. Hooks are not invoked by compiled
+        pipelines nor by process workers. Returns the hook, to pass to
+        remove_hook.
+        """
+        hook = Hook(before, after, on_error, every=every)
+        self._hooks = (*self._hooks, hook)
+        return hook
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Unregister a hook returned by add_hook"""
+        if hook not in self._hooks:
+            raise ValueError(f"{hook!r} is not registered")
+        self._hooks = tuple(h for h in self._hooks if h is not hook)
+
+    def stats(self) -> list[StageSummary]:
+        """
+        Returns the per-stage runtime statistics (count, mean, quantiles,
+        throughput) aggregated by the stats collector of the pipeline.
+        """
+        if self.stats_collector is None:
+            raise ValueError("No stats collector attached to the pipeline")
+        return self.stats_collector.summary()
+
+    def validate(self) -> None:
+        """
+        Check that each enabled stage accepts the number of arguments
+        returned by the previous enabled stage, as told by its return
+        annotation (a tuple[...] of N types is passed as N arguments),
+        raising a StageSignatureError listing every incompatible pair.
+        As when the pipeline runs, a disabled stage following an enabled
+        one adds its kwargs (a dict) to the arguments it passes on.
+        Stages whose annotation or signature is not available are
+        not checked.
+        """
+        issues = check_stages(self.stages)
+        if len(issues) > 0:
+            raise StageSignatureError(issues)
+        self._validated = self._version
+
+    def memory_summary(self) -> list[MemorySummary]:
+        """
+        Returns the per-stage memory statistics (peak and net allocation,
+        output size) of the memory profiler of the pipeline, ranked by
+        peak allocation.
+        """
+        if self.memory_profiler is None:
+            raise ValueError("No memory profiler attached to the pipeline")
+        return self.memory_profiler.summary()
+
+    def cache_info(self) -> dict[str, CacheInfo]:
+        """Returns the cache counters of the stages with a cache"""
+        return {
+            stage.name: stage.cache.info()
+            for stage in self.stages
+            if stage.cache is not None
+        }
+
+    def compile(self) -> CompiledPipeline:
+        """
+        Snapshot the enabled stages into a flat execution plan.
+        See CompiledPipeline.
+        """
+        return CompiledPipeline(self)
 
     def __repr__(self) -> str:
         return "".join([
@@ -311,11 +1937,285 @@ class Pipeline:
         ])
 
 
+class CompiledPipeline:
+    """
+    Flat execution plan of the enabled stages of a Pipeline.
+
+    Disabled stages are skipped outright (their inputs flow to the
+    next enabled stage) and no StageRun is recorded, so the per-call
+    cost is close to a hand-written chain of function calls.
+    The plan is rebuilt automatically when Pipeline.enable/disable
+    change which stages are enabled; toggling Stage.is_enabled
+    directly requires calling Pipeline.compile() again.
+
+    When the pipeline has a stats collector, the stage runtimes are
+    aggregated as well (no RunRecord is kept).
+    """
+    def __init__(self, pipeline: Pipeline):
+        self.pipeline = pipeline
+        self._version = -1
+        self._head: tuple[int, Stage, Callable] | None = None
+        self._tail: tuple[tuple[int, Stage, Callable], ...] = tuple()
+        self._stats_collector: StatsCollector | None = None
+        self._build()
+
+    def _build(self) -> None:
+        pipeline = self.pipeline
+        if pipeline.validate_signatures:
+            # the plan skips the disabled stages
+            issues = check_stages(pipeline.stages, skip_disabled=True)
+            if len(issues) > 0:
+                raise StageSignatureError(issues)
+        collector = pipeline.stats_collector
+        plan = tuple(
+            (
+                idx, 
+                stage, 
+                _timed(
+                    stage.func if stage._is_plain() else stage._invoke, 
+                    stage.name, 
+                    collector,
+                ),
+            )
+            for idx, stage in enumerate(self.pipeline.stages)
+            if stage.is_enabled
+        )
+        self._head = plan[0] if len(plan) > 0 else None
+        self._tail = plan[1:]
+        self._plan = plan
+        self._fanout = any(stage._fanout for _, stage, _ in plan)
+        self._version = self.pipeline._version
+        self._stats_collector = collector
+
+    @property
+    def stages(self) -> tuple[Stage, ...]:
+        if self._version != self.pipeline._version:
+            self._build()
+        if self._head is None:
+            return tuple()
+        return (self._head[1], *(stage for _, stage, _ in self._tail))
+
+    def __call__(self, *args, **kwargs) -> Any:
+        if (
+            self._version != self.pipeline._version
+            or self._stats_collector is not self.pipeline.stats_collector
+        ):
+            self._build()
+        if self._head is None:
+            return None
+        if self._fanout:
+            return _compiled_run(self._plan, args, kwargs)
+
+        idx, stage, func = self._head
+        try:
+            res = func(*args, **kwargs)
+            for idx, stage, func in self._tail:
+                if res is None:
+                    res = func()
+                elif isinstance(res, tuple):
+                    res = func(*res)
+                else:
+                    res = func(res)
+        except _ANNOTATED_ERRORS as e:
+            e.add_note(f"--> Error at stage#{idx}({stage.name})")
+            raise e
+
+        if isinstance(res, tuple):
+            if len(res) == 1:
+                return res[0]
+            elif len(res) == 0:
+                return None
+        return res
+
+    def __repr__(self) -> str:
+        return "".join([
+            "CompiledPipeline(",
+            ", ".join(map(repr, self.stages)),
+            ")"
+        ])
+
+
+def _timed(
+    func: Callable, 
+    name: str, 
+    collector: StatsCollector | None,
+) -> Callable:
+    """Wrap `func` to add its runtimes to `collector` (if any)"""
+    if collector is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        t1 = time.perf_counter_ns()
+        res = func(*args, **kwargs)
+        collector.add_stage(name, time.perf_counter_ns() - t1)
+        return res
+    return wrapper
+
+
+def _compiled_run(
+    plan: tuple[tuple[int, Stage, Callable], ...],
+    args: tuple,
+    kwargs: dict[str, Any],
+) -> Any:
+    """Run a compiled plan which might contain fan-out stages"""
+    if len(plan) == 0:
+        return _unpack_result(args)
+
+    res: Any = None
+    for pos, (idx, stage, func) in enumerate(plan):
+        try:
+            if pos == 0:
+                res = func(*args, **kwargs)
+            else:
+                res = func(*_as_args(res))
+        except _ANNOTATED_ERRORS as e:
+            e.add_note(f"--> Error at stage#{idx}({stage.name})")
+            raise e
+        if stage._fanout:
+            return _compiled_fan_out(plan[pos+1:], res)
+    return _unpack_result(_as_args(res))
+
+
+def _compiled_fan_out(
+    plan: tuple[tuple[int, Stage, Callable], ...],
+    items: Iterator[Any],
+) -> Iterator[Any]:
+    nested = any(stage._fanout for _, stage, _ in plan)
+    for item in items:
+        res = _compiled_run(plan, _as_args(item), dict())
+        if nested:
+            yield from res
+        else:
+            yield res
+
+
+def _in_context(func: Callable) -> Callable:
+    """Wrap `func` to run in (a copy of) the current context from any thread"""
+    ctx = contextvars.copy_context()
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        return ctx.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def _returning_errors(func: Callable) -> Callable:
+    """Wrap `func` to return the exceptions it raises"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            return e
+    return wrapper
+
+
+def _extend_list(data: list, index: int) -> list:
+    if index < len(data):
+        return data
+    while len(data) <= index:
+        data.append(None)
+    return data
+
+
+def _as_args(res: Any) -> tuple:
+    if res is None:
+        return tuple()
+    elif not isinstance(res, tuple):
+        return (res, )
+    return res
+
+
+def _batch_item(args: tuple) -> Any:
+    """The element representing one item in the list given to a batch stage"""
+    return args[0] if len(args) == 1 else args
+
+
+def _unpack_result(res: tuple) -> Any:
+    if len(res) == 1:
+        return res[0]
+    elif len(res) == 0:
+        return None
+    return res
+
+
+_worker_pipeline: Pipeline | None = None
+_worker_compiled: CompiledPipeline | None = None
+
+
+def _process_worker_init(payload: bytes) -> None:
+    global _worker_pipeline, _worker_compiled
+    _worker_pipeline = cast(Pipeline, pickle.loads(payload))
+    if _worker_pipeline.retention == "none":
+        # the runtimes are still sent back for the stats collector
+        _worker_pipeline.retention = "timings"
+    _worker_compiled = (
+        _worker_pipeline.compile() 
+        if _worker_pipeline._compiled_matches() 
+        else None
+    )
+
+
+def _process_worker_run(
+    item: Any, 
+    unpack: bool, 
+    record: bool,
+    on_error: OnError = "raise",
+    transport: SharedMemoryTransport | None = None,
+) -> tuple[Any, list[float | None] | None, str | None]:
+    """
+    Returns the result, the stage runtimes (if recorded) and the
+    shared memory segment of the item consumed (if any)
+    """
+    consumed = None
+    if transport is not None:
+        consumed = item.segment
+        item = transport.unpack(item)
+
+    res, runtimes = _process_worker_call(item, unpack, record, on_error)
+    if transport is not None:
+        res = transport.pack(res)
+    return res, runtimes, consumed
+
+
+def _release_result(result: tuple[Any, Any, str | None]) -> None:
+    """Release the segment of a result of the workers never unpacked"""
+    SharedMemoryTransport.release(result[0])
+
+
+def _process_worker_call(
+    item: Any, 
+    unpack: bool, 
+    record: bool,
+    on_error: OnError,
+) -> tuple[Any, list[float | None] | None]:
+    assert _worker_pipeline is not None
+    if not record and _worker_compiled is not None:
+        try:
+            if unpack:
+                return _worker_compiled(*item), None
+            return _worker_compiled(item), None
+        except Exception as e:
+            if on_error == "raise":
+                raise e
+            return e, None
+
+    res, run = _worker_pipeline._run_item(item, unpack, on_error)
+    if not record:
+        return res, None
+    runtimes = [
+        stage_run.runtime if stage_run is not None else None
+        for stage_run in run.stages_run
+    ]
+    return res, runtimes
+
+
 def make_pipeline(
-    *funcs: Callable
+    *funcs: Callable,
+    retention: Retention = "full",
 ) -> Pipeline:
     stages = [
         Stage(func)
         for func in funcs
     ]
-    return Pipeline(*stages)
+    return Pipeline(*stages, retention=retention)
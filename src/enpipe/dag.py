@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+from typing import Any
+
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+from dataclasses import dataclass, field
+
+import functools
+import inspect
+import time
+
+from enpipe.core import Stage, StageRun, _as_args, _unpack_result
+
+
+@dataclass(repr=False)
+class Node(Stage):
+    """
+    A Stage of a Graph. Its positional inputs are the outputs of the
+    nodes listed in `depends_on` (in order); nodes without dependencies
+    receive the inputs of the graph.
+    """
+    depends_on: tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        if isinstance(self.depends_on, str):
+            self.depends_on = (self.depends_on, )
+        self.depends_on = tuple(dict.fromkeys(self.depends_on))
+
+
+@dataclass
+class GraphRun:
+    """StageRun records and result of one Graph invocation"""
+    stages_run: dict[str, StageRun] = field(default_factory=dict)
+    result: Any = None
+
+
+class Graph:
+    """
+    Stages connected by named dependencies (a DAG).
+
+    Independent branches run concurrently on a thread pool (or on the
+    event loop with acall), and a node with several dependencies joins
+    their outputs: each of them is one positional argument. A node with
+    a single dependency receives its output unpacked, as in a Pipeline.
+    The result is the output of the only sink node, or a dict
+    name -> output if the graph has several sinks. Disabled nodes
+    forward their inputs.
+    """
+    def __init__(
+        self,
+        *nodes: Node,
+        name: str | None = None,
+        max_workers: int | None = None,
+    ):
+        self.name = name if name is not None else ""
+        self.max_workers = max_workers
+        self._nodes: dict[str, Node] = dict()
+        for node in nodes:
+            if node.name in self._nodes:
+                raise ValueError(f"Duplicated node {node.name!r}")
+            self._nodes[node.name] = node
+        for node in nodes:
+            for dep in node.depends_on:
+                if dep not in self._nodes:
+                    raise KeyError(f"Node {node.name!r} depends on unknown node {dep!r}")
+
+        self._dependents: dict[str, list[str]] = {name: [] for name in self._nodes}
+        for node in nodes:
+            for dep in node.depends_on:
+                self._dependents[dep].append(node.name)
+        self._order = self._toposort()
+        self.sinks = tuple(
+            name 
+            for name in self._order 
+            if len(self._dependents[name]) == 0
+        )
+        self._last_run = GraphRun()
+
+    def _toposort(self) -> tuple[str, ...]:
+        indegree = {
+            name: len(node.depends_on) 
+            for name, node in self._nodes.items()
+        }
+        ready = deque(name for name, deg in indegree.items() if deg == 0)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent in self._dependents[name]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self._nodes):
+            cycle = sorted(name for name, deg in indegree.items() if deg > 0)
+            raise ValueError(f"Cycle detected among nodes {cycle}")
+        return tuple(order)
+
+    @property
+    def nodes(self) -> tuple[Node, ...]:
+        return tuple(self._nodes[name] for name in self._order)
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return self._order
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __getitem__(self, key: str) -> Node:
+        if key not in self._nodes:
+            raise KeyError(f"Stage {key} not available")
+        return self._nodes[key]
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def _node_inputs(
+        self,
+        node: Node,
+        outputs: dict[str, Any],
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> tuple[tuple, dict[str, Any]]:
+        if len(node.depends_on) == 0:
+            return args, kwargs
+        if len(node.depends_on) == 1:
+            return _as_args(outputs[node.depends_on[0]]), dict()
+        return tuple(outputs[dep] for dep in node.depends_on), dict()
+
+    def _run_node(
+        self, 
+        node: Node, 
+        args: tuple, 
+        kwargs: dict[str, Any],
+    ) -> StageRun:
+        record = StageRun(node, inputs=(args, kwargs), outputs=None)
+        try:
+            t1 = time.perf_counter_ns()
+            if node.is_enabled:
+                res = node._execute(args, kwargs, record)
+            else:
+                res = _unpack_result(args)
+            t2 = time.perf_counter_ns()
+        except Exception as e:
+            e.add_note(f"--> Error at node({node.name})")
+            raise e
+        record.outputs = res
+        record.runtime = t2 - t1
+        return record
+
+    def _result(self, outputs: dict[str, Any]) -> Any:
+        if len(self.sinks) == 1:
+            return outputs[self.sinks[0]]
+        return {name: outputs[name] for name in self.sinks}
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.run(*args, **kwargs).result
+
+    def run(
+        self, 
+        *args, 
+        executor: Executor | None = None, 
+        **kwargs
+    ) -> GraphRun:
+        """
+        Run the graph on a thread pool (a new one with `max_workers`
+        threads, unless an `executor` is provided).
+        """
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                return self.run(*args, executor=pool, **kwargs)
+
+        run = self._last_run = GraphRun()
+        if len(self._nodes) == 0:
+            return run
+
+        outputs: dict[str, Any] = dict()
+        missing = {
+            name: len(node.depends_on) 
+            for name, node in self._nodes.items()
+        }
+        running: dict[Future, str] = dict()
+
+        def _submit(name: str) -> None:
+            node = self._nodes[name]
+            node_args, node_kwargs = self._node_inputs(node, outputs, args, kwargs)
+            fut = executor.submit(self._run_node, node, node_args, node_kwargs)
+            running[fut] = name
+
+        try:
+            for name in self._order:
+                if missing[name] == 0:
+                    _submit(name)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    record = fut.result()
+                    run.stages_run[name] = record
+                    outputs[name] = record.outputs
+                    for dependent in self._dependents[name]:
+                        missing[dependent] -= 1
+                        if missing[dependent] == 0:
+                            _submit(dependent)
+        finally:
+            for fut in running:
+                fut.cancel()
+
+        run.result = self._result(outputs)
+        return run
+
+    async def acall(self, *args, **kwargs) -> Any:
+        """
+        Run the graph on the running event loop: nodes returning an
+        awaitable are awaited, synchronous nodes run on the default
+        executor of the loop.
+        """
+        import asyncio
+
+        run = self._last_run = GraphRun()
+        if len(self._nodes) == 0:
+            return None
+
+        loop = asyncio.get_running_loop()
+        outputs: dict[str, Any] = dict()
+        tasks: dict[str, asyncio.Future] = dict()
+
+        async def _run(name: str) -> None:
+            node = self._nodes[name]
+            if len(node.depends_on) > 0:
+                await asyncio.gather(*(tasks[dep] for dep in node.depends_on))
+            node_args, node_kwargs = self._node_inputs(node, outputs, args, kwargs)
+            if node.is_enabled and inspect.iscoroutinefunction(node.func):
+                record = StageRun(node, inputs=(node_args, node_kwargs), outputs=None)
+                try:
+                    t1 = time.perf_counter_ns()
+                    res = await node._aexecute(node_args, node_kwargs, record)
+                    t2 = time.perf_counter_ns()
+                except Exception as e:
+                    e.add_note(f"--> Error at node({node.name})")
+                    raise e
+                record.outputs = res
+                record.runtime = t2 - t1
+            else:
+                record = await loop.run_in_executor(
+                    None,
+                    functools.partial(self._run_node, node, node_args, node_kwargs),
+                )
+            run.stages_run[name] = record
+            outputs[name] = record.outputs
+
+        # nodes are created in topological order, so dependencies
+        # are always available in `tasks`
+        for name in self._order:
+            tasks[name] = asyncio.ensure_future(_run(name))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        run.result = self._result(outputs)
+        return run.result
+
+    def get_stages_run(
+        self, 
+        *names: str, 
+        run: GraphRun | None = None,
+    ) -> list[StageRun]:
+        """
+        Returns the StageRun of the given nodes (or of all nodes,
+        in topological order) for `run` (by default, the last run).
+        """
+        if run is None:
+            run = self._last_run
+        if len(names) == 0:
+            names = self._order
+        return [run.stages_run[name] for name in names if name in run.stages_run]
+
+    def critical_path(self, run: GraphRun | None = None) -> list[StageRun]:
+        """
+        Returns the chain of dependent nodes with the largest total
+        runtime, i.e., the one bounding the latency of the graph.
+        """
+        if run is None:
+            run = self._last_run
+        cost: dict[str, float] = dict()
+        prev: dict[str, str | None] = dict()
+        for name in self._order:
+            if name not in run.stages_run:
+                continue
+            best, best_dep = 0.0, None
+            for dep in self._nodes[name].depends_on:
+                if dep in cost and cost[dep] > best:
+                    best, best_dep = cost[dep], dep
+            cost[name] = best + run.stages_run[name].runtime
+            prev[name] = best_dep
+        if len(cost) == 0:
+            return []
+
+        name: str | None = max(cost, key=cost.__getitem__)
+        path = []
+        while name is not None:
+            path.append(run.stages_run[name])
+            name = prev[name]
+        return path[::-1]
+
+    def __repr__(self) -> str:
+        return "".join([
+            "Graph(",
+            ", ".join(
+                f"{node!r} <- {list(node.depends_on)}"
+                for node in self.nodes
+            ),
+            ")"
+        ])
+
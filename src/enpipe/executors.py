@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+from typing import Callable, Any, Iterable, Iterator, Sequence
+
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+import contextvars
+import functools
+import itertools
+import os
+import queue
+import threading
+import time
+
+
+def _default_max_workers() -> int:
+    # same default as concurrent.futures.ThreadPoolExecutor
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def thread_map(
+    func: Callable[[Any], Any],
+    iterable: Iterable[Any],
+    *,
+    max_workers: int | None = None,
+    ordered: bool = True,
+) -> Iterator[Any]:
+    """
+    Apply `func` to each item of `iterable` on a pool of threads.
+
+    At most 2*max_workers items are in flight, so the input is consumed
+    lazily. Results follow the input order when `ordered=True`,
+    otherwise they are yielded as soon as they complete.
+    """
+    if max_workers is None:
+        max_workers = _default_max_workers()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from _bounded_map(pool, func, iterable, 2 * max_workers, ordered)
+
+
+def process_map(
+    func: Callable[[Any], Any],
+    iterable: Iterable[Any],
+    *,
+    max_workers: int | None = None,
+    ordered: bool = True,
+    chunksize: int = 1,
+    initializer: Callable[..., None] | None = None,
+    initargs: tuple = (),
+    discard: Callable[[Any], None] | None = None,
+) -> Iterator[Any]:
+    """
+    Apply `func` to each item of `iterable` on a pool of processes.
+
+    Items are shipped to the workers in lists of `chunksize` items
+    to amortize the IPC cost; `func` (and `initializer`) must be
+    picklable. Ordering and input consumption follow thread_map.
+    If the consumer stops early, the results already computed (or
+    being computed) are passed to `discard`, if any.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # loads multiprocessing, not needed by the other executors
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=initializer,
+        initargs=initargs,
+    ) as pool:
+        for results in _bounded_map(
+            pool,
+            functools.partial(_apply_chunk, func),
+            _chunked(iterable, chunksize),
+            2 * max_workers,
+            ordered,
+            None if discard is None else functools.partial(_discard_chunk, discard),
+        ):
+            yield from results
+
+
+def assembly_line(
+    steps: Sequence[Callable[[Any], Any]],
+    iterable: Iterable[Any],
+    *,
+    queue_size: int = 16,
+) -> Iterator[Any]:
+    """
+    Pass each item of `iterable` through `steps`, each step running
+    on its own thread and handing its outputs to the next one through
+    a queue bounded to `queue_size` items.
+
+    Step k processes item i while step k-1 processes item i+1, so the
+    throughput is bounded by the slowest step rather than by the sum
+    of all of them, and the queue bounds provide backpressure.
+    Results follow the input order. An exception raised by a step
+    stops the line and is re-raised to the consumer.
+    """
+    if queue_size < 1:
+        raise ValueError("queue_size must be >= 1")
+
+    queues: list[queue.Queue] = [
+        queue.Queue(maxsize=queue_size)
+        for _ in range(len(steps) + 1)
+    ]
+    stop = threading.Event()
+
+    def _feed() -> None:
+        try:
+            for item in iterable:
+                if not _put(queues[0], item, stop):
+                    return
+        except BaseException as e:
+            _put(queues[0], _Failure(e), stop)
+        _put(queues[0], _END, stop)
+
+    def _work(step: Callable[[Any], Any], inq: queue.Queue, outq: queue.Queue) -> None:
+        while True:
+            item = _get(inq, stop)
+            if item is _END or stop.is_set():
+                _put(outq, _END, stop)
+                return
+            if not isinstance(item, _Failure):
+                try:
+                    item = step(item)
+                except BaseException as e:
+                    item = _Failure(e)
+            if not _put(outq, item, stop):
+                return
+
+    threads = [threading.Thread(target=_feed, daemon=True)]
+    for step, inq, outq in zip(steps, queues[:-1], queues[1:]):
+        threads.append(threading.Thread(target=_work, args=(step, inq, outq), daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = _get(queues[-1], stop)
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def collect_batches(
+    iterable: Iterable[Any], 
+    size: int, 
+    max_wait: float | None = None,
+) -> Iterator[list[Any]]:
+    """
+    Group consecutive items of `iterable` in lists of up to `size` items.
+    With `max_wait`, a list is yielded as soon as `max_wait` seconds
+    elapsed since its first item was received, even if no other item
+    arrives: the items are then pulled by a thread reading at most
+    `size` items ahead.
+    """
+    if max_wait is None:
+        yield from _chunked(iterable, size)
+        return
+
+    items: queue.Queue = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def _feed() -> None:
+        try:
+            for item in iterable:
+                if not _put(items, item, stop):
+                    return
+        except BaseException as e:
+            _put(items, _Failure(e), stop)
+        _put(items, _END, stop)
+
+    thread = threading.Thread(target=_feed, daemon=True)
+    thread.start()
+    try:
+        chunk: list[Any] = []
+        deadline = 0.0
+        while True:
+            if len(chunk) == 0:
+                item = _get(items, stop)
+            else:
+                try:
+                    item = items.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    yield chunk
+                    chunk = []
+                    continue
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exc
+            if len(chunk) == 0:
+                deadline = time.monotonic() + max_wait
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_END = object()
+# how often blocked threads check whether the line was stopped
+_POLL_INTERVAL = 0.05
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def _apply_chunk(func: Callable[[Any], Any], chunk: list[Any]) -> list[Any]:
+    return [func(item) for item in chunk]
+
+
+def _chunked(iterable: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def _bounded_map(
+    pool: Executor,
+    func: Callable[[Any], Any],
+    iterable: Iterable[Any],
+    window: int,
+    ordered: bool,
+    discard: Callable[[Any], None] | None = None,
+) -> Iterator[Any]:
+    if ordered:
+        pending: deque[Future] = deque()
+        try:
+            for item in iterable:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            _abandon(pending, discard)
+    else:
+        # futures whose result has not been yielded yet
+        running: set[Future] = set()
+        try:
+            for item in iterable:
+                running.add(pool.submit(func, item))
+                if len(running) >= window:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        running.discard(fut)
+                        yield fut.result()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    running.discard(fut)
+                    yield fut.result()
+        finally:
+            _abandon(running, discard)
+
+
+def _abandon(
+    futures: Iterable[Future], 
+    discard: Callable[[Any], None] | None,
+) -> None:
+    """Cancel the futures, passing the results of those already started to `discard`"""
+    for fut in futures:
+        if fut.cancel() or discard is None:
+            continue
+        try:
+            res = fut.result()
+        except BaseException:
+            continue
+        discard(res)
+
+
+def _discard_chunk(discard: Callable[[Any], None], results: list[Any]) -> None:
+    for res in results:
+        discard(res)
+
+
+def call_with_timeout(
+    func: Callable[..., Any],
+    args: tuple,
+    timeout: float,
+) -> tuple[bool, Any]:
+    """
+    Call func(*args) on a daemon thread, waiting at most `timeout`
+    seconds. Returns (True, result), or (False, None) if the call did
+    not complete in time: its thread is then abandoned (Python threads
+    cannot be killed) and its outcome discarded. Exceptions raised by
+    func are re-raised.
+    """
+    done = threading.Event()
+    outcome: list[tuple[bool, Any]] = []
+
+    def _target() -> None:
+        try:
+            outcome.append((True, func(*args)))
+        except BaseException as e:
+            outcome.append((False, e))
+        finally:
+            done.set()
+
+    # run within a copy of the caller context, as a direct call would
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(_target, ), daemon=True).start()
+    if not done.wait(timeout):
+        return False, None
+    ok, value = outcome[0]
+    if not ok:
+        raise value
+    return True, value
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any, Callable, TYPE_CHECKING
+
+import itertools
+
+if TYPE_CHECKING:
+    from enpipe.core import Stage
+
+
+BeforeHook = Callable[["Stage", int, tuple, dict], None]
+AfterHook = Callable[["Stage", int, Any, int], None]
+ErrorHook = Callable[["Stage", int, BaseException, int], None]
+
+
+class Hook:
+    """
+    Callbacks invoked around the stages of a Pipeline run
+
+        before(stage, stage_idx, args, kwargs)
+        after(stage, stage_idx, result, runtime_ns)
+        on_error(stage, stage_idx, exception, runtime_ns)
+
+    With `every` > 1 the hook is active only on every Nth run
+    (the first run included); the other runs do not invoke it.
+    Pipeline.map with batch stages counts the chunks of items it
+    runs together rather than the items.
+    """
+    def __init__(
+        self,
+        before: BeforeHook | None = None,
+        after: AfterHook | None = None,
+        on_error: ErrorHook | None = None,
+        every: int = 1,
+    ):
+        if every < 1:
+            raise ValueError("every must be >= 1")
+        self.before = before
+        self.after = after
+        self.on_error = on_error
+        self.every = every
+        self._counter = itertools.count()
+
+    def _sample(self) -> bool:
+        """True if the next run has to invoke the hook"""
+        if self.every == 1:
+            return True
+        return next(self._counter) % self.every == 0
+
+    def __repr__(self) -> str:
+        callbacks = ", ".join(
+            f"{name}={getattr(func, '__name__', func)}"
+            for name, func in (
+                ("before", self.before), 
+                ("after", self.after), 
+                ("on_error", self.on_error),
+            )
+            if func is not None
+        )
+        return f"Hook({callbacks}, every={self.every})"
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from typing import Any
+
+from collections import deque
+from dataclasses import dataclass
+
+import sys
+import threading
+import tracemalloc
+import types
+
+from enpipe.stats import _format_table
+
+
+# referenced by values without being part of them
+_NOT_OWNED = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.CodeType,
+)
+
+
+@dataclass
+class StageMemory:
+    """Memory measured during one stage call, in bytes"""
+    peak: int
+    net: int
+    output_size: int | None
+
+
+@dataclass
+class MemorySummary:
+    name: str
+    count: int
+    peak_max: int
+    peak_mean: float
+    net_mean: float
+    net_total: int
+    output_size_max: int | None
+
+
+class _StageMemoryStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.peak_max = 0
+        self.peak_total = 0
+        self.net_total = 0
+        self.output_size_max: int | None = None
+
+    def add(self, memory: StageMemory) -> None:
+        self.count += 1
+        self.peak_max = max(self.peak_max, memory.peak)
+        self.peak_total += memory.peak
+        self.net_total += memory.net
+        if memory.output_size is not None:
+            self.output_size_max = max(self.output_size_max or 0, memory.output_size)
+
+
+class _Measure:
+    __slots__ = ("start", "peak")
+
+    def __init__(self, start: int):
+        self.start = start
+        # highest traced memory seen while nested measures reset the peak
+        self.peak = start
+
+
+class MemoryProfiler:
+    """
+    Measure the memory allocated by each stage call of the pipelines
+    it is attached to (Pipeline(memory_profiler=...)).
+
+    Around every stage call the peak and net traced allocation are read
+    from tracemalloc (started on the first call if not already tracing,
+    with `frames` frames per traceback), and with `output_size` the
+    approximate deep size of the output is computed (see deep_sizeof).
+    The values are stored on the StageRun of the call and aggregated per
+    stage (see summary). Compiled pipelines and process workers are not
+    measured, and stages called concurrently (thread executors,
+    async stages) share the process-wide tracemalloc counters, so their
+    measurements overlap.
+    """
+    def __init__(self, output_size: bool = True, frames: int = 1):
+        self.output_size = output_size
+        self.frames = frames
+        self._stages: dict[str, _StageMemoryStats] = dict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_stages"] = dict()
+        state["_started"] = False
+        del state["_lock"], state["_local"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self) -> None:
+        """Start tracemalloc (it is stopped by stop only if started here)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+
+    def stop(self) -> None:
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _start(self) -> _Measure:
+        if not tracemalloc.is_tracing():
+            self.start()
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if len(stack) > 0:
+            # resetting the peak below would hide it from the enclosing call
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        measure = _Measure(current)
+        stack.append(measure)
+        return measure
+
+    def _end(
+        self,
+        measure: _Measure,
+        name: str | None = None,
+        output: Any = None,
+    ) -> StageMemory:
+        """Close `measure`; unless `name` is None, aggregate it for the stage"""
+        current, peak = tracemalloc.get_traced_memory()
+        stack: list[_Measure] = self._local.stack
+        stack.pop()
+        peak = max(peak, measure.peak)
+        if len(stack) > 0:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        memory = StageMemory(
+            peak=peak - measure.start,
+            net=current - measure.start,
+            output_size=(
+                deep_sizeof(output)
+                if self.output_size and name is not None
+                else None
+            ),
+        )
+        if name is not None:
+            with self._lock:
+                stats = self._stages.get(name)
+                if stats is None:
+                    stats = self._stages[name] = _StageMemoryStats(name)
+                stats.add(memory)
+        return memory
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def summary(self) -> list[MemorySummary]:
+        """Per-stage memory statistics, the stage with the highest peak first"""
+        rows = [
+            MemorySummary(
+                name=stats.name,
+                count=stats.count,
+                peak_max=stats.peak_max,
+                peak_mean=stats.peak_total / stats.count,
+                net_mean=stats.net_total / stats.count,
+                net_total=stats.net_total,
+                output_size_max=stats.output_size_max,
+            )
+            for stats in list(self._stages.values())
+        ]
+        rows.sort(key=lambda row: row.peak_max, reverse=True)
+        return rows
+
+    def table(self) -> str:
+        """Format summary() as a text table (sizes in KiB)"""
+        header = ("stage", "count", "peak max", "peak mean", "net mean", "output max")
+        lines = [header]
+        for row in self.summary():
+            lines.append((
+                row.name,
+                str(row.count),
+                *(
+                    f"{value / 1024:.1f}" if value is not None else "-"
+                    for value in (
+                        row.peak_max,
+                        row.peak_mean,
+                        row.net_mean,
+                        row.output_size_max,
+                    )
+                ),
+            ))
+        return _format_table(lines)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    Approximate size in bytes of `obj` and of the objects it references
+    through containers (tuple, list, set, dict, deque) and instance
+    attributes (__dict__, __slots__). Shared objects are counted once,
+    and modules, classes and functions (shared state rather than data
+    owned by `obj`) are not counted at all.
+    """
+    seen: set[int] = set()
+    size = 0
+    todo = [obj]
+    while len(todo) > 0:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_OWNED):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (tuple, list, set, frozenset, deque)):
+            todo.extend(obj)
+        else:
+            attrs = getattr(obj, "__dict__", None)
+            if isinstance(attrs, dict):
+                todo.append(attrs)
+            slots = getattr(type(obj), "__slots__", ())
+            for slot in (slots, ) if isinstance(slots, str) else slots:
+                if hasattr(obj, slot):
+                    todo.append(getattr(obj, slot))
+    return size
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import random
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How a Stage retries a failed call: up to `max_attempts` calls in
+    total, waiting `backoff` * `multiplier`**(attempt-1) seconds between
+    them, randomized by +/- `jitter` (a fraction of the delay) so that
+    concurrent retries spread out, and capped at `max_backoff`.
+    Only the exceptions in `retry_on` are retried.
+    """
+    max_attempts: int = 3
+    backoff: float = 0.1
+    multiplier: float = 2.0
+    max_backoff: float = 10.0
+    jitter: float = 0.1
+    retry_on: tuple[type[BaseException], ...] = (Exception, )
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be >= 1")
+        if self.backoff < 0 or self.max_backoff < 0:
+            raise ValueError("backoff must be >= 0")
+        if self.multiplier < 1:
+            raise ValueError("multiplier must be >= 1")
+        if not 0 <= self.jitter <= 1:
+            raise ValueError("jitter must be in [0, 1]")
+        if isinstance(self.retry_on, type):
+            self.retry_on = (self.retry_on, )
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """True if the call failing with `error` at `attempt` (1-based) is retried"""
+        return attempt < self.max_attempts and isinstance(error, self.retry_on)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the failure of `attempt` (1-based)"""
+        delay = self.backoff * self.multiplier ** (attempt - 1)
+        if self.jitter > 0:
+            delay *= 1 + self.jitter * (2 * random.random() - 1)
+        return min(delay, self.max_backoff)
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from typing import Sequence, Self
+from typing import Any, Callable, Iterable, Iterator, Sequence, Self
+
+import time
 
 from rich.progress import (
     Progress,
+    TaskID,
     TextColumn,
     BarColumn,
     MofNCompleteColumn,
@@ -45,3 +48,64 @@ class ProgressBar(Progress):
             super().update(self._task_id, advance=1)
             if self._task.completed < len(self._steps):
                 self._task.description = self._steps[int(self._task.completed)]
+
+
+class ItemsProgressBar(Progress):
+    """
+    Progress over the items of Pipeline.map, with the items/sec rate
+    and (optionally) a per-stage throughput line.
+
+    Rendering is throttled: the bar is refreshed at most once every
+    `refresh_interval` seconds, regardless of the item rate.
+    """
+    def __init__(
+        self,
+        total: int | None,
+        description: str = "",
+        refresh_interval: float = 0.1,
+        stages_info: Callable[[], str] | None = None,
+    ):
+        super().__init__(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[rate]}"),
+            TextColumn("elapsed"),
+            TimeElapsedColumn(),
+            TextColumn("{task.fields[stages]}"),
+            auto_refresh=False,
+        )
+        self._total = total
+        self._description = description
+        self._refresh_interval = refresh_interval
+        self._stages_info = stages_info
+
+    def _update(self, task_id: TaskID, completed: int, elapsed: float) -> None:
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        self.update(
+            task_id,
+            completed=completed,
+            rate=f"{rate:,.1f} items/s",
+            stages=self._stages_info() if self._stages_info is not None else "",
+        )
+        self.refresh()
+
+    def track_items(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Yield from `items` advancing the bar"""
+        with self:
+            task_id = self.add_task(
+                self._description, 
+                total=self._total, 
+                rate="", 
+                stages="",
+            )
+            started = last = time.monotonic()
+            completed = 0
+            for item in items:
+                completed += 1
+                now = time.monotonic()
+                if now - last >= self._refresh_interval:
+                    last = now
+                    self._update(task_id, completed, now - started)
+                yield item
+            self._update(task_id, completed, time.monotonic() - started)
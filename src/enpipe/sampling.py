@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+from collections import deque
+
+import itertools
+import random
+
+if TYPE_CHECKING:
+    from enpipe.core import Run
+
+
+class SamplingPolicy:
+    """
+    Select the pipeline calls recording StageRun data: a `rate`
+    fraction of them (drawn from a generator seeded with `seed`, so
+    that the selection is reproducible) or every `every`-th call
+    (the first one included). The other calls record nothing.
+
+    The last `maxlen` sampled runs are kept in `runs`.
+    """
+    def __init__(
+        self,
+        rate: float | None = None,
+        every: int | None = None,
+        seed: int | None = None,
+        maxlen: int = 100,
+    ):
+        if (rate is None) == (every is None):
+            raise ValueError("Exactly one of rate and every is required")
+        if rate is not None and not 0 <= rate <= 1:
+            raise ValueError("rate must be in [0, 1]")
+        if every is not None and every < 1:
+            raise ValueError("every must be >= 1")
+        if maxlen < 1:
+            raise ValueError("maxlen must be >= 1")
+        self.rate = rate
+        self.every = every
+        self.seed = seed
+        self.runs: deque[Run] = deque(maxlen=maxlen)
+        self._random = random.Random(seed)
+        self._counter = itertools.count()
+        self.calls = 0
+        self.sampled = 0
+
+    def sample(self) -> bool:
+        """True if the next call has to be recorded"""
+        self.calls += 1
+        if self.every is not None:
+            res = next(self._counter) % self.every == 0
+        else:
+            res = self._random.random() < cast(float, self.rate)
+        if res:
+            self.sampled += 1
+        return res
+
+    def add(self, run: Run) -> None:
+        self.runs.append(run)
+
+    def clear(self) -> None:
+        """Drop the sampled runs and restart the selection"""
+        self.runs.clear()
+        self._random = random.Random(self.seed)
+        self._counter = itertools.count()
+        self.calls = 0
+        self.sampled = 0
+
+    def __repr__(self) -> str:
+        policy = f"rate={self.rate}" if self.rate is not None else f"every={self.every}"
+        return f"SamplingPolicy({policy}, sampled={self.sampled}/{self.calls})"
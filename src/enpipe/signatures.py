@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Sequence, TYPE_CHECKING
+
+import collections.abc
+import functools
+import inspect
+import types
+import typing
+
+if TYPE_CHECKING:
+    from enpipe.core import Stage
+
+
+# annotations of the items yielded by fan-out stages and of the
+# outputs returned by batch stages
+_ITERATORS = (
+    collections.abc.Iterator,
+    collections.abc.Iterable,
+    collections.abc.Generator,
+)
+_SEQUENCES = (list, tuple, collections.abc.Sequence)
+# Optional[X], X | Y
+_UNIONS = (typing.Union, getattr(types, "UnionType", typing.Union))
+
+
+def _signature(func: Callable) -> inspect.Signature | None:
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+
+def _return_annotation(func: Callable) -> Any:
+    """The resolved return annotation of `func`, or Any if unknown"""
+    while isinstance(func, functools.partial):
+        func = func.func
+    if not (inspect.isfunction(func) or inspect.ismethod(func)):
+        func = getattr(type(func), "__call__", func)
+    try:
+        return typing.get_type_hints(func).get("return", Any)
+    except Exception:
+        # e.g., builtins or annotations referring to undefined names
+        return Any
+
+
+def _element(annotation: Any, origins: tuple[type, ...]) -> Any:
+    """The element type of Iterator[X], list[X], ... (Any if unknown)"""
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) in origins and len(args) > 0:
+        if len(args) == 2 and args[1] is Ellipsis:
+            return args[0]
+        if typing.get_origin(annotation) is not tuple:
+            return args[0]
+    return Any
+
+
+def _arity(annotation: Any) -> int | None:
+    """Number of arguments an output of type `annotation` is passed as"""
+    if annotation is Any or isinstance(annotation, (str, typing.TypeVar)):
+        return None
+    if annotation is None or annotation is type(None):
+        return 0
+    if annotation in (tuple, typing.Tuple) or typing.get_origin(annotation) in _UNIONS:
+        return None
+    if typing.get_origin(annotation) is tuple:
+        args = typing.get_args(annotation)
+        if len(args) == 2 and args[1] is Ellipsis:
+            return None
+        # tuple[()] is an empty tuple
+        return 0 if args in ((), ((), )) else len(args)
+    return 1
+
+
+def output_arity(stage: Stage) -> int | None:
+    """
+    Number of positional arguments the output of `stage` is passed to
+    the next stage with (per item for fan-out and batch stages), or
+    None if it cannot be told from the return annotation.
+    """
+    annotation = _return_annotation(stage.func)
+    if stage._fanout:
+        annotation = _element(annotation, _ITERATORS)
+    elif stage.batch_size is not None:
+        annotation = _element(annotation, _SEQUENCES)
+    return _arity(annotation)
+
+
+def accepts(stage: Stage, num_args: int) -> bool | None:
+    """
+    True if `stage` can be called with `num_args` positional arguments
+    (None if its signature is not available)
+    """
+    if stage.batch_size is not None:
+        # the items are collected in a list
+        num_args = 1
+    signature = _signature(stage.func)
+    if signature is None:
+        return None
+    try:
+        signature.bind(*(None for _ in range(num_args)))
+    except TypeError:
+        return False
+    return True
+
+
+def check_stages(stages: Sequence[Stage], skip_disabled: bool = False) -> list[str]:
+    """
+    Check that every enabled stage accepts the number of arguments it
+    receives from the previous enabled stage, according to the return
+    annotations. A disabled stage after the first enabled one passes
+    its inputs on together with its kwargs (one more argument, a dict),
+    unless `skip_disabled` (as in compiled plans).
+    Returns a description of each incompatible pair of stages.
+    """
+    issues = []
+    prev: tuple[int, Stage] | None = None
+    num_args: int | None = None
+    disabled: list[str] = []
+    for idx, stage in enumerate(stages):
+        if prev is None and not stage.is_enabled:
+            continue
+        if not stage.is_enabled:
+            if not skip_disabled:
+                disabled.append(f"stage#{idx}({stage.name})")
+            continue
+        if prev is not None and num_args is not None:
+            prev_idx, prev_stage = prev
+            received = num_args + len(disabled)
+            if accepts(stage, received) is False:
+                through = (
+                    f", passed on by disabled {', '.join(disabled)} "
+                    f"together with their kwargs ({received} argument(s)),"
+                    if len(disabled) > 0
+                    else ""
+                )
+                issues.append(
+                    f"stage#{prev_idx}({prev_stage.name}) -> "
+                    f"stage#{idx}({stage.name}): "
+                    f"{prev_stage.name} returns {num_args} value(s){through} "
+                    f"but {stage.name}{_signature(stage.func)} does not accept them"
+                )
+        prev = (idx, stage)
+        num_args = output_arity(stage)
+        disabled = []
+    return issues
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+from collections import deque
+from dataclasses import dataclass
+
+import threading
+import time
+
+# log-linear histogram of nanoseconds: values below 16 have their own
+# bucket, larger values use 8 buckets per power of 2 (<=12.5% error)
+_SUB_BUCKETS = 8
+_NUM_BUCKETS = 16 + (64 - 4) * _SUB_BUCKETS
+
+
+def _bucket(value: int) -> int:
+    if value < 16:
+        return max(value, 0)
+    shift = value.bit_length() - 4
+    return 16 + (shift - 1) * _SUB_BUCKETS + ((value >> shift) - 8)
+
+
+def _bucket_value(bucket: int) -> float:
+    """Returns the midpoint of the values falling into `bucket`"""
+    if bucket < 16:
+        return float(bucket)
+    shift = (bucket - 16) // _SUB_BUCKETS + 1
+    low = (8 + (bucket - 16) % _SUB_BUCKETS) << shift
+    return low + (1 << shift) / 2
+
+
+class StageStats:
+    """Runtime accumulator of a stage with fixed memory footprint"""
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0
+        self.min = -1
+        self.max = -1
+        self._histogram = [0] * _NUM_BUCKETS
+
+    def add(self, runtime: int) -> None:
+        runtime = int(runtime)
+        self.count += 1
+        self.total += runtime
+        if self.min < 0 or runtime < self.min:
+            self.min = runtime
+        if runtime > self.max:
+            self.max = runtime
+        self._histogram[_bucket(runtime)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0 <= q <= 1) of the runtimes"""
+        if self.count == 0:
+            return float("nan")
+        target = q * self.count
+        cumsum = 0
+        for bucket, cnt in enumerate(self._histogram):
+            cumsum += cnt
+            if cnt > 0 and cumsum >= target:
+                # the estimate cannot exceed the observed range
+                return min(max(_bucket_value(bucket), self.min), self.max)
+        return float(self.max)
+
+
+@dataclass
+class StageSummary:
+    name: str
+    count: int
+    total: float
+    mean: float
+    min: float
+    max: float
+    p50: float
+    p95: float
+    p99: float
+    throughput: float
+
+
+@dataclass
+class RunRecord:
+    timestamp: float
+    runtime: int
+    stages_runtime: tuple[int | None, ...]
+
+
+class StatsCollector:
+    """
+    Aggregate per-stage runtimes (nanoseconds) across many runs.
+
+    Each stage keeps count, total, min/max and a fixed-size histogram
+    for the quantiles, while the last `history` runs are kept in a
+    ring buffer of RunRecord. Memory does not grow with the number
+    of runs.
+    """
+    def __init__(self, history: int = 1000):
+        self.history = history
+        self._stages: dict[str, StageStats] = dict()
+        self.runs: deque[RunRecord] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, runtime: int) -> None:
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats(name)
+            stats.add(runtime)
+
+    def add_run(
+        self, 
+        runtime: int, 
+        stages_runtime: Sequence[int | None] = (),
+    ) -> None:
+        self.runs.append(RunRecord(time.time(), runtime, tuple(stages_runtime)))
+
+    def __getitem__(self, name: str) -> StageStats:
+        return self._stages[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self.runs.clear()
+
+    def summary(self) -> list[StageSummary]:
+        rows = []
+        for stats in list(self._stages.values()):
+            rows.append(StageSummary(
+                name=stats.name,
+                count=stats.count,
+                total=stats.total,
+                mean=stats.total / stats.count,
+                min=stats.min,
+                max=stats.max,
+                p50=stats.quantile(0.50),
+                p95=stats.quantile(0.95),
+                p99=stats.quantile(0.99),
+                throughput=(
+                    1e9 * stats.count / stats.total
+                    if stats.total > 0
+                    else float("inf")
+                ),
+            ))
+        return rows
+
+    def table(self) -> str:
+        """Format summary() as a text table (times in microseconds)"""
+        header = ("stage", "count", "mean", "min", "p50", "p95", "p99", "max", "items/s")
+        lines = [header]
+        for row in self.summary():
+            lines.append((
+                row.name,
+                str(row.count),
+                *(
+                    f"{value / 1e3:.1f}"
+                    for value in (row.mean, row.min, row.p50, row.p95, row.p99, row.max)
+                ),
+                f"{row.throughput:.1f}",
+            ))
+        return _format_table(lines)
+
+
+def _format_table(lines: Sequence[Sequence[str]]) -> str:
+    """Align `lines` (the header first) in columns, the first one to the left"""
+    widths = [max(len(line[idx]) for line in lines) for idx in range(len(lines[0]))]
+    return "\n".join(
+        "  ".join(
+            value.ljust(width) if idx == 0 else value.rjust(width)
+            for idx, (value, width) in enumerate(zip(line, widths))
+        )
+        for line in lines
+    )
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import Any, Iterator
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import json
+import os
+import random
+import threading
+import time
+
+
+@dataclass
+class Span:
+    """A pipeline run or a stage call, with wall-clock timestamps in ns"""
+    name: str
+    kind: str
+    trace_id: int
+    span_id: int
+    parent_id: int | None
+    start: int
+    end: int = -1
+    pid: int = 0
+    tid: int = 0
+    thread_name: str = ""
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+
+# span enclosing the code being executed (in this thread or task)
+_current_span: ContextVar[Span | None] = ContextVar("enpipe_span", default=None)
+
+
+class TraceRecorder:
+    """
+    Record a Span for each pipeline run and stage call of the pipelines
+    it is attached to (Pipeline(tracer=...)), keeping the last `maxlen`.
+
+    Spans carry the process and thread ids, and nest through context
+    variables: the stages of a pipeline are children of its run, and
+    a pipeline called from within a stage is a child of that stage.
+    Spans can be exported to the Chrome trace-event format (Perfetto,
+    chrome://tracing) and to OTLP-shaped JSON.
+    """
+    def __init__(
+        self, 
+        maxlen: int | None = 100_000, 
+        service_name: str = "enpipe",
+    ):
+        self.service_name = service_name
+        self.spans: deque[Span] = deque(maxlen=maxlen)
+        # perf_counter is precise, time_ns anchors it to the epoch
+        self._offset = time.time_ns() - time.perf_counter_ns()
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # spans are recorded where the recorder was created
+        state = self.__dict__.copy()
+        state["spans"] = deque(maxlen=self.spans.maxlen)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _now(self) -> int:
+        return time.perf_counter_ns() + self._offset
+
+    def _start(
+        self, 
+        name: str, 
+        kind: str, 
+        attributes: dict[str, Any],
+    ) -> tuple[Span, Token]:
+        parent = _current_span.get()
+        with self._lock:
+            span_id = self._random.getrandbits(64)
+            trace_id = parent.trace_id if parent is not None else self._random.getrandbits(128)
+        thread = threading.current_thread()
+        span = Span(
+            name=name,
+            kind=kind,
+            trace_id=trace_id,
+            span_id=span_id,
+            parent_id=parent.span_id if parent is not None else None,
+            start=self._now(),
+            pid=os.getpid(),
+            tid=thread.native_id or thread.ident or 0,
+            thread_name=thread.name,
+            attributes=attributes,
+        )
+        return span, _current_span.set(span)
+
+    def _end(
+        self, 
+        span: Span, 
+        token: Token, 
+        error: BaseException | None = None,
+    ) -> None:
+        _current_span.reset(token)
+        self._finish(span, error)
+
+    def _finish(self, span: Span, error: BaseException | None = None) -> None:
+        """End a span which is no longer the current one"""
+        span.end = self._now()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        self.spans.append(span)
+
+    @staticmethod
+    def _resume(span: Span) -> Token:
+        """Make `span` the current span again (e.g., to resume a lazy run)"""
+        return _current_span.set(span)
+
+    @staticmethod
+    def _suspend(token: Token) -> None:
+        """Restore the current span preceding _start or _resume"""
+        _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "user", **attributes: Any) -> Iterator[Span]:
+        """Record the enclosed code as a span (e.g., to group several runs)"""
+        span, token = self._start(name, kind, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self._end(span, token, e)
+            raise e
+        self._end(span, token)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def to_chrome(self, path: str | os.PathLike | None = None) -> dict[str, Any]:
+        """
+        Returns (and writes to `path`, if any) the spans as Chrome
+        trace events: one complete event ("X") per span, plus the
+        thread names as metadata.
+        """
+        spans = list(self.spans)
+        events: list[dict[str, Any]] = []
+        threads = {(span.pid, span.tid): span.thread_name for span in spans}
+        for (pid, tid), thread_name in threads.items():
+            events.append(dict(
+                name="thread_name", 
+                ph="M", 
+                pid=pid, 
+                tid=tid, 
+                args=dict(name=thread_name),
+            ))
+        for span in sorted(spans, key=lambda span: span.start):
+            args = dict(
+                span_id=f"{span.span_id:016x}",
+                parent_id=f"{span.parent_id:016x}" if span.parent_id is not None else None,
+                **span.attributes,
+            )
+            if span.error is not None:
+                args["error"] = span.error
+            events.append(dict(
+                name=span.name,
+                cat=span.kind,
+                ph="X",
+                ts=span.start / 1e3,
+                dur=span.duration / 1e3,
+                pid=span.pid,
+                tid=span.tid,
+                args=args,
+            ))
+        trace = dict(traceEvents=events, displayTimeUnit="ns")
+        if path is not None:
+            Path(path).write_text(json.dumps(trace, default=str))
+        return trace
+
+    def to_otlp(self, path: str | os.PathLike | None = None) -> dict[str, Any]:
+        """
+        Returns (and writes to `path`, if any) the spans in the OTLP
+        JSON encoding of an ExportTraceServiceRequest.
+        """
+        spans = []
+        for span in self.spans:
+            attributes = dict(
+                span.attributes, 
+                **{
+                    "enpipe.kind": span.kind,
+                    "process.pid": span.pid,
+                    "thread.id": span.tid,
+                    "thread.name": span.thread_name,
+                },
+            )
+            otlp_span: dict[str, Any] = dict(
+                traceId=f"{span.trace_id:032x}",
+                spanId=f"{span.span_id:016x}",
+                name=span.name,
+                # SPAN_KIND_INTERNAL
+                kind=1,
+                startTimeUnixNano=str(span.start),
+                endTimeUnixNano=str(span.end),
+                attributes=[
+                    dict(key=key, value=_otlp_value(value))
+                    for key, value in attributes.items()
+                ],
+                # STATUS_CODE_OK or STATUS_CODE_ERROR
+                status=dict(code=1) if span.error is None else dict(code=2, message=span.error),
+            )
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = f"{span.parent_id:016x}"
+            spans.append(otlp_span)
+
+        trace = dict(resourceSpans=[dict(
+            resource=dict(attributes=[
+                dict(key="service.name", value=_otlp_value(self.service_name)),
+            ]),
+            scopeSpans=[dict(scope=dict(name="enpipe"), spans=spans)],
+        )])
+        if path is not None:
+            Path(path).write_text(json.dumps(trace))
+        return trace
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return dict(boolValue=value)
+    if isinstance(value, int):
+        # int64 are encoded as strings in the OTLP JSON encoding
+        return dict(intValue=str(value))
+    if isinstance(value, float):
+        return dict(doubleValue=value)
+    return dict(stringValue=str(value))
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+
+from dataclasses import dataclass
+
+import pickle
+
+if TYPE_CHECKING:
+    from multiprocessing.shared_memory import SharedMemory
+
+
+@dataclass
+class SharedPayload:
+    """
+    A pickled value whose large buffers live in a shared memory
+    segment (if any), laid out back to back with the given sizes
+    (read-only buffers are loaded as bytes, the others as bytearray).
+    """
+    data: bytes
+    segment: str | None = None
+    sizes: tuple[int, ...] = ()
+    readonly: tuple[bool, ...] = ()
+
+
+class SharedMemoryTransport:
+    """
+    Move values across processes through multiprocessing.shared_memory
+    rather than pipes (imported on first use, like the process pool).
+
+    Values are pickled with protocol 5: out-of-band buffers of at least
+    `threshold` bytes (e.g., NumPy arrays, and bytes, bytearray and
+    memoryview objects either being the value or directly in a tuple,
+    list or dict value) are copied into one shared memory segment and
+    only the segment name travels through the pipe. The receiving
+    side copies each buffer out of the segment straight into the
+    object it is loaded as (one memory copy, no pipe transfer) and
+    unlinks the segment right away, so a segment lives only
+    while its value is in flight and the loaded value does not depend
+    on it.
+
+    Segments are unlinked by the receiving process, so they are not
+    left to the resource tracker of the creating one: a segment whose
+    value is neither unpacked nor released (e.g., a process killed
+    while the value is in flight) is not cleaned up at shutdown.
+    """
+    def __init__(self, threshold: int = 1 << 16):
+        if threshold < 1:
+            raise ValueError("threshold must be >= 1")
+        self.threshold = threshold
+
+    def pack(self, value: Any) -> SharedPayload:
+        data, buffers = _dumps_out_of_band(
+            _wrap_buffers(value, self.threshold), 
+            self.threshold,
+        )
+        if len(buffers) == 0:
+            return SharedPayload(data)
+
+        from multiprocessing.shared_memory import SharedMemory
+
+        sizes = tuple(buf.raw().nbytes for buf in buffers)
+        readonly = tuple(buf.raw().readonly for buf in buffers)
+        shm = SharedMemory(create=True, size=max(sum(sizes), 1))
+        try:
+            offset = 0
+            for buf, size in zip(buffers, sizes):
+                shm.buf[offset:offset+size] = buf.raw()
+                offset += size
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        _untrack(shm)
+        shm.close()
+        return SharedPayload(data, shm.name, sizes, readonly)
+
+    def unpack(self, payload: SharedPayload) -> Any:
+        """Load a packed value, releasing its segment"""
+        if payload.segment is None:
+            return pickle.loads(payload.data)
+
+        from multiprocessing.shared_memory import SharedMemory
+
+        shm = SharedMemory(name=payload.segment)
+        buffers: list[bytes | bytearray] = []
+        try:
+            offset = 0
+            for size, readonly in zip(payload.sizes, payload.readonly):
+                with shm.buf[offset:offset+size] as view:
+                    buffers.append(bytes(view) if readonly else bytearray(view))
+                offset += size
+        finally:
+            shm.close()
+            shm.unlink()
+        return pickle.loads(payload.data, buffers=buffers)
+
+    @staticmethod
+    def release(payload: SharedPayload) -> None:
+        """Release the segment of a value which will not be unpacked"""
+        if payload.segment is None:
+            return
+
+        from multiprocessing.shared_memory import SharedMemory
+
+        try:
+            shm = SharedMemory(name=payload.segment)
+        except FileNotFoundError:
+            # already consumed
+            return
+        shm.close()
+        shm.unlink()
+
+
+def _dumps_out_of_band(value: Any, threshold: int) -> tuple[bytes, list[pickle.PickleBuffer]]:
+    """
+    Pickle `value` with protocol 5, handing the contiguous buffers of
+    at least `threshold` bytes out-of-band (see pickle.PickleBuffer)
+    """
+    buffers: list[pickle.PickleBuffer] = []
+    def _buffer_callback(buf: pickle.PickleBuffer) -> bool:
+        try:
+            if buf.raw().nbytes < threshold:
+                return True
+        except BufferError:
+            # non-contiguous buffers are kept in-band
+            return True
+        buffers.append(buf)
+        return False
+
+    data = pickle.dumps(value, protocol=5, buffer_callback=_buffer_callback)
+    return data, buffers
+
+
+def _untrack(shm: SharedMemory) -> None:
+    """
+    Hand the segment created by this process over to the receiving one:
+    that process registers it with its resource tracker when attaching
+    and unregisters it when unlinking, so every tracker stays balanced
+    (and none reports it as leaked at shutdown)
+    """
+    from multiprocessing import resource_tracker
+
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+
+
+class _OutOfBand:
+    """
+    Pickle a bytes-like object as an out-of-band buffer (the pickler
+    always keeps bytes and bytearray in-band, and rejects memoryview)
+    """
+    def __init__(self, obj: bytes | bytearray | memoryview):
+        self.obj = obj
+
+    def __reduce_ex__(self, protocol: Any) -> Any:
+        kind = type(self.obj).__name__
+        return _rebuild_buffer, (kind, pickle.PickleBuffer(self.obj))
+
+
+def _wrap(value: Any, threshold: int) -> Any:
+    if type(value) in (bytes, bytearray, memoryview):
+        view = memoryview(value)
+        if view.nbytes >= threshold and view.contiguous:
+            return _OutOfBand(value)
+    return value
+
+
+def _wrap_buffers(value: Any, threshold: int) -> Any:
+    """Wrap the large bytes-like objects in `value` or directly in it"""
+    kind = type(value)
+    if kind is tuple or kind is list:
+        return kind(_wrap(item, threshold) for item in value)
+    if kind is dict:
+        return {key: _wrap(item, threshold) for key, item in value.items()}
+    return _wrap(value, threshold)
+
+
+def _rebuild_buffer(kind: str, buf: Any) -> Any:
+    # the buffers are loaded as bytes (read-only) or bytearray objects
+    if kind == "bytearray":
+        return buf if isinstance(buf, bytearray) else bytearray(buf)
+    if kind == "memoryview":
+        return memoryview(buf)
+    return buf if isinstance(buf, bytes) else bytes(buf)
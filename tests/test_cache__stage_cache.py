@@ -0,0 +1,121 @@
+import pytest
+import asyncio
+import time
+
+from typing import Any
+
+from enpipe import Stage, StageCache, Pipeline
+
+calls: list[Any] = []
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    calls.append((a, b))
+    return a+b
+
+def func_total(d: dict) -> float:
+    calls.append(d)
+    return sum(d.values())
+
+async def afunc_sum(a: float, b: float = 1.0) -> float:
+    calls.append((a, b))
+    return a+b
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "items",
+        "maxsize",
+        "expected_calls",
+        "expected_hits",
+        "expected_evictions",
+    ]),
+    [
+        ((1, 1, 1), 2, 1, 2, 0),
+        ((1, 2, 1, 2), 2, 2, 2, 0),
+        ((1, 2, 3, 1), 2, 4, 0, 2),
+        ((1, 2, 1, 3, 1), 2, 3, 2, 1),
+    ]
+)
+def test_stage_cache_lru(
+    items: tuple,
+    maxsize: int,
+    expected_calls: int,
+    expected_hits: int,
+    expected_evictions: int,
+):
+    p = Pipeline(Stage(func_sum, cache=StageCache(maxsize=maxsize)))
+    for item in items:
+        assert p(item) == item + 1
+    assert len(calls) == expected_calls
+    info = p.cache_info()["func_sum"]
+    assert info.hits == expected_hits
+    assert info.misses == len(items) - expected_hits
+    assert info.evictions == expected_evictions
+    assert info.size <= maxsize
+
+
+def test_stage_cache_hit_recorded():
+    p = Pipeline(Stage(func_sum, cache=StageCache()))
+    p(1)
+    assert p.get_stages_run(0)[0].cache_hit is False
+    p(1)
+    run = p.get_stages_run(0)[0]
+    assert run.cache_hit is True
+    assert run.outputs == 2
+    assert len(calls) == 1
+
+
+def test_stage_cache_kwargs():
+    p = Pipeline(Stage(func_sum, cache=StageCache()))
+    assert p(a=1, b=2) == 3
+    assert p(b=2, a=1) == 3
+    assert p(a=1, b=3) == 4
+    assert len(calls) == 2
+
+
+def test_stage_cache_ttl():
+    p = Pipeline(Stage(func_sum, cache=StageCache(ttl=0.01)))
+    p(1)
+    p(1)
+    time.sleep(0.02)
+    p(1)
+    assert len(calls) == 2
+    assert p[0].cache.info().evictions == 1
+
+
+def test_stage_cache_key():
+    p = Pipeline(Stage(func_total, cache=StageCache(key=lambda d: tuple(sorted(d.items())))))
+    assert p({"a": 1, "b": 2}) == 3
+    assert p({"b": 2, "a": 1}) == 3
+    assert len(calls) == 1
+
+
+def test_stage_cache_unhashable():
+    p = Pipeline(Stage(func_total, cache=StageCache()))
+    with pytest.raises(TypeError) as e:
+        p({"a": 1})
+    assert "StageCache(key=...)" in e.exconly()
+
+
+def test_stage_cache_compiled_and_async():
+    p = Pipeline(Stage(func_sum, cache=StageCache()))
+    assert p.compile()(1) == 2
+    assert p(1) == 2
+    assert len(calls) == 1
+
+    p = Pipeline(Stage(afunc_sum, cache=StageCache()))
+    assert asyncio.run(p.acall(1)) == 2
+    assert asyncio.run(p.acall(1)) == 2
+    assert len(calls) == 2
+    assert p.get_stages_run(0)[0].cache_hit is True
+
+
+@pytest.mark.parametrize("kwargs", [dict(maxsize=0), dict(ttl=0)])
+def test_stage_cache_invalid(kwargs: dict):
+    with pytest.raises(ValueError):
+        StageCache(**kwargs)
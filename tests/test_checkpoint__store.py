@@ -0,0 +1,158 @@
+import pytest
+import mmap
+import pickle
+
+from pathlib import Path
+from typing import Any
+
+from enpipe import Stage, Pipeline, CheckpointStore
+
+calls: list[str] = []
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    calls.append("func_sum")
+    return a+b
+
+def func_split(a: float) -> tuple[float, float]:
+    calls.append("func_split")
+    return a, 2.0
+
+def func_divide(a: float, b: float = 1.0) -> float:
+    calls.append("func_divide")
+    return a/b
+
+def func_fail(a: float) -> float:
+    raise RuntimeError("crash")
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def make(store: CheckpointStore, *funcs) -> Pipeline:
+    return Pipeline(*[Stage(f) for f in funcs], checkpoint=store)
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "resume_from",
+        "expected_calls",
+    ]),
+    [
+        (1, ["func_split", "func_divide"]),
+        ("func_divide", ["func_divide"]),
+        (2, ["func_divide"]),
+    ]
+)
+def test_resume_from_checkpoint(
+    tmp_path: Path,
+    resume_from: int | str,
+    expected_calls: list[str],
+):
+    store = CheckpointStore(tmp_path)
+    p = make(store, func_sum, func_split, func_divide)
+    assert p.run_checkpointed("job", 1).result == 1.0
+
+    # a brand new pipeline (e.g., in another process)
+    calls.clear()
+    p2 = make(CheckpointStore(tmp_path), func_sum, func_split, func_divide)
+    assert p2.resume(resume_from, run_id="job").result == 1.0
+    assert calls == expected_calls
+
+
+def test_resume_after_crash(tmp_path: Path):
+    store = CheckpointStore(tmp_path)
+    p = make(store, func_sum, func_fail)
+    with pytest.raises(RuntimeError):
+        p.run_checkpointed("job", 1)
+    assert store.has("job", 0, "func_sum")
+    assert not store.has("job", 1, "func_fail")
+
+    p = make(store, func_sum, func_divide)
+    p.disable()
+    p.enable(1)
+    calls.clear()
+    assert p.resume(1, run_id="job").result == 2.0
+    assert calls == ["func_divide"]
+
+
+def test_missing_checkpoint(tmp_path: Path):
+    p = make(CheckpointStore(tmp_path), func_sum, func_sum)
+    with pytest.raises(KeyError, match="No checkpoint for stage#0"):
+        p.resume(1, run_id="unknown")
+
+
+def test_run_id_requires_store():
+    p = Pipeline(Stage(func_sum))
+    with pytest.raises(ValueError, match="requires a checkpoint store"):
+        p.run_checkpointed("job", 1)
+
+
+def func_tagged(x: int, run_id: str = "") -> str:
+    return f"{run_id}{x}"
+
+
+def test_run_id_goes_to_first_stage(tmp_path: Path):
+    p = Pipeline(Stage(func_tagged), checkpoint=CheckpointStore(tmp_path))
+    assert p(1, run_id="a") == "a1"
+    assert p.run_checkpointed("job", 1, run_id="b").result == "b1"
+    assert p.checkpoint.load("job", 0, "func_tagged") == "b1"
+
+
+# PickleBuffer is what buffer-backed objects (e.g., NumPy arrays)
+# hand over to pickle protocol 5 to be serialized out-of-band
+@pytest.mark.parametrize(
+    ", ".join([
+        "value",
+        "expected",
+        "threshold",
+        "num_buffers",
+    ]),
+    [
+        ({"a": 1}, {"a": 1}, 1024, 0),
+        (bytearray(b"x" * 2048), bytearray(b"x" * 2048), 1024, 0),
+        (pickle.PickleBuffer(b"x" * 2048), b"x" * 2048, 1024, 1),
+        (pickle.PickleBuffer(b"x" * 512), b"x" * 512, 1024, 0),
+        (
+            (1, pickle.PickleBuffer(b"y" * 4096), pickle.PickleBuffer(b"y" * 8)), 
+            (1, b"y" * 4096, b"y" * 8), 
+            1024, 
+            1,
+        ),
+    ]
+)
+def test_store_roundtrip(
+    tmp_path: Path,
+    value: Any,
+    expected: Any,
+    threshold: int,
+    num_buffers: int,
+):
+    store = CheckpointStore(tmp_path, threshold=threshold)
+    store.save("job", 3, "functools.partial(func)", value)
+    assert store.load("job", 3, "functools.partial(func)") == expected
+    assert len(list((tmp_path / "job").glob("*.buf"))) == num_buffers
+
+    store.clear("job")
+    assert not store.has("job", 3, "functools.partial(func)")
+
+
+def test_store_memory_maps_buffers(tmp_path: Path):
+    store = CheckpointStore(tmp_path, threshold=16)
+    store.save("job", 0, "stage", pickle.PickleBuffer(b"z" * 1024))
+    loaded = store.load("job", 0, "stage")
+    assert isinstance(loaded, memoryview)
+    assert isinstance(loaded.obj, mmap.mmap)
+    assert bytes(loaded) == b"z" * 1024
+
+
+def test_store_loaded_buffers_are_writable(tmp_path: Path):
+    store = CheckpointStore(tmp_path, threshold=16)
+    store.save("job", 0, "stage", pickle.PickleBuffer(bytearray(b"z" * 1024)))
+    loaded = store.load("job", 0, "stage")
+    assert not loaded.readonly
+    loaded[:4] = b"abcd"
+    assert bytes(loaded[:5]) == b"abcdz"
+    # the checkpoint on disk is left untouched
+    assert bytes(store.load("job", 0, "stage")) == b"z" * 1024
@@ -0,0 +1,105 @@
+import pytest
+import asyncio
+import threading
+
+from typing import Any
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+async def afunc_double(a: float) -> float:
+    await asyncio.sleep(0)
+    return 2*a
+
+async def afunc_sleep(a: float) -> float:
+    # later items finish first
+    await asyncio.sleep(0.01 * (5 - a))
+    return a
+
+def func_thread_name(a: float) -> str:
+    return threading.current_thread().name
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "args",
+        "kwargs",
+        "expected",
+    ]),
+    [
+        ((func_sum, afunc_double), (1, ), dict(), 4),
+        ((afunc_double, func_sum), (1, ), dict(), 3),
+        ((func_sum, afunc_double, func_sum), tuple(), dict(a=1, b=2), 7),
+    ]
+)
+@pytest.mark.parametrize("sync_in_executor", [False, True])
+def test_acall(
+    funcs: tuple,
+    args: tuple,
+    kwargs: dict[str, Any],
+    expected: Any,
+    sync_in_executor: bool,
+):
+    p = make_pipeline(*funcs)
+    res = asyncio.run(p.acall(*args, sync_in_executor=sync_in_executor, **kwargs))
+    assert res == expected
+    assert p.get_stages_run(len(p)-1)[0].outputs == expected
+
+
+def test_acall_sync_in_executor():
+    p = make_pipeline(func_sum, func_thread_name)
+    main = threading.current_thread().name
+    assert asyncio.run(p.acall(1)) == main
+    assert asyncio.run(p.acall(1, sync_in_executor=True)) != main
+
+
+def test_acall_start_stop():
+    p = make_pipeline(func_sum, afunc_double, func_sum)
+    assert asyncio.run(p.acall(1, stop_at=-1)) == 4
+    assert asyncio.run(p.acall(1, start_from=1)) == 3
+
+
+def _collect(aiter) -> list:
+    async def _run():
+        return [res async for res in aiter]
+    return asyncio.run(_run())
+
+
+@pytest.mark.parametrize("concurrency", [1, 3, 10])
+def test_amap(concurrency: int):
+    p = make_pipeline(func_sum, afunc_double)
+    res = _collect(p.amap(range(10), concurrency=concurrency))
+    assert res == [2*(i + 1) for i in range(10)]
+
+
+def test_amap_async_iterable_unpack():
+    async def items():
+        for i in range(3):
+            yield (i, 2)
+
+    p = make_pipeline(func_sum, afunc_double)
+    assert _collect(p.amap(items(), unpack=True)) == [4, 6, 8]
+
+
+def test_amap_unordered():
+    p = make_pipeline(afunc_sleep)
+    res = _collect(p.amap(range(5), concurrency=5, ordered=False))
+    assert sorted(res) == list(range(5))
+    assert res != list(range(5))
+
+
+def test_amap_invalid_concurrency():
+    p = make_pipeline(func_sum)
+    with pytest.raises(ValueError):
+        _collect(p.amap(range(3), concurrency=0))
+
+
+def test_import_does_not_load_asyncio():
+    import subprocess
+    import sys
+
+    code = "import sys, enpipe; assert 'asyncio' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, env={"PYTHONPATH": ":".join(sys.path)})
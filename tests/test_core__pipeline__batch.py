@@ -0,0 +1,173 @@
+import pytest
+import time
+
+from typing import Any
+
+from enpipe import Stage, Pipeline, StatsCollector
+
+batches: list[list[Any]] = []
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def batch_double(items: list[float]) -> list[float]:
+    batches.append(list(items))
+    return [2*item for item in items]
+
+def batch_sum(items: list[tuple[float, float]]) -> list[float]:
+    batches.append(list(items))
+    return [a+b for a, b in items]
+
+def batch_broken(items: list[float]) -> list[float]:
+    return items[:-1]
+
+
+@pytest.fixture(autouse=True)
+def reset_batches():
+    batches.clear()
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "batch_size",
+        "num_items",
+        "expected_batches",
+    ]),
+    [
+        (4, 10, [4, 4, 2]),
+        (1, 3, [1, 1, 1]),
+        (16, 10, [10]),
+    ]
+)
+@pytest.mark.parametrize("record", [True, False])
+def test_map_batch_stage(
+    batch_size: int,
+    num_items: int,
+    expected_batches: list[int],
+    record: bool,
+):
+    p = Pipeline(
+        Stage(func_sum),
+        Stage(batch_double, batch_size=batch_size),
+        Stage(func_sum),
+    )
+    res = list(p.map(range(num_items), record=record))
+    assert res == [2*(i + 1) + 1 for i in range(num_items)]
+    assert [len(batch) for batch in batches] == expected_batches
+
+
+def test_map_batch_stages_of_different_size():
+    p = Pipeline(
+        Stage(batch_double, name="double_4", batch_size=4),
+        Stage(func_sum),
+        Stage(batch_double, name="double_2", batch_size=2),
+    )
+    assert list(p.map(range(5))) == [2*(2*i + 1) for i in range(5)]
+    assert [len(batch) for batch in batches] == [4, 2, 2, 1, 1]
+
+
+def test_map_batch_stage_multiple_args():
+    p = Pipeline(Stage(batch_sum, batch_size=8), Stage(func_sum))
+    assert list(p.map([(1, 2), (3, 4)], unpack=True)) == [4, 8]
+    assert batches == [[(1, 2), (3, 4)]]
+
+
+def test_map_batch_wait():
+    def slow_items():
+        for i in range(4):
+            time.sleep(0.02)
+            yield i
+
+    p = Pipeline(Stage(batch_double, batch_size=100, batch_wait=0.01))
+    assert list(p.map(slow_items())) == [0, 2, 4, 6]
+    assert len(batches) > 1
+
+
+def test_map_batch_wait_bounds_latency():
+    def slow_items():
+        for i in range(3):
+            time.sleep(0.2)
+            yield i
+
+    p = Pipeline(Stage(batch_double, batch_size=8, batch_wait=0.02))
+    t0 = time.monotonic()
+    latencies = []
+    for res in p.map(slow_items()):
+        latencies.append(time.monotonic() - t0)
+    assert latencies[0] < 0.35
+    # each item is flushed before the next one arrives
+    assert batches == [[0], [1], [2]]
+
+
+def test_map_batch_wait_source_error():
+    def broken_items():
+        yield 1
+        raise KeyError("broken")
+
+    p = Pipeline(Stage(batch_double, batch_size=8, batch_wait=0.5))
+    with pytest.raises(KeyError):
+        list(p.map(broken_items()))
+
+
+def test_batch_stage_single_call():
+    p = Pipeline(Stage(func_sum), Stage(batch_double, batch_size=8))
+    assert p(1) == 4
+    assert p.compile()(1) == 4
+    assert batches == [[2], [2]]
+
+
+def test_map_batch_records():
+    collector = StatsCollector()
+    p = Pipeline(
+        Stage(func_sum), 
+        Stage(batch_double, batch_size=2),
+        stats_collector=collector,
+    )
+    assert list(p.map(range(3))) == [2, 4, 6]
+    run = p.get_stages_run(1)[0]
+    assert run.inputs == ([3], )
+    assert run.outputs == [6]
+    assert [row.count for row in p.stats()] == [3, 2]
+
+
+def test_map_batch_without_record(monkeypatch: pytest.MonkeyPatch):
+    records = []
+    start_record = Pipeline._start_record
+    def _start_record(self, *args):
+        record = start_record(self, *args)
+        if record is not None:
+            records.append(record)
+        return record
+    monkeypatch.setattr(Pipeline, "_start_record", _start_record)
+
+    p = Pipeline(
+        Stage(func_sum), 
+        Stage(batch_double, batch_size=2),
+        stats_collector=StatsCollector(),
+    )
+    assert list(p.map(range(3), record=False)) == [2, 4, 6]
+    assert records == []
+    assert [row.count for row in p.stats()] == [3, 2]
+    assert list(p.map(range(3))) == [2, 4, 6]
+    assert len(records) == 5
+
+
+def test_map_batch_hooks_sampled_per_chunk():
+    calls = []
+    p = Pipeline(Stage(func_sum), Stage(batch_double, batch_size=2))
+    p.add_hook(before=lambda stage, *_: calls.append(stage.name), every=2)
+    assert list(p.map(range(6))) == [2, 4, 6, 8, 10, 12]
+    # chunks #0 and #2
+    assert calls == ["func_sum", "func_sum", "batch_double"] * 2
+
+
+def test_map_batch_wrong_size():
+    p = Pipeline(Stage(batch_broken, batch_size=2))
+    with pytest.raises(ValueError) as e:
+        list(p.map(range(2)))
+    assert e.exconly().splitlines()[-1] == "--> Error at stage#0(batch_broken)"
+
+
+def test_batch_size_invalid():
+    with pytest.raises(ValueError):
+        Stage(batch_double, batch_size=0)
@@ -0,0 +1,98 @@
+import pytest
+
+from typing import Callable, Any, Sequence
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_divide(a: float, b: float = 1.0) -> float:
+    return a/b
+
+def func_split(a: float) -> tuple[float, float]:
+    return a, 2.0
+
+def func_divide_by_zero(a: float) -> float:
+    return a / 0
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "args",
+        "kwargs",
+    ]),
+    [
+        ((func_sum, func_divide), (1, ), dict()),
+        ((func_sum, func_split, func_divide), (1, ), dict()),
+        ((func_sum, func_split), tuple(), dict(a=1, b=3)),
+        ((func_split,), (5, ), dict()),
+    ]
+)
+def test_compile_matches_call(
+    funcs: Sequence[Callable],
+    args: tuple,
+    kwargs: dict[str, Any],
+):
+    p = make_pipeline(*funcs)
+    compiled = p.compile()
+    assert compiled(*args, **kwargs) == p(*args, **kwargs)
+    assert compiled.stages == p.stages
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "args",
+        "disable_stages",
+        "expected",
+    ]),
+    [
+        ((func_sum, func_sum, func_divide), (1, ), (1, ), 2),
+        ((func_sum, func_sum, func_divide), (1, ), (0, 1), 1),
+        ((func_sum, func_sum, func_divide), (1, ), (0, 1, 2), 1),
+        ((func_sum, func_divide), (1, ), (), 2),
+    ]
+)
+def test_compile_skips_disabled(
+    funcs: Sequence[Callable],
+    args: tuple,
+    disable_stages: tuple,
+    expected: Any,
+):
+    p = make_pipeline(*funcs)
+    compiled = p.compile()
+    if len(disable_stages) > 0:
+        p.disable(*disable_stages)
+    if len(disable_stages) == len(p):
+        assert compiled(*args) is None
+    else:
+        assert compiled(*args) == expected
+    assert len(compiled.stages) == len(p) - len(disable_stages)
+
+
+def test_compile_recompiles_on_enable():
+    p = make_pipeline(func_sum, func_sum)
+    p.disable(1)
+    compiled = p.compile()
+    assert compiled(1) == 2
+    p.enable(1)
+    assert compiled(1) == 3
+
+
+def test_compile_does_not_record_runs():
+    p = make_pipeline(func_sum, func_divide)
+    p.compile()(1)
+    assert p.get_stages_run() == []
+
+
+def test_compile_with_error():
+    p = make_pipeline(func_sum, func_divide_by_zero)
+    with pytest.raises(ZeroDivisionError):
+        p.compile()(1)
+
+    p = make_pipeline(func_sum, func_sum)
+    with pytest.raises(TypeError) as e:
+        p.compile()(1, 2, 3)
+    assert e.exconly().splitlines()[-1] == "--> Error at stage#0(func_sum_1)"
@@ -0,0 +1,136 @@
+import pytest
+import asyncio
+import types
+
+from typing import Any, Iterator
+
+from enpipe import make_pipeline, Pipeline, Stage, StatsCollector, TraceRecorder
+
+produced: list[int] = []
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def split(n: int) -> Iterator[int]:
+    for i in range(n):
+        produced.append(i)
+        yield i
+
+def split_pairs(n: int) -> Iterator[tuple[int, int]]:
+    for i in range(n):
+        yield i, 10
+
+
+@pytest.fixture(autouse=True)
+def reset_produced():
+    produced.clear()
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "args",
+        "expected",
+    ]),
+    [
+        ((split, func_sum), (3, ), [1, 2, 3]),
+        ((func_sum, split, func_sum, func_sum), (2, ), [2, 3, 4]),
+        ((split, ), (3, ), [0, 1, 2]),
+        ((split_pairs, func_sum), (2, ), [10, 11]),
+        ((split, split, func_sum), (3, ), [1, 1, 2]),
+    ]
+)
+@pytest.mark.parametrize("compiled", [False, True])
+def test_fanout(
+    funcs: tuple,
+    args: tuple,
+    expected: list[Any],
+    compiled: bool,
+):
+    p = make_pipeline(*funcs)
+    res = p.compile()(*args) if compiled else p(*args)
+    assert isinstance(res, types.GeneratorType)
+    assert list(res) == expected
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_fanout_is_lazy(compiled: bool):
+    p = make_pipeline(split, func_sum)
+    res = p.compile()(1000) if compiled else p(1000)
+    assert produced == []
+    assert next(res) == 1
+    assert next(res) == 2
+    assert produced == [0, 1]
+
+
+def test_fanout_records_last_item():
+    p = make_pipeline(split, func_sum)
+    assert list(p(3)) == [1, 2, 3]
+    run = p.get_stages_run(1)[0]
+    assert run.inputs == (2, )
+    assert run.outputs == 3
+
+
+def test_fanout_disabled():
+    p = make_pipeline(func_sum, split, func_sum)
+    p.disable(1)
+    # a disabled fan-out stage is not a fan-out point
+    assert not isinstance(p.compile()(1), types.GeneratorType)
+
+
+def batch_double(items: list[int]) -> list[int]:
+    return [2*item for item in items]
+
+
+@pytest.mark.parametrize("executor", ["stages", "process"])
+def test_fanout_unsupported_executor(executor: str):
+    p = make_pipeline(split, func_sum)
+    with pytest.raises(ValueError, match="Fan-out"):
+        p.map(range(3), executor=executor)
+
+
+def test_fanout_unsupported_batch():
+    p = Pipeline(Stage(split), Stage(batch_double, batch_size=4))
+    with pytest.raises(ValueError, match="Fan-out"):
+        p.map(range(3))
+
+
+def test_fanout_unsupported_async():
+    p = make_pipeline(split, func_sum)
+    with pytest.raises(ValueError, match="Fan-out"):
+        asyncio.run(p.acall(3))
+
+    async def _amap():
+        return [res async for res in p.amap(range(3))]
+    with pytest.raises(ValueError, match="Fan-out"):
+        asyncio.run(_amap())
+
+
+def test_fanout_stats_after_consumed():
+    collector = StatsCollector()
+    p = Pipeline(Stage(split), Stage(func_sum), stats_collector=collector)
+    res = p(3)
+    assert len(collector.runs) == 0
+    assert list(res) == [1, 2, 3]
+    assert [(row.name, row.count) for row in p.stats()] == [("split", 1), ("func_sum", 3)]
+    assert len(collector.runs) == 1
+    assert collector.runs[0].runtime >= sum(collector.runs[0].stages_runtime)
+
+
+def test_fanout_traced():
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(split), Stage(func_sum), tracer=tracer)
+    with tracer.span("caller") as caller:
+        res = p(3)
+        assert list(res) == [1, 2, 3]
+    spans = {span.name: span for span in tracer.spans}
+    runs = [span for span in tracer.spans if span.kind == "pipeline"]
+    assert len(runs) == 1
+    assert runs[0].parent_id == caller.span_id
+    assert all(
+        span.parent_id == runs[0].span_id 
+        for span in tracer.spans 
+        if span.kind == "stage"
+    )
+    assert len([span for span in tracer.spans if span.name == "func_sum"]) == 3
+    assert runs[0].end >= spans["func_sum"].end
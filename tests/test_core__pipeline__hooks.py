@@ -0,0 +1,117 @@
+import pytest
+import asyncio
+
+from typing import Any
+
+from enpipe import make_pipeline, Stage
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def func_mul(a: int, b: int = 2) -> int:
+    return a*b
+
+def func_divide_by_zero(a: int) -> float:
+    return a / 0
+
+
+class Recorder:
+    def __init__(self):
+        self.events: list[tuple] = []
+
+    def before(self, stage: Stage, idx: int, args: tuple, kwargs: dict) -> None:
+        self.events.append(("before", stage.name, idx, args))
+
+    def after(self, stage: Stage, idx: int, res: Any, runtime: int) -> None:
+        assert runtime >= 0
+        self.events.append(("after", stage.name, idx, res))
+
+    def on_error(self, stage: Stage, idx: int, error: BaseException, runtime: int) -> None:
+        self.events.append(("error", stage.name, idx, type(error)))
+
+
+@pytest.mark.parametrize("retention", ["full", "timings", "none"])
+def test_hooks_call(retention: str):
+    p = make_pipeline(func_sum, func_mul, retention=retention)
+    rec = Recorder()
+    p.add_hook(rec.before, rec.after)
+    assert p(1) == 4
+    assert rec.events == [
+        ("before", "func_sum", 0, (1, )),
+        ("after", "func_sum", 0, 2),
+        ("before", "func_mul", 1, (2, )),
+        ("after", "func_mul", 1, 4),
+    ]
+
+
+def test_hooks_on_error():
+    p = make_pipeline(func_sum, func_divide_by_zero)
+    rec = Recorder()
+    p.add_hook(on_error=rec.on_error)
+    with pytest.raises(ZeroDivisionError):
+        p(1)
+    assert rec.events == [("error", "func_divide_by_zero", 1, ZeroDivisionError)]
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "every",
+        "calls",
+        "expected",
+    ]),
+    [
+        (1, 4, 4),
+        (2, 4, 2),
+        (3, 4, 2),
+        (5, 4, 1),
+    ]
+)
+def test_hooks_every(every: int, calls: int, expected: int):
+    p = make_pipeline(func_sum)
+    rec = Recorder()
+    p.add_hook(after=rec.after, every=every)
+    for i in range(calls):
+        p(i)
+    assert len(rec.events) == expected
+
+
+def test_hooks_remove():
+    p = make_pipeline(func_sum)
+    rec = Recorder()
+    hook = p.add_hook(rec.before)
+    p(1)
+    p.remove_hook(hook)
+    p(1)
+    assert len(rec.events) == 1
+    with pytest.raises(ValueError):
+        p.remove_hook(hook)
+
+
+@pytest.mark.parametrize(
+    "executor", 
+    [None, "thread", "stages"],
+)
+@pytest.mark.parametrize("record", [True, False])
+def test_hooks_map(executor: str | None, record: bool):
+    p = make_pipeline(func_sum, func_mul)
+    rec = Recorder()
+    p.add_hook(after=rec.after)
+    assert list(p.map(range(3), executor=executor, record=record)) == [2, 4, 6]
+    assert sorted(e[3] for e in rec.events if e[1] == "func_mul") == [2, 4, 6]
+
+
+def test_hooks_acall():
+    p = make_pipeline(func_sum, func_mul)
+    rec = Recorder()
+    p.add_hook(rec.before, rec.after)
+    assert asyncio.run(p.acall(1)) == 4
+    assert len(rec.events) == 4
+
+
+def test_hooks_not_pickled():
+    import pickle
+
+    p = make_pipeline(func_sum)
+    p.add_hook(lambda *args: None)
+    assert pickle.loads(pickle.dumps(p))._hooks == tuple()
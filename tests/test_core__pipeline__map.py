@@ -0,0 +1,111 @@
+import pytest
+
+from typing import Callable, Any, Sequence
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_divide(a: float, b: float = 1.0) -> float:
+    return a/b
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "items",
+        "unpack",
+        "record",
+        "expected",
+    ]),
+    [
+        ((func_sum, func_divide), (1, 2, 3), False, True, [2, 3, 4]),
+        ((func_sum, func_divide), (1, 2, 3), False, False, [2, 3, 4]),
+        ((func_sum, func_divide), ((1, 2), (3, 4)), True, True, [3, 7]),
+        ((func_sum, func_divide), ((1, 2), (3, 4)), True, False, [3, 7]),
+        ((func_sum, func_divide), (), False, True, []),
+    ]
+)
+def test_map(
+    funcs: Sequence[Callable],
+    items: Sequence[Any],
+    unpack: bool,
+    record: bool,
+    expected: list[Any],
+):
+    p = make_pipeline(*funcs)
+    assert list(p.map(items, unpack=unpack, record=record)) == expected
+
+
+def test_map_is_lazy():
+    consumed = []
+    def gen():
+        for i in range(3):
+            consumed.append(i)
+            yield i
+
+    p = make_pipeline(func_sum)
+    it = p.map(gen())
+    assert consumed == []
+    assert next(it) == 1
+    assert consumed == [0]
+
+
+def test_map_records_last_item():
+    p = make_pipeline(func_sum, func_divide)
+    assert list(p.map((1, 2, 3))) == [2, 3, 4]
+    runs = p.get_stages_run()
+    assert len(runs) == len(p)
+    assert runs[0].inputs == ((3, ), dict())
+    assert runs[-1].outputs == 4
+
+
+def func_check(a: float) -> float:
+    if a < 0:
+        raise ValueError(a)
+    return a
+
+
+def test_map_records_failed_item():
+    p = make_pipeline(func_sum, func_check, func_sum)
+    results = list(p.map((1, -2), on_error="return"))
+    assert results[0] == 3
+    assert isinstance(results[1], ValueError)
+    # only the stages run on the failed item
+    runs = p.get_stages_run(0, 1, 2)
+    assert [run.stage.name for run in runs] == ["func_sum_1"]
+    assert runs[0].outputs == -1
+    assert p._last_run.result is results[1]
+
+
+def test_map_without_record():
+    p = make_pipeline(func_sum, func_divide)
+    assert list(p.map((1, 2, 3), record=False)) == [2, 3, 4]
+    assert p.get_stages_run() == []
+
+
+def test_map_follows_enable_disable():
+    p = make_pipeline(func_sum, func_sum)
+    results = []
+    for idx, res in enumerate(p.map((1, 1, 1))):
+        results.append(res)
+        if idx == 0:
+            p.disable(0)
+        elif idx == 1:
+            p.disable(1)
+    assert results == [3, 2, None]
+
+
+def func_tag(*args) -> tuple[str, tuple]:
+    return "c", args
+
+
+@pytest.mark.parametrize("executor", [None, "thread", "process", "stages"])
+def test_map_record_disabled_stage(executor: str | None):
+    p = make_pipeline(func_sum, func_sum, func_tag)
+    p.disable(1)
+    # record only controls the bookkeeping, not the results
+    expected = [p(1)]
+    assert list(p.map([1], executor=executor)) == expected
+    assert list(p.map([1], executor=executor, record=False)) == expected
@@ -0,0 +1,90 @@
+import pytest
+import pickle
+
+from typing import Any
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_square(a: float) -> float:
+    return a*a
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "record",
+        "unpack",
+        "chunksize",
+        "items",
+        "expected",
+    ]),
+    [
+        (True, False, 1, range(10), [(i + 1)**2 for i in range(10)]),
+        (False, False, 3, range(10), [(i + 1)**2 for i in range(10)]),
+        (True, True, 4, [(1, 2), (3, 4)], [9, 49]),
+        (False, True, 1, [(1, 2), (3, 4)], [9, 49]),
+    ]
+)
+def test_map_processes(
+    record: bool,
+    unpack: bool,
+    chunksize: int,
+    items: Any,
+    expected: list,
+):
+    p = make_pipeline(func_sum, func_square)
+    res = p.map(
+        items,
+        unpack=unpack,
+        record=record,
+        executor="process",
+        max_workers=2,
+        chunksize=chunksize,
+    )
+    assert list(res) == expected
+
+
+def test_map_processes_unordered():
+    p = make_pipeline(func_sum, func_square)
+    res = p.map(range(10), executor="process", max_workers=2, ordered=False)
+    assert sorted(res) == [(i + 1)**2 for i in range(10)]
+
+
+def test_map_processes_collects_runtimes():
+    p = make_pipeline(func_sum, func_square)
+    list(p.map(range(3), executor="process", max_workers=2))
+    runs = p.get_stages_run()
+    assert [run.stage for run in runs] == list(p.stages)
+    for run in runs:
+        assert run.runtime >= 0
+        assert run.inputs is None and run.outputs is None
+
+
+def test_map_processes_unpicklable_stage():
+    p = make_pipeline(func_sum, lambda a: a*a)
+    with pytest.raises(pickle.PicklingError) as e:
+        p.map(range(3), executor="process")
+    assert "Stage#1(<lambda>) cannot be pickled" in str(e.value)
+
+
+def test_pickle_drops_run_data():
+    p = make_pipeline(func_sum, func_square)
+    p(1)
+    p2 = pickle.loads(pickle.dumps(p))
+    assert p2.get_stages_run() == []
+    assert p2[1]._out is None
+    assert p2(1) == p(1)
+
+
+def test_import_does_not_load_multiprocessing():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, enpipe; "
+        "assert 'multiprocessing' not in sys.modules; "
+        "assert 'concurrent.futures.process' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, env={"PYTHONPATH": ":".join(sys.path)})
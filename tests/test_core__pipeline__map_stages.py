@@ -0,0 +1,99 @@
+import pytest
+import threading
+import time
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_slow(a: float) -> float:
+    time.sleep(0.02)
+    return a
+
+def func_fail_on_3(a: float) -> float:
+    if a == 3:
+        raise RuntimeError("boom")
+    return a
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "record",
+        "unpack",
+        "queue_size",
+        "items",
+        "expected",
+    ]),
+    [
+        (True, False, 16, range(20), [i + 2 for i in range(20)]),
+        (False, False, 1, range(20), [i + 2 for i in range(20)]),
+        (True, True, 2, [(1, 2), (3, 4)], [4, 8]),
+        (True, False, 4, [], []),
+    ]
+)
+def test_map_stages(
+    record: bool,
+    unpack: bool,
+    queue_size: int,
+    items: list,
+    expected: list,
+):
+    p = make_pipeline(func_sum, func_sum)
+    res = p.map(
+        items, 
+        unpack=unpack, 
+        record=record,
+        executor="stages", 
+        queue_size=queue_size,
+    )
+    assert list(res) == expected
+
+
+def test_map_stages_overlap():
+    p = make_pipeline(func_slow, func_slow, func_slow)
+    t1 = time.perf_counter()
+    assert list(p.map(range(10), executor="stages")) == list(range(10))
+    elapsed = time.perf_counter() - t1
+    # sequential execution takes 10 * 3 * 0.02 = 0.6s
+    assert elapsed < 0.45
+
+
+def test_map_stages_records_runs():
+    p = make_pipeline(func_sum, func_sum)
+    assert list(p.map(range(3), executor="stages")) == [2, 3, 4]
+    runs = p.get_stages_run()
+    assert runs[0].inputs == ((2, ), dict())
+    assert runs[1].outputs == 4
+
+
+def func_args(*args) -> tuple:
+    return args
+
+
+def test_map_stages_disabled():
+    p = make_pipeline(func_sum, func_sum, func_args)
+    p.disable(0)
+    assert list(p.map(range(3), executor="stages")) == [1, 2, 3]
+    # a disabled stage passes its inputs on as __call__ does
+    p.enable(0)
+    p.disable(1)
+    assert list(p.map(range(3), executor="stages")) == [p(i) for i in range(3)]
+    assert p(0) == (1, {})
+
+
+def test_map_stages_error():
+    p = make_pipeline(func_sum, func_fail_on_3, func_sum)
+    res = p.map(range(10), executor="stages")
+    assert next(res) == 2
+    with pytest.raises(RuntimeError, match="boom"):
+        list(res)
+
+
+def test_map_stages_early_close():
+    num_threads = threading.active_count()
+    p = make_pipeline(func_sum, func_sum)
+    res = p.map(range(1000), executor="stages", queue_size=2)
+    assert next(res) == 2
+    res.close()
+    assert threading.active_count() == num_threads
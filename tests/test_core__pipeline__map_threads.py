@@ -0,0 +1,74 @@
+import pytest
+import threading
+import time
+
+from typing import Any
+
+from enpipe import make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_sleep(a: float) -> float:
+    # later items finish first
+    time.sleep(0.01 * (5 - a))
+    return a
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "record",
+        "unpack",
+        "items",
+        "expected",
+    ]),
+    [
+        (True, False, range(20), [i + 2 for i in range(20)]),
+        (False, False, range(20), [i + 2 for i in range(20)]),
+        (True, True, [(1, 2), (3, 4)], [4, 8]),
+        (False, True, [(1, 2), (3, 4)], [4, 8]),
+    ]
+)
+def test_map_threads_ordered(
+    record: bool,
+    unpack: bool,
+    items: Any,
+    expected: list,
+):
+    p = make_pipeline(func_sum, func_sum)
+    res = p.map(
+        items, 
+        unpack=unpack,
+        record=record, 
+        executor="thread", 
+        max_workers=4,
+    )
+    assert list(res) == expected
+
+
+def test_map_threads_unordered():
+    p = make_pipeline(func_sleep)
+    res = list(p.map(range(5), executor="thread", max_workers=5, ordered=False))
+    assert sorted(res) == list(range(5))
+    assert res != list(range(5))
+
+
+def test_map_threads_isolated_runs():
+    barrier = threading.Barrier(4)
+
+    def func_wait(a: int) -> int:
+        barrier.wait()
+        return a
+
+    p = make_pipeline(func_wait, func_sum)
+    assert list(p.map(range(4), executor="thread", max_workers=4)) == [1, 2, 3, 4]
+    runs = p.get_stages_run()
+    assert runs[0].inputs == ((3, ), dict())
+    assert runs[1].inputs == (3, )
+    assert runs[1].outputs == 4
+
+
+def test_map_unknown_executor():
+    p = make_pipeline(func_sum)
+    with pytest.raises(ValueError):
+        p.map(range(2), executor="unknown")
@@ -0,0 +1,77 @@
+import pytest
+import gc
+import weakref
+
+from enpipe import Stage, Pipeline, make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_divide(a: float, b: float = 1.0) -> float:
+    return a/b
+
+
+class Payload:
+    pass
+
+def make_payload(a: float) -> Payload:
+    return Payload()
+
+def consume_payload(p: Payload) -> int:
+    return 1
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "retention",
+        "expected_runs",
+    ]),
+    [
+        ("full", 2),
+        ("timings", 2),
+        ("none", 0),
+    ]
+)
+def test_retention(
+    retention: str,
+    expected_runs: int,
+):
+    p = make_pipeline(func_sum, func_divide, retention=retention)
+    assert p(1) == 2
+    runs = p.get_stages_run()
+    assert len(runs) == expected_runs
+    for run in runs:
+        assert run.runtime >= 0
+        if retention == "full":
+            assert run.outputs == 2
+        else:
+            assert run.inputs is None and run.outputs is None
+
+
+@pytest.mark.parametrize("retention", ["timings", "none"])
+def test_retention_releases_intermediates(retention: str):
+    p = make_pipeline(make_payload, consume_payload, retention=retention)
+    assert p(1) == 1
+    assert p[0]._out is None
+    gc.collect()
+    assert not any(isinstance(obj, Payload) for obj in gc.get_objects())
+
+
+def test_retention_full_keeps_intermediates():
+    p = make_pipeline(make_payload, consume_payload)
+    p(1)
+    ref = weakref.ref(p.get_stages_run(0)[0].outputs)
+    gc.collect()
+    assert ref() is not None
+
+
+def test_retention_resume_from():
+    p = make_pipeline(func_sum, func_sum, retention="timings")
+    p(1)
+    with pytest.raises(ValueError, match="resume_from requires retention='full'"):
+        p(1, resume_from=1)
+
+
+def test_retention_unknown():
+    with pytest.raises(ValueError):
+        Pipeline(Stage(func_sum), retention="all")
@@ -0,0 +1,147 @@
+import pytest
+import asyncio
+
+from enpipe import Pipeline, Stage, RetryPolicy, StageCache
+
+
+class Flaky:
+    """Fails the first `failures` calls"""
+    def __init__(self, failures: int, error: type[Exception] = ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.__name__ = "flaky"
+
+    def __call__(self, a: int) -> int:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("transient")
+        return a * 10
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+
+NO_WAIT = dict(backoff=0.0, jitter=0.0)
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "failures",
+        "max_attempts",
+        "expected_attempts",
+    ]),
+    [
+        (0, 3, 1),
+        (1, 3, 2),
+        (2, 3, 3),
+    ]
+)
+@pytest.mark.parametrize("retention", ["full", "timings"])
+def test_retry(
+    failures: int, 
+    max_attempts: int, 
+    expected_attempts: int,
+    retention: str,
+):
+    upstream = Flaky(0)
+    flaky = Flaky(failures)
+    p = Pipeline(
+        Stage(upstream, name="upstream"),
+        Stage(flaky, retry=RetryPolicy(max_attempts=max_attempts, **NO_WAIT)),
+        retention=retention,
+    )
+    assert p(1) == 100
+    # only the failing stage is re-invoked
+    assert upstream.calls == 1
+    assert flaky.calls == expected_attempts
+    record = p.get_stages_run("flaky")[0]
+    assert record.attempts == expected_attempts
+    assert (record.retry_time > 0) == (expected_attempts > 1)
+
+
+def test_retry_exhausted():
+    flaky = Flaky(5)
+    p = Pipeline(Stage(flaky, retry=RetryPolicy(max_attempts=3, **NO_WAIT)))
+    with pytest.raises(ConnectionError) as excinfo:
+        p(1)
+    assert flaky.calls == 3
+    assert "--> Failed after 3 attempts" in excinfo.value.__notes__
+
+
+def test_retry_on():
+    flaky = Flaky(1, error=KeyError)
+    p = Pipeline(Stage(flaky, retry=RetryPolicy(retry_on=ConnectionError, **NO_WAIT)))
+    with pytest.raises(KeyError):
+        p(1)
+    assert flaky.calls == 1
+
+
+def test_retry_compiled_and_cache():
+    cache = StageCache()
+    flaky = Flaky(1)
+    p = Pipeline(Stage(flaky, cache=cache, retry=RetryPolicy(**NO_WAIT)))
+    assert p.compile()(1) == 10
+    assert p(1) == 10
+    assert flaky.calls == 2
+    assert cache.info().hits == 1
+
+
+def test_retry_async():
+    calls = []
+
+    async def aflaky(a: int) -> int:
+        calls.append(a)
+        if len(calls) == 1:
+            raise ConnectionError("transient")
+        return a
+
+    p = Pipeline(Stage(aflaky, retry=RetryPolicy(**NO_WAIT)))
+    assert asyncio.run(p.acall(1)) == 1
+    assert p.get_stages_run()[0].attempts == 2
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "policy",
+        "attempt",
+        "expected",
+    ]),
+    [
+        (RetryPolicy(backoff=0.1, jitter=0), 1, 0.1),
+        (RetryPolicy(backoff=0.1, jitter=0), 3, 0.4),
+        (RetryPolicy(backoff=0.1, multiplier=3, jitter=0), 3, 0.9),
+        (RetryPolicy(backoff=1, max_backoff=2, jitter=0), 5, 2),
+    ]
+)
+def test_retry_delay(policy: RetryPolicy, attempt: int, expected: float):
+    assert policy.delay(attempt) == pytest.approx(expected)
+
+
+def test_retry_delay_jitter():
+    policy = RetryPolicy(backoff=1, jitter=0.5)
+    delays = [policy.delay(1) for _ in range(100)]
+    assert all(0.5 <= d <= 1.5 for d in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(max_attempts=0),
+        dict(backoff=-1),
+        dict(multiplier=0.5),
+        dict(jitter=2),
+    ]
+)
+def test_retry_invalid(kwargs: dict):
+    with pytest.raises(ValueError):
+        RetryPolicy(**kwargs)
+
+
+def test_retry_delay_jitter_capped():
+    policy = RetryPolicy(backoff=1, max_backoff=2, jitter=0.5)
+    delays = [policy.delay(2) for _ in range(100)]
+    assert all(1 <= d <= 2 for d in delays)
+    assert min(delays) < 2
@@ -0,0 +1,112 @@
+import pytest
+import threading
+
+from typing import Any
+
+from enpipe import Run, make_pipeline
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_mul(a: float, b: float = 2.0) -> float:
+    return a*b
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "args",
+        "kwargs",
+        "expected",
+    ]),
+    [
+        ((1, ), dict(), 4),
+        (tuple(), dict(a=1, b=2), 6),
+    ]
+)
+def test_run(
+    args: tuple,
+    kwargs: dict[str, Any],
+    expected: Any,
+):
+    p = make_pipeline(func_sum, func_mul)
+    run = p.run(*args, **kwargs)
+    assert isinstance(run, Run)
+    assert run.result == expected
+    assert p.get_stages_run(1, run=run)[0].outputs == expected
+    assert run.stages_run[0].inputs == (args, kwargs)
+
+
+def test_run_is_isolated():
+    p = make_pipeline(func_sum, func_mul)
+    run1 = p.run(1)
+    run2 = p.run(10)
+    assert p.get_stages_run(1, run=run1)[0].outputs == 4
+    assert p.get_stages_run(1, run=run2)[0].outputs == 22
+    assert p.get_stages_run(1)[0].outputs == 22
+
+
+def test_resume_from_run():
+    p = make_pipeline(func_sum, func_mul, func_sum)
+    run1 = p.run(1)
+    p.run(10)
+    run3 = p.resume(1, run1)
+    assert run3.result == 5
+    assert run3.stages_run[0] is run1.stages_run[0]
+    # the original run is left untouched
+    assert run1.result == 5
+    assert len(run1.stages_run) == len(run3.stages_run)
+    assert run1.stages_run[1] is not run3.stages_run[1]
+
+
+def test_resume_last_run():
+    p = make_pipeline(func_sum, func_mul, func_sum)
+    p.run(1)
+    run = p.resume("func_mul")
+    assert run.result == 5
+    assert p.resume(2, run, stop_at=2).result is None
+    with pytest.raises(TypeError):
+        p.resume(1, "run")
+
+
+def func_offset(x: float, run: float = 0.0) -> float:
+    return x + run
+
+
+def test_run_keyword_goes_to_first_stage():
+    p = make_pipeline(func_offset)
+    assert p(1, run=5) == 6
+    assert p.run(1, run=5).result == 6
+
+
+def test_run_concurrent_callers():
+    p = make_pipeline(func_sum, func_mul)
+    barrier = threading.Barrier(8)
+    results = dict()
+
+    def worker(n: int) -> None:
+        barrier.wait()
+        for _ in range(200):
+            run = p.run(n)
+            assert run.result == (n+1)*2
+            assert run.stages_run[0].inputs == ((n, ), dict())
+        results[n] = True
+
+    threads = [threading.Thread(target=worker, args=(n, )) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 8
+
+
+def test_run_does_not_touch_stages():
+    p = make_pipeline(func_sum, func_mul)
+    p(1)
+    assert p[0]._out is None
+    assert p[1]._args == tuple()
+
+
+def test_iter_is_reentrant():
+    p = make_pipeline(func_sum, func_mul)
+    pairs = [(s1.name, s2.name) for s1 in p for s2 in p]
+    assert len(pairs) == len(p)**2
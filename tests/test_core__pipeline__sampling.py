@@ -0,0 +1,134 @@
+import pytest
+import asyncio
+
+from enpipe import Pipeline, Stage, SamplingPolicy, StatsCollector
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def func_mul(a: int, b: int = 2) -> int:
+    return a*b
+
+
+def make(sampling: SamplingPolicy, **kwargs) -> Pipeline:
+    return Pipeline(Stage(func_sum), Stage(func_mul), sampling=sampling, **kwargs)
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "every",
+        "calls",
+        "expected_inputs",
+    ]),
+    [
+        (1, 3, [0, 1, 2]),
+        (2, 5, [0, 2, 4]),
+        (3, 5, [0, 3]),
+    ]
+)
+def test_sampling_every(every: int, calls: int, expected_inputs: list[int]):
+    sampling = SamplingPolicy(every=every)
+    p = make(sampling)
+    assert [p(i) for i in range(calls)] == [(i + 1) * 2 for i in range(calls)]
+    assert [run.inputs[0][0][0] for run in sampling.runs] == expected_inputs
+    assert all(len(run.stages_run) == 2 for run in sampling.runs)
+    assert sampling.calls == calls
+    assert sampling.sampled == len(expected_inputs)
+
+
+def test_sampling_not_sampled_records_nothing():
+    p = make(SamplingPolicy(every=2))
+    p(0)
+    assert len(p.get_stages_run()) == 2
+    p(1)
+    assert p.get_stages_run() == []
+    assert p._last_run.inputs == []
+
+
+def test_sampling_rate_seeded():
+    def sampled_inputs(seed: int) -> list[int]:
+        sampling = SamplingPolicy(rate=0.3, seed=seed, maxlen=1000)
+        p = make(sampling)
+        for i in range(200):
+            p(i)
+        return [run.inputs[0][0][0] for run in sampling.runs]
+
+    first = sampled_inputs(42)
+    assert first == sampled_inputs(42)
+    assert first != sampled_inputs(7)
+    assert 20 < len(first) < 100
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "rate",
+        "expected",
+    ]),
+    [
+        (0.0, 0),
+        (1.0, 10),
+    ]
+)
+def test_sampling_rate_bounds(rate: float, expected: int):
+    sampling = SamplingPolicy(rate=rate)
+    p = make(sampling)
+    for i in range(10):
+        p(i)
+    assert sampling.sampled == expected
+
+
+def test_sampling_bounded_buffer():
+    sampling = SamplingPolicy(every=1, maxlen=3)
+    p = make(sampling)
+    for i in range(10):
+        p(i)
+    assert [run.inputs[0][0][0] for run in sampling.runs] == [7, 8, 9]
+    assert [run.result for run in sampling.runs] == [16, 18, 20]
+
+
+def test_sampling_clear():
+    sampling = SamplingPolicy(rate=0.5, seed=1)
+    p = make(sampling)
+    for i in range(10):
+        p(i)
+    before = [run.inputs[0][0][0] for run in sampling.runs]
+    sampling.clear()
+    assert len(sampling.runs) == 0
+    for i in range(10):
+        p(i)
+    assert [run.inputs[0][0][0] for run in sampling.runs] == before
+
+
+def test_sampling_with_stats():
+    stats = StatsCollector()
+    sampling = SamplingPolicy(every=2)
+    p = make(sampling, stats_collector=stats)
+    for i in range(4):
+        p(i)
+    # stats keep aggregating every call
+    assert stats.summary()[0].count == 4
+    assert len(sampling.runs) == 2
+
+
+def test_sampling_acall():
+    sampling = SamplingPolicy(every=2)
+    p = make(sampling)
+    for i in range(4):
+        assert asyncio.run(p.acall(i)) == (i + 1) * 2
+    assert len(sampling.runs) == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(),
+        dict(rate=0.5, every=2),
+        dict(rate=1.5),
+        dict(every=0),
+        dict(every=1, maxlen=0),
+    ]
+)
+def test_sampling_invalid(kwargs: dict):
+    with pytest.raises(ValueError):
+        SamplingPolicy(**kwargs)
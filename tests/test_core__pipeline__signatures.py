@@ -0,0 +1,183 @@
+import pytest
+
+from typing import Any, Iterator, Optional
+
+from enpipe import Pipeline, Stage, StageSignatureError, make_pipeline
+
+
+calls: list[str] = []
+
+def func_sum(a: int, b: int = 1) -> int:
+    calls.append("func_sum")
+    return a+b
+
+def func_pair(a: int) -> tuple[int, int]:
+    calls.append("func_pair")
+    return a, a
+
+def func_triple(a: int) -> tuple[int, int, int]:
+    return a, a, a
+
+def func_none(a: int) -> None:
+    return None
+
+def func_no_args() -> int:
+    return 1
+
+def func_varargs(*args: int) -> tuple[int, ...]:
+    return args
+
+def func_kwonly(a: int, *, b: int) -> int:
+    return a+b
+
+def func_optional(a: int) -> Optional[tuple[int, int]]:
+    return a, a
+
+def func_union(a: int) -> int | tuple[int, int]:
+    return a
+
+def func_unannotated(a):
+    return a
+
+def func_any(a: int) -> Any:
+    return a
+
+def split(n: int) -> Iterator[tuple[int, int]]:
+    for i in range(n):
+        yield i, i
+
+def batch_double(items: list[int]) -> list[int]:
+    return [2*item for item in items]
+
+def batch_pairs(items: list[int]) -> list[tuple[int, int]]:
+    return [(item, item) for item in items]
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "num_issues",
+    ]),
+    [
+        ((func_sum, func_sum), 0),
+        ((func_pair, func_sum), 0),
+        ((func_sum, func_pair, func_pair), 1),
+        ((func_triple, func_sum), 1),
+        ((func_none, func_no_args), 0),
+        ((func_none, func_sum), 1),
+        ((func_sum, func_no_args), 1),
+        ((func_triple, func_varargs, func_sum), 0),
+        ((func_sum, func_kwonly), 1),
+        ((func_sum, func_optional, func_sum), 0),
+        ((func_sum, func_union, func_sum), 0),
+        ((func_unannotated, func_no_args), 0),
+        ((func_any, func_no_args), 0),
+        ((func_sum, len), 0),
+        ((split, func_sum), 0),
+        ((split, func_pair), 1),
+        ((func_triple, func_sum, func_pair, func_pair, func_no_args), 3),
+    ]
+)
+def test_validate(funcs: tuple, num_issues: int):
+    p = make_pipeline(*funcs)
+    if num_issues == 0:
+        p.validate()
+        return
+    with pytest.raises(StageSignatureError) as excinfo:
+        p.validate()
+    assert len(excinfo.value.issues) == num_issues
+    assert isinstance(excinfo.value, TypeError)
+
+
+def test_validate_message():
+    p = make_pipeline(func_triple, func_sum, func_sum, func_pair, func_pair)
+    with pytest.raises(StageSignatureError) as excinfo:
+        p.validate()
+    message = str(excinfo.value)
+    assert message.startswith("2 incompatible stage signature(s):")
+    assert "stage#0(func_triple) -> stage#1(func_sum_1)" in message
+    assert "stage#3(func_pair_1) -> stage#4(func_pair_2)" in message
+    assert "returns 3 value(s)" in message
+
+
+def test_validate_disabled():
+    # the disabled stage passes its input on with its kwargs: func_pair(2, {})
+    p = make_pipeline(func_sum, func_sum, func_pair)
+    p.validate()
+    p.disable(1)
+    with pytest.raises(StageSignatureError) as excinfo:
+        p.validate()
+    assert excinfo.value.issues == [
+        "stage#0(func_sum_1) -> stage#2(func_pair): func_sum_1 returns 1 value(s), "
+        "passed on by disabled stage#1(func_sum_2) together with their kwargs "
+        "(2 argument(s)), but func_pair(a: int) -> tuple[int, int] does not accept them"
+    ]
+    # func_sum(2, {})
+    p = make_pipeline(func_sum, func_sum, func_sum)
+    p.disable(1)
+    p.validate()
+    # leading and trailing disabled stages
+    p = make_pipeline(func_pair, func_pair, func_sum, func_pair)
+    p.disable(0)
+    p.disable(3)
+    p.validate()
+
+
+def test_validate_disabled_compile():
+    p = Pipeline(Stage(func_sum), Stage(func_sum), Stage(func_pair), validate_signatures=True)
+    p.disable(1)
+    with pytest.raises(StageSignatureError):
+        p(1)
+    with pytest.raises(StageSignatureError):
+        list(p.map([1]))
+    assert calls == []
+    # compiled plans skip the disabled stage
+    assert p.compile()(1) == (2, 2)
+
+
+def test_validate_batch():
+    p = Pipeline(
+        Stage(func_pair), 
+        Stage(batch_double, batch_size=4), 
+        Stage(func_sum),
+    )
+    p.validate()
+    p.append(Stage(batch_pairs, batch_size=4))
+    p.append(Stage(func_pair))
+    with pytest.raises(StageSignatureError) as excinfo:
+        p.validate()
+    assert len(excinfo.value.issues) == 1
+
+
+def test_validate_signatures_before_call():
+    p = Pipeline(Stage(func_sum), Stage(func_pair), Stage(func_pair), validate_signatures=True)
+    with pytest.raises(StageSignatureError):
+        p(1)
+    # no stage was executed
+    assert calls == []
+    with pytest.raises(StageSignatureError):
+        list(p.map(range(3)))
+    with pytest.raises(StageSignatureError):
+        p.compile()
+
+    p.disable(2)
+    assert p.compile()(1) == (2, 2)
+    p.enable(2)
+    with pytest.raises(StageSignatureError):
+        p(1)
+    p.remove(2)
+    p.append(Stage(func_sum))
+    assert p(1) == 4
+    assert list(p.map(range(2), executor="thread")) == [2, 4]
+
+
+def test_validate_signatures_disabled_by_default():
+    p = make_pipeline(func_sum, func_pair, func_pair)
+    with pytest.raises(TypeError):
+        p(1)
+    assert calls == ["func_sum", "func_pair"]
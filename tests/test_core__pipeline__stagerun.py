@@ -67,3 +67,15 @@ def test_input_output(
             assert (prev_run.outputs,) == run.inputs
         else:
             assert prev_run.outputs == run.inputs
+
+
+def test_get_stages_run_keys():
+    p = Pipeline(Stage(func_sum), Stage(func_divide))
+    run = p.run(1)
+    stages_run = p.get_stages_run("func_divide", 0, "func_sum", -1)
+    assert stages_run == [run.stages_run[0], run.stages_run[1]]
+    with pytest.raises(KeyError):
+        p.get_stages_run("unknown")
+    # a run recorded before the structure changed
+    p.insert(0, Stage(func_divide, name="first"))
+    assert p.get_stages_run("func_divide", run=run) == []
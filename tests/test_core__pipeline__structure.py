@@ -0,0 +1,109 @@
+import pytest
+
+from enpipe import Stage, make_pipeline
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def func_mul(a: int, b: int = 2) -> int:
+    return a*b
+
+def func_neg(a: int) -> int:
+    return -a
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "key",
+        "expected_names",
+        "expected",
+    ]),
+    [
+        (0, ("func_neg", "func_sum", "func_mul"), -4),
+        (1, ("func_sum", "func_neg", "func_mul"), -8),
+        ("func_mul", ("func_sum", "func_neg", "func_mul"), -8),
+        (2, ("func_sum", "func_mul", "func_neg"), -8),
+        (100, ("func_sum", "func_mul", "func_neg"), -8),
+        (-1, ("func_sum", "func_neg", "func_mul"), -8),
+    ]
+)
+def test_insert(key, expected_names, expected):
+    p = make_pipeline(func_sum, func_mul)
+    p.insert(key, Stage(func_neg))
+    assert p.names == expected_names
+    assert p(3) == expected
+    for idx, name in enumerate(expected_names):
+        assert p._convert_key_to_int(name) == idx
+        assert p[name] is p[idx]
+
+
+def test_insert_duplicated_name():
+    p = make_pipeline(func_sum, func_mul)
+    p.insert(0, Stage(func_sum))
+    p.append(Stage(func_sum))
+    assert p.names == ("func_sum_1", "func_sum", "func_mul", "func_sum_2")
+    assert p(1) == 7
+
+
+def test_remove():
+    p = make_pipeline(func_sum, func_neg, func_mul)
+    stage = p.remove("func_neg")
+    assert stage.func is func_neg
+    assert p.names == ("func_sum", "func_mul")
+    assert p["func_mul"] is p[1]
+    assert p(1) == 4
+    with pytest.raises(KeyError):
+        p["func_neg"]
+    with pytest.raises(KeyError):
+        p.remove(5)
+
+
+def test_replace():
+    p = make_pipeline(func_sum, func_mul)
+    old = p.replace(1, Stage(func_neg))
+    assert old.func is func_mul
+    assert p.names == ("func_sum", "func_neg")
+    assert p(1) == -2
+    p.replace("func_neg", Stage(func_sum))
+    assert p.names == ("func_sum", "func_sum_1")
+    assert p(1) == 3
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "key",
+        "index",
+        "expected_names",
+    ]),
+    [
+        (0, 2, ("func_mul", "func_neg", "func_sum")),
+        ("func_neg", 0, ("func_neg", "func_sum", "func_mul")),
+        (1, 1, ("func_sum", "func_mul", "func_neg")),
+        (0, -1, ("func_mul", "func_neg", "func_sum")),
+    ]
+)
+def test_move(key, index, expected_names):
+    p = make_pipeline(func_sum, func_mul, func_neg)
+    p.move(key, index)
+    assert p.names == expected_names
+    assert [p._convert_key_to_int(name) for name in expected_names] == [0, 1, 2]
+
+
+def test_structure_change_rebuilds_compiled():
+    p = make_pipeline(func_sum, func_mul)
+    c = p.compile()
+    assert c(1) == 4
+    p.append(Stage(func_neg))
+    assert c(1) == -4
+    p.remove(0)
+    assert c(1) == -2
+
+
+def test_structure_change_resets_last_run():
+    p = make_pipeline(func_sum, func_mul)
+    p(1)
+    p.insert(0, Stage(func_neg))
+    assert p.get_stages_run() == []
+    with pytest.raises(ValueError):
+        p(1, resume_from=1)
@@ -0,0 +1,104 @@
+import pytest
+import asyncio
+import time
+
+from typing import Any
+
+from enpipe import Pipeline, Stage, StageTimeoutError, StageCache
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def func_sleep(a: float) -> float:
+    time.sleep(a)
+    return a
+
+def func_divide_by_zero(a: float) -> float:
+    return a / 0
+
+def func_sleep_batch(items: list[float]) -> list[float]:
+    time.sleep(max(items))
+    return items
+
+async def afunc_sleep(a: float) -> float:
+    await asyncio.sleep(a)
+    return a
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+@pytest.mark.parametrize("retention", ["full", "none"])
+def test_timeout(compiled: bool, retention: str):
+    p = Pipeline(Stage(func_sum), Stage(func_sleep, timeout=0.05), retention=retention)
+    func = p.compile() if compiled else p
+    assert func(-0.99) == pytest.approx(0.01)
+    t1 = time.perf_counter()
+    with pytest.raises(StageTimeoutError) as excinfo:
+        func(1)
+    assert time.perf_counter() - t1 < 2
+    assert "--> Error at stage#1(func_sleep)" in excinfo.value.__notes__
+    assert isinstance(excinfo.value, TimeoutError)
+
+
+def test_timeout_propagates_errors():
+    p = Pipeline(Stage(func_divide_by_zero, timeout=1))
+    with pytest.raises(ZeroDivisionError):
+        p(1)
+
+
+def test_timeout_with_cache():
+    cache = StageCache()
+    p = Pipeline(Stage(func_sleep, timeout=1, cache=cache))
+    assert p(0.01) == 0.01
+    assert p(0.01) == 0.01
+    assert cache.info().hits == 1
+
+
+def test_timeout_async():
+    p = Pipeline(Stage(afunc_sleep, timeout=0.05))
+    assert asyncio.run(p.acall(0.001)) == 0.001
+    with pytest.raises(StageTimeoutError):
+        asyncio.run(p.acall(1))
+
+
+def test_timeout_invalid():
+    with pytest.raises(ValueError):
+        Stage(func_sum, timeout=0)
+
+
+@pytest.mark.parametrize(
+    "executor", 
+    [None, "thread", "stages", "process"],
+)
+@pytest.mark.parametrize("record", [True, False])
+def test_map_on_error_return(executor: str | None, record: bool):
+    p = Pipeline(Stage(func_sleep, timeout=0.2), Stage(func_sum))
+    res = list(p.map(
+        [0.0, 1.0, 0.0], 
+        executor=executor, 
+        record=record, 
+        on_error="return",
+    ))
+    assert res[0] == 1.0
+    assert isinstance(res[1], StageTimeoutError)
+    assert res[2] == 1.0
+
+
+def test_map_on_error_raise():
+    p = Pipeline(Stage(func_divide_by_zero))
+    with pytest.raises(ZeroDivisionError):
+        list(p.map([1, 2]))
+    with pytest.raises(ValueError):
+        p.map([1, 2], on_error="ignore")
+
+
+def test_map_on_error_batch():
+    p = Pipeline(
+        Stage(func_sum),
+        Stage(func_sleep_batch, batch_size=2, timeout=0.2),
+    )
+    res: list[Any] = list(p.map([-1, 1, -1, -1], on_error="return"))
+    # the first batch times out, the second one is not blocked
+    assert isinstance(res[0], StageTimeoutError)
+    assert isinstance(res[1], StageTimeoutError)
+    assert res[2:] == [0, 0]
@@ -0,0 +1,177 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from typing import Any
+
+from enpipe import Node, Graph, StageCache
+
+
+def parse(x: int) -> int:
+    return x * 2
+
+def add_one(x: int) -> int:
+    return x + 1
+
+def add_two(x: int) -> int:
+    return x + 2
+
+def join(a: int, b: int) -> int:
+    return a * 100 + b
+
+def func_divide_by_zero(x: int) -> float:
+    return x / 0
+
+
+def diamond(**kwargs) -> Graph:
+    return Graph(
+        Node(parse),
+        Node(add_one, depends_on="parse"),
+        Node(add_two, depends_on="parse"),
+        Node(join, depends_on=("add_one", "add_two")),
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "nodes",
+        "args",
+        "expected",
+    ]),
+    [
+        ((Node(parse), Node(add_one, depends_on="parse")), (1, ), 3),
+        (
+            (
+                Node(parse), 
+                Node(add_one, depends_on="parse"), 
+                Node(add_two, depends_on="parse"),
+            ), 
+            (1, ), 
+            {"add_one": 3, "add_two": 4},
+        ),
+        (
+            (
+                Node(add_one), 
+                Node(add_two), 
+                Node(join, depends_on=("add_two", "add_one")),
+            ), 
+            (1, ), 
+            302,
+        ),
+        ((), (1, ), None),
+    ]
+)
+def test_graph_call(
+    nodes: tuple[Node, ...],
+    args: tuple,
+    expected: Any,
+):
+    assert Graph(*nodes)(*args) == expected
+
+
+def test_graph_diamond():
+    g = diamond()
+    assert g(1) == 304
+    assert g.sinks == ("join", )
+    assert g.names[0] == "parse"
+    assert g.names[-1] == "join"
+    assert [r.outputs for r in g.get_stages_run("add_one", "add_two")] == [3, 4]
+    assert g.get_stages_run("join")[0].inputs == ((3, 4), {})
+
+
+def test_graph_concurrent_branches():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def left(x: int) -> int:
+        barrier.wait()
+        return x
+
+    def right(x: int) -> int:
+        barrier.wait()
+        return -x
+
+    # would deadlock (and time out) if branches ran sequentially
+    g = Graph(Node(left), Node(right), max_workers=2)
+    assert g(3) == {"left": 3, "right": -3}
+
+
+def test_graph_critical_path():
+    def slow(x: int) -> int:
+        time.sleep(0.02)
+        return x
+
+    g = Graph(
+        Node(parse),
+        Node(slow, depends_on="parse"),
+        Node(add_one, depends_on="parse"),
+        Node(join, depends_on=("slow", "add_one")),
+    )
+    g(1)
+    assert [r.stage.name for r in g.critical_path()] == ["parse", "slow", "join"]
+
+
+def test_graph_disabled_node():
+    g = diamond()
+    g["add_one"].is_enabled = False
+    assert g(1) == 204
+
+
+def test_graph_cache():
+    cache = StageCache()
+    g = Graph(Node(parse, cache=cache), Node(add_one, depends_on="parse"))
+    g(1)
+    g(1)
+    assert g.get_stages_run("parse")[0].cache_hit
+    assert cache.info().hits == 1
+
+
+def test_graph_error():
+    g = Graph(Node(parse), Node(func_divide_by_zero, depends_on="parse"))
+    with pytest.raises(ZeroDivisionError) as excinfo:
+        g(1)
+    assert "--> Error at node(func_divide_by_zero)" in excinfo.value.__notes__
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "nodes",
+        "error",
+    ]),
+    [
+        ((Node(parse), Node(parse)), ValueError),
+        ((Node(add_one, depends_on="missing"), ), KeyError),
+        (
+            (
+                Node(add_one, depends_on="add_two"), 
+                Node(add_two, depends_on="add_one"),
+            ), 
+            ValueError,
+        ),
+    ]
+)
+def test_graph_invalid(nodes: tuple[Node, ...], error: type[Exception]):
+    with pytest.raises(error):
+        Graph(*nodes)
+
+
+def test_graph_acall():
+    async def aadd_one(x: int) -> int:
+        await asyncio.sleep(0)
+        return x + 1
+
+    g = Graph(
+        Node(parse),
+        Node(aadd_one, depends_on="parse"),
+        Node(add_two, depends_on="parse"),
+        Node(join, depends_on=("aadd_one", "add_two")),
+    )
+    assert asyncio.run(g.acall(1)) == 304
+    assert len(g.get_stages_run()) == 4
+
+
+def test_graph_acall_error():
+    g = Graph(Node(parse), Node(func_divide_by_zero, depends_on="parse"))
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(g.acall(1))
@@ -0,0 +1,182 @@
+import pytest
+import pickle
+import sys
+import tracemalloc
+
+from collections import deque
+
+from enpipe import MemoryProfiler, Pipeline, Stage, make_pipeline
+from enpipe.memory import deep_sizeof
+
+
+def make_list(n: int) -> list[int]:
+    return list(range(n))
+
+def make_temporary(n: int) -> int:
+    data = [bytearray(100) for _ in range(n)]
+    return len(data)
+
+def identity(x):
+    return x
+
+def func_fail(x):
+    raise ValueError("fail")
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing():
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("retention", ["full", "timings"])
+def test_memory_stage_run(retention: str):
+    p = Pipeline(
+        Stage(make_list), 
+        Stage(len), 
+        retention=retention, 
+        memory_profiler=MemoryProfiler(),
+    )
+    assert p(10_000) == 10_000
+    run_list, run_len = p.get_stages_run()
+    # the list stays alive as output of the stage
+    assert run_list.memory.net >= 10_000 * 8
+    assert run_list.memory.peak >= run_list.memory.net
+    assert run_list.memory.output_size >= 10_000 * 8
+    assert run_len.memory.peak < 10_000
+    assert run_len.memory.output_size == deep_sizeof(10_000)
+
+
+def test_memory_peak_temporary():
+    p = make_pipeline(make_temporary, identity)
+    p.memory_profiler = MemoryProfiler()
+    p(10_000)
+    memory = p.get_stages_run(0)[0].memory
+    # the objects are released before returning
+    assert memory.peak >= 10_000 * 100
+    assert memory.net < memory.peak / 10
+
+
+def test_memory_nested_peak():
+    profiler = MemoryProfiler(output_size=False)
+    inner = Pipeline(Stage(make_temporary), memory_profiler=profiler)
+    outer = Pipeline(Stage(inner, name="inner"), Stage(identity), memory_profiler=profiler)
+    outer(10_000)
+    run_inner = outer.get_stages_run(0)[0]
+    assert run_inner.memory.peak >= 10_000 * 100
+    assert run_inner.memory.output_size is None
+    assert {row.name for row in profiler.summary()} == {"inner", "make_temporary", "identity"}
+
+
+def test_memory_summary():
+    p = Pipeline(
+        Stage(len), 
+        Stage(make_temporary), 
+        Stage(make_list), 
+        retention="none",
+        memory_profiler=MemoryProfiler(),
+    )
+    for _ in range(3):
+        p([0] * 5_000)
+    summary = p.memory_summary()
+    assert [row.name for row in summary] == ["make_temporary", "make_list", "len"]
+    assert all(row.count == 3 for row in summary)
+    assert summary[0].peak_max >= summary[0].peak_mean > 0
+    assert summary[1].output_size_max >= 5_000 * 8
+    assert summary[2].output_size_max == deep_sizeof(5_000)
+    assert summary[0].output_size_max == deep_sizeof(5_000)
+    table = p.memory_profiler.table().splitlines()
+    assert len(table) == 4
+    assert table[1].startswith("make_temporary")
+
+
+@pytest.mark.parametrize("executor", [None, "thread", "stages"])
+def test_memory_map(executor: str | None):
+    profiler = MemoryProfiler()
+    p = Pipeline(Stage(make_list), Stage(len), memory_profiler=profiler)
+    assert list(p.map([10, 20], executor=executor, record=False)) == [10, 20]
+    assert [row.count for row in profiler.summary()] == [2, 2]
+
+
+def test_memory_error():
+    profiler = MemoryProfiler()
+    p = Pipeline(Stage(make_list), Stage(func_fail), memory_profiler=profiler)
+    with pytest.raises(ValueError):
+        p(10)
+    assert [row.name for row in profiler.summary()] == ["make_list"]
+    assert len(profiler._local.stack) == 0
+
+
+def test_memory_disabled():
+    p = make_pipeline(make_list)
+    p(10)
+    assert p.get_stages_run()[0].memory is None
+    assert not tracemalloc.is_tracing()
+    with pytest.raises(ValueError):
+        p.memory_summary()
+
+
+def test_memory_start_stop():
+    profiler = MemoryProfiler()
+    tracemalloc.start()
+    profiler.start()
+    profiler.stop()
+    # not started by the profiler
+    assert tracemalloc.is_tracing()
+    tracemalloc.stop()
+    profiler.start()
+    assert tracemalloc.is_tracing()
+    profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_pickle():
+    p = Pipeline(Stage(make_list), memory_profiler=MemoryProfiler())
+    p(10)
+    assert pickle.loads(pickle.dumps(p)).memory_profiler is None
+    profiler = pickle.loads(pickle.dumps(p.memory_profiler))
+    assert profiler.summary() == []
+
+
+class Slotted:
+    __slots__ = ("data", )
+
+    def __init__(self, data):
+        self.data = data
+
+
+class Plain:
+    def __init__(self, data):
+        self.data = data
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "obj",
+        "min_size",
+    ]),
+    [
+        ([b"x" * 1000], 1000),
+        ((1, [b"x" * 1000]), 1000),
+        ({"a": b"x" * 1000}, 1000),
+        (deque([b"x" * 1000]), 1000),
+        (Slotted(b"x" * 1000), 1000),
+        (Plain(b"x" * 1000), 1000),
+    ]
+)
+def test_deep_sizeof(obj, min_size: int):
+    assert deep_sizeof(obj) >= min_size
+
+
+def test_deep_sizeof_shared():
+    data = b"x" * 1000
+    assert deep_sizeof([data, data]) < 2000
+
+
+def test_deep_sizeof_skips_shared_state():
+    import json
+
+    # not the size of the json module and of everything it references
+    assert deep_sizeof(Plain(json)) < 1000
+    assert deep_sizeof([json.dumps, Plain, len]) == sys.getsizeof([json.dumps, Plain, len])
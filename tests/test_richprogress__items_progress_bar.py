@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("rich")
+
+from enpipe import make_pipeline, StatsCollector
+from enpipe.richprogress import ItemsProgressBar
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "items",
+        "executor",
+    ]),
+    [
+        (list(range(10)), None),
+        (iter(range(10)), None),
+        (list(range(10)), "thread"),
+        (list(range(10)), "stages"),
+    ]
+)
+def test_map_progress(items, executor):
+    p = make_pipeline(func_sum)
+    assert list(p.map(items, executor=executor, progress=True)) == list(range(1, 11))
+
+
+def test_map_progress_stats():
+    p = make_pipeline(func_sum)
+    p.stats_collector = StatsCollector()
+    assert list(p.map(range(5), progress=True)) == [1, 2, 3, 4, 5]
+    assert "func_sum" in p._progress_stages_info()
+
+
+def test_progress_bar_throttled(monkeypatch):
+    bar = ItemsProgressBar(total=1000, refresh_interval=3600)
+    refreshes = []
+    monkeypatch.setattr(bar, "refresh", lambda: refreshes.append(1))
+    add_task = bar.add_task
+
+    def _add_task(*args, **kwargs):
+        # add_task refreshes on its own, count the refreshes of the items
+        task_id = add_task(*args, **kwargs)
+        refreshes.clear()
+        return task_id
+
+    monkeypatch.setattr(bar, "add_task", _add_task)
+    assert sum(bar.track_items(range(1000))) == sum(range(1000))
+    # only the final refresh
+    assert len(refreshes) == 1
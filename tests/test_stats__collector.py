@@ -0,0 +1,108 @@
+import pytest
+import random
+
+from enpipe import StatsCollector, StageStats, make_pipeline, Pipeline, Stage
+from enpipe.stats import _bucket, _bucket_value, _NUM_BUCKETS
+
+def func_sum(a: float, b: float = 1.0) -> float:
+    return a+b
+
+def func_divide(a: float, b: float = 1.0) -> float:
+    return a/b
+
+
+@pytest.mark.parametrize(
+    "value",
+    [0, 1, 15, 16, 17, 100, 1_000, 123_456_789, 2**40, 2**63],
+)
+def test_bucket(value: int):
+    bucket = _bucket(value)
+    assert 0 <= bucket < _NUM_BUCKETS
+    assert abs(_bucket_value(bucket) - value) <= max(value * 0.125, 1)
+    assert _bucket(value + 1) >= bucket
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+def test_stage_stats_quantile(q: float):
+    rng = random.Random(0)
+    values = [rng.randint(1_000, 1_000_000) for _ in range(10_000)]
+    stats = StageStats("stage")
+    for value in values:
+        stats.add(value)
+    expected = sorted(values)[int(q * len(values)) - 1]
+    assert abs(stats.quantile(q) - expected) <= 0.125 * expected
+    assert stats.count == len(values)
+    assert stats.total == sum(values)
+    assert stats.min == min(values)
+    assert stats.max == max(values)
+
+
+@pytest.mark.parametrize("retention", ["full", "timings", "none"])
+def test_pipeline_stats(retention: str):
+    collector = StatsCollector(history=5)
+    p = Pipeline(
+        Stage(func_sum), 
+        Stage(func_divide), 
+        retention=retention,
+        stats_collector=collector,
+    )
+    for i in range(20):
+        p(i)
+
+    rows = p.stats()
+    assert [row.name for row in rows] == ["func_sum", "func_divide"]
+    for row in rows:
+        assert row.count == 20
+        assert row.min <= row.p50 <= row.p95 <= row.p99 <= row.max
+        assert row.throughput > 0
+
+    assert len(collector.runs) == 5
+    for record in collector.runs:
+        assert record.runtime > 0
+        if retention == "none":
+            assert record.stages_runtime == tuple()
+        else:
+            assert len(record.stages_runtime) == 2
+
+    table = collector.table().splitlines()
+    assert len(table) == 3
+    assert table[1].startswith("func_sum")
+
+
+def test_pipeline_stats_map_processes():
+    collector = StatsCollector()
+    p = make_pipeline(func_sum, func_divide)
+    p.stats_collector = collector
+    list(p.map(range(10), executor="process", max_workers=2))
+    assert [row.count for row in p.stats()] == [10, 10]
+    assert len(collector.runs) == 10
+
+
+@pytest.mark.parametrize("retention", ["full", "none"])
+@pytest.mark.parametrize("executor", [None, "thread", "stages", "process"])
+def test_pipeline_stats_map_without_record(executor: str | None, retention: str):
+    p = Pipeline(
+        Stage(func_sum), 
+        Stage(func_divide), 
+        retention=retention,
+        stats_collector=StatsCollector(),
+    )
+    list(p.map(range(10), executor=executor, record=False))
+    assert [row.count for row in p.stats()] == [10, 10]
+    assert p.get_stages_run() == []
+
+
+def test_pipeline_stats_compiled():
+    p = make_pipeline(func_sum, func_divide)
+    compiled = p.compile()
+    compiled(1)
+    p.stats_collector = StatsCollector()
+    for i in range(5):
+        compiled(i)
+    assert [row.count for row in p.stats()] == [5, 5]
+
+
+def test_pipeline_stats_without_collector():
+    p = make_pipeline(func_sum)
+    with pytest.raises(ValueError):
+        p.stats()
@@ -0,0 +1,140 @@
+import pytest
+import asyncio
+import json
+import os
+import threading
+
+from enpipe import Pipeline, Stage, TraceRecorder, make_pipeline
+
+
+def func_sum(a: int, b: int = 1) -> int:
+    return a+b
+
+def func_mul(a: int, b: int = 2) -> int:
+    return a*b
+
+def func_divide_by_zero(a: int) -> float:
+    return a / 0
+
+
+def by_kind(tracer: TraceRecorder, kind: str) -> list:
+    return sorted(
+        (span for span in tracer.spans if span.kind == kind), 
+        key=lambda span: span.start,
+    )
+
+
+@pytest.mark.parametrize("retention", ["full", "none"])
+def test_trace_call(retention: str):
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(func_sum), Stage(func_mul), name="p", tracer=tracer, retention=retention)
+    assert p(1) == 4
+
+    [run] = by_kind(tracer, "pipeline")
+    stages = by_kind(tracer, "stage")
+    assert run.name == "p"
+    assert [span.name for span in stages] == ["func_sum", "func_mul"]
+    for span in stages:
+        assert span.parent_id == run.span_id
+        assert span.trace_id == run.trace_id
+        assert run.start <= span.start <= span.end <= run.end
+        assert span.pid == os.getpid()
+        assert span.tid == threading.get_native_id()
+        assert span.attributes["enpipe.pipeline"] == "p"
+    assert stages[0].end <= stages[1].start
+
+
+def test_trace_nested_pipelines():
+    tracer = TraceRecorder()
+    inner = Pipeline(Stage(func_sum), name="inner", tracer=tracer)
+    outer = Pipeline(Stage(inner, name="call_inner"), Stage(func_mul), name="outer", tracer=tracer)
+    assert outer(1) == 4
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans["outer"].parent_id is None
+    assert spans["call_inner"].parent_id == spans["outer"].span_id
+    assert spans["inner"].parent_id == spans["call_inner"].span_id
+    assert spans["func_sum"].parent_id == spans["inner"].span_id
+    assert len({span.trace_id for span in tracer.spans}) == 1
+
+
+def test_trace_error():
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(func_divide_by_zero), tracer=tracer)
+    with pytest.raises(ZeroDivisionError):
+        p(1)
+    assert all("ZeroDivisionError" in span.error for span in tracer.spans)
+    assert len(tracer.spans) == 2
+
+
+def test_trace_map_threads():
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(func_sum), tracer=tracer)
+    with tracer.span("batch") as batch:
+        assert list(p.map(range(8), executor="thread", max_workers=4)) == list(range(1, 9))
+    runs = by_kind(tracer, "pipeline")
+    assert len(runs) == 8
+    assert all(span.parent_id == batch.span_id for span in runs)
+    assert all(span.tid != threading.get_native_id() for span in runs)
+
+
+def test_trace_acall():
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(func_sum), Stage(func_mul), tracer=tracer)
+    assert asyncio.run(p.acall(1, sync_in_executor=True)) == 4
+    [run] = by_kind(tracer, "pipeline")
+    assert all(span.parent_id == run.span_id for span in by_kind(tracer, "stage"))
+
+
+def test_trace_maxlen():
+    tracer = TraceRecorder(maxlen=5)
+    p = Pipeline(Stage(func_sum), tracer=tracer)
+    for i in range(10):
+        p(i)
+    assert len(tracer.spans) == 5
+    tracer.clear()
+    assert len(tracer.spans) == 0
+
+
+def test_to_chrome(tmp_path):
+    tracer = TraceRecorder()
+    p = Pipeline(Stage(func_sum), Stage(func_mul), tracer=tracer)
+    p(1)
+    path = tmp_path / "trace.json"
+    trace = tracer.to_chrome(path)
+    assert json.loads(path.read_text()) == json.loads(json.dumps(trace))
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert [e["name"] for e in events] == ["Pipeline", "func_sum", "func_mul"]
+    assert all(e["dur"] >= 0 for e in events)
+    assert any(e["ph"] == "M" and e["name"] == "thread_name" for e in trace["traceEvents"])
+
+
+def test_to_otlp(tmp_path):
+    tracer = TraceRecorder(service_name="svc")
+    p = Pipeline(Stage(func_sum), Stage(func_divide_by_zero), tracer=tracer)
+    with pytest.raises(ZeroDivisionError):
+        p(1)
+    path = tmp_path / "trace.json"
+    trace = tracer.to_otlp(path)
+    assert json.loads(path.read_text()) == trace
+
+    [resource_spans] = trace["resourceSpans"]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+    spans = {span["name"]: span for span in resource_spans["scopeSpans"][0]["spans"]}
+    assert spans["func_sum"]["parentSpanId"] == spans["Pipeline"]["spanId"]
+    assert "parentSpanId" not in spans["Pipeline"]
+    assert len(spans["Pipeline"]["traceId"]) == 32
+    assert spans["func_sum"]["status"] == {"code": 1}
+    assert spans["func_divide_by_zero"]["status"]["code"] == 2
+    assert int(spans["func_sum"]["endTimeUnixNano"]) >= int(spans["func_sum"]["startTimeUnixNano"])
+
+
+def test_no_tracer_pickled():
+    import pickle
+
+    p = make_pipeline(func_sum)
+    p.tracer = TraceRecorder()
+    p(1)
+    assert pickle.loads(pickle.dumps(p)).tracer is None
+    tracer = pickle.loads(pickle.dumps(p.tracer))
+    assert len(tracer.spans) == 0
@@ -0,0 +1,176 @@
+import pytest
+import os
+import subprocess
+import sys
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from enpipe import Pipeline, Stage, SharedMemoryTransport, make_pipeline
+
+import enpipe.transport
+
+
+def func_reverse(data: bytes) -> bytes:
+    return data[::-1]
+
+def func_size(data: bytes) -> int:
+    return len(data)
+
+def func_split(data: bytes) -> tuple[bytes, bytes]:
+    half = len(data) // 2
+    return data[:half], data[half:]
+
+
+def assert_released(segment: str | None):
+    assert segment is not None
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=segment)
+
+
+@pytest.mark.parametrize(
+    ", ".join([
+        "value",
+        "shared",
+    ]),
+    [
+        (b"x" * 100, True),
+        (bytearray(b"x" * 100), True),
+        ((b"x" * 100, 1), True),
+        ([b"x" * 100, b"y" * 100], True),
+        ({"a": b"x" * 100}, True),
+        (b"x" * 10, False),
+        (123, False),
+        ("text" * 100, False),
+    ]
+)
+def test_pack_unpack(value: Any, shared: bool):
+    transport = SharedMemoryTransport(threshold=64)
+    packed = transport.pack(value)
+    assert (packed.segment is not None) == shared
+    res = transport.unpack(packed)
+    assert res == value
+    assert type(res) is type(value)
+    if shared:
+        assert_released(packed.segment)
+
+
+def test_pack_memoryview():
+    transport = SharedMemoryTransport(threshold=64)
+    res = transport.unpack(transport.pack(memoryview(b"x" * 100)))
+    assert isinstance(res, memoryview)
+    assert res.tobytes() == b"x" * 100
+
+
+def test_pack_loads_buffers_once(monkeypatch: pytest.MonkeyPatch):
+    transport = SharedMemoryTransport(threshold=64)
+    packed = transport.pack([b"x" * 100, bytearray(b"y" * 100)])
+    assert packed.readonly == (True, False)
+    loaded = []
+    rebuild_buffer = enpipe.transport._rebuild_buffer
+    def _rebuild_buffer(kind: str, buf: Any) -> Any:
+        res = rebuild_buffer(kind, buf)
+        loaded.append(res is buf)
+        return res
+    monkeypatch.setattr(enpipe.transport, "_rebuild_buffer", _rebuild_buffer)
+    assert transport.unpack(packed) == [b"x" * 100, bytearray(b"y" * 100)]
+    # the buffers copied out of the segment are the loaded objects
+    assert loaded == [True, True]
+
+
+def test_release():
+    transport = SharedMemoryTransport(threshold=64)
+    packed = transport.pack(b"x" * 100)
+    SharedMemoryTransport.release(packed)
+    assert_released(packed.segment)
+    # releasing twice is harmless
+    SharedMemoryTransport.release(packed)
+
+
+def test_numpy():
+    np = pytest.importorskip("numpy")
+    transport = SharedMemoryTransport(threshold=64)
+    arr = np.arange(1000, dtype=np.float64)
+    packed = transport.pack(arr)
+    assert packed.sizes == (arr.nbytes, )
+    assert (transport.unpack(packed) == arr).all()
+
+
+@pytest.mark.parametrize("record", [True, False])
+@pytest.mark.parametrize(
+    ", ".join([
+        "funcs",
+        "expected",
+    ]),
+    [
+        ((func_reverse, ), lambda item: item[::-1]),
+        ((func_reverse, func_size), len),
+        ((func_split, ), lambda item: (item[:len(item)//2], item[len(item)//2:])),
+    ]
+)
+def test_map_processes_transport(funcs, expected, record: bool):
+    p = make_pipeline(*funcs)
+    items = [bytes([i]) * (1 << 17) for i in range(6)] + [b"small"]
+    res = list(p.map(
+        items, 
+        executor="process", 
+        max_workers=2, 
+        record=record,
+        transport=SharedMemoryTransport(),
+    ))
+    assert res == [expected(item) for item in items]
+
+
+def test_transport_requires_processes():
+    p = make_pipeline(func_reverse)
+    with pytest.raises(ValueError):
+        p.map([b""], transport=SharedMemoryTransport())
+
+
+def test_invalid_threshold():
+    with pytest.raises(ValueError):
+        SharedMemoryTransport(threshold=0)
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="requires /dev/shm")
+@pytest.mark.parametrize("ordered", [True, False])
+def test_map_processes_transport_early_stop(ordered: bool):
+    before = set(os.listdir("/dev/shm"))
+    p = make_pipeline(func_reverse)
+    res = p.map(
+        (bytes([i]) * (1 << 17) for i in range(50)), 
+        executor="process", 
+        max_workers=2, 
+        ordered=ordered,
+        transport=SharedMemoryTransport(),
+    )
+    next(res)
+    res.close()
+    assert set(os.listdir("/dev/shm")) - before == set()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="requires the fork start method")
+def test_map_processes_transport_no_tracker_warnings(tmp_path):
+    # the first item is small: the workers start before the resource
+    # tracker of the parent and each one gets its own tracker
+    script = tmp_path / "script.py"
+    script.write_text("\n".join([
+        "import multiprocessing",
+        "from enpipe import make_pipeline, SharedMemoryTransport",
+        "def func_reverse(data): return data[::-1]",
+        "if __name__ == '__main__':",
+        "    multiprocessing.set_start_method('fork')",
+        "    p = make_pipeline(func_reverse)",
+        "    items = [b'small'] + [bytes([i]) * (1 << 17) for i in range(6)]",
+        "    transport = SharedMemoryTransport()",
+        "    res = p.map(items, executor='process', max_workers=2, transport=transport)",
+        "    assert len(list(res)) == 7",
+    ]))
+    proc = subprocess.run(
+        [sys.executable, str(script)], 
+        capture_output=True, 
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stderr == ""